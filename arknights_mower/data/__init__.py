@@ -60,6 +60,10 @@ recruit_result = json.loads(
 key_mapping = json.loads(
     Path(f"{__rootdir__}/data/key_mapping.json").read_text("utf-8"))
 
+# expected position of fixed HUD elements at 1920x1080, for the template matching fast path
+template_roi = json.loads(
+    Path(f'{__rootdir__}/data/template_roi.json').read_text('utf-8'))
+
 recruit_tag = ['资深干员', '高级资深干员']
 for x in recruit_agent.values():
     recruit_tag += x['tags']
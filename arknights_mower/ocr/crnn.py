@@ -1,18 +1,46 @@
+from __future__ import annotations
+
+import traceback
+from typing import Optional
+
 import numpy as np
-import onnxruntime as rt
 from PIL import Image
 
+from ..utils.log import logger
+from ..utils.runtime import runtime
+from .ctc import Trie, constrained_decode, log_probs
 from .keys import alphabetChinese as alphabet
 from .utils import resizeNormalize, strLabelConverter
 
 converter = strLabelConverter(''.join(alphabet))
 
+# input height of the model
+CRNN_HEIGHT = 32
+# crops are padded with white to a multiple of this width, and those of the same width run in one batch;
+# the timesteps of the padded columns are trimmed from the output
+CRNN_BUCKET_WIDTH = 32
+
+
+def warmup(sess):
+    sess.run(['out'], {'input': np.ones((1, 3, CRNN_HEIGHT, CRNN_HEIGHT), np.float32)})
+
 
 class CRNNHandle:
     def __init__(self, model_path):
-        sess_options = rt.SessionOptions()
-        sess_options.log_severity_level = 3
-        self.sess = rt.InferenceSession(model_path, sess_options)
+        # loaded on first use or by the background warm-up
+        self.sess = runtime.register_onnx('crnn', model_path, warmup)
+        self.__batch = None
+
+    @property
+    def batch(self) -> bool:
+        """ a model exported with a fixed batch size of 1 runs crops one by one """
+        if self.__batch is None:
+            self.__batch = self.sess.instance.get_inputs()[0].shape[0] != 1
+        return self.__batch
+
+    @batch.setter
+    def batch(self, value: bool) -> None:
+        self.__batch = value
 
     def predict(self, image):
         scale = image.size[1] * 1.0 / 32
@@ -52,3 +80,113 @@ class CRNNHandle:
         preds = preds.reshape(-1)
         sim_pred = converter.decode(preds, length, raw=False)
         return sim_pred
+
+    @staticmethod
+    def preprocess(image: np.ndarray, is_rgb: bool = False) -> np.ndarray:
+        """ crop -> normalized input of shape (3, 32, w), the same as predict() and predict_rbg() """
+        w = int(image.shape[1] / (image.shape[0] * 1.0 / CRNN_HEIGHT))
+        image = Image.fromarray(image).convert('RGB' if is_rgb else 'L').resize((w, CRNN_HEIGHT), Image.BILINEAR)
+        image = np.array(image, dtype=np.float32)
+        if is_rgb:
+            image = image.transpose(2, 0, 1)
+        else:
+            image = image[np.newaxis].repeat(3, axis=0)
+        return (image - 127.5) / 127.5
+
+    @staticmethod
+    def trim(preds: np.ndarray, width: int, padded: int) -> np.ndarray:
+        """ drop the timesteps of the padding on the right of a crop of width padded into width """
+        if width >= padded:
+            return preds
+        length = min(preds.shape[0], -(-preds.shape[0] * width // padded) + 1)
+        return preds[:length]
+
+    @staticmethod
+    def decode(preds: np.ndarray) -> str:
+        """ greedy CTC decoding of the output of a single crop, shape (length, classes) """
+        return converter.decode(np.argmax(preds, axis=1), preds.shape[0], raw=False)
+
+    @staticmethod
+    def decode_constrained(preds: np.ndarray, trie: Trie) -> tuple[Optional[str], float]:
+        """ the best word of the trie for the output of a single crop, with its score """
+        return constrained_decode(log_probs(preds), trie, converter.dict)
+
+    def infer_batch(self, images: list[np.ndarray], is_rgb: bool = False) -> list[Optional[np.ndarray]]:
+        """
+        run crops in numpy arrays, those in the same width bucket in one batch
+
+        :return: output of each crop in shape (length, classes), None if it fails
+        """
+        inputs = []
+        for image in images:
+            try:
+                inputs.append(self.preprocess(image, is_rgb))
+            except Exception:
+                logger.debug(traceback.format_exc())
+                inputs.append(None)
+        results = [None] * len(images)
+
+        buckets: dict[int, list[int]] = {}
+        for idx, image in enumerate(inputs):
+            if image is None:
+                continue
+            width = -(-image.shape[2] // CRNN_BUCKET_WIDTH) * CRNN_BUCKET_WIDTH if self.batch else image.shape[2]
+            buckets.setdefault(width, []).append(idx)
+
+        for width, indexes in buckets.items():
+            if self.batch and len(indexes) > 1:
+                # white padding on the right, as resizeNormalize does
+                batch = np.ones((len(indexes), 3, CRNN_HEIGHT, width), np.float32)
+                for i, idx in enumerate(indexes):
+                    batch[i, :, :, :inputs[idx].shape[2]] = inputs[idx]
+                try:
+                    preds = self.sess.run(['out'], {'input': batch})[0]
+                    # (length, batch, classes)
+                    if preds.ndim != 3 or preds.shape[1] != len(indexes):
+                        raise ValueError(f'unexpected output shape of batch: {preds.shape}')
+                    for i, idx in enumerate(indexes):
+                        results[idx] = self.trim(preds[:, i], inputs[idx].shape[2], width)
+                    continue
+                except Exception:
+                    logger.debug(traceback.format_exc())
+                    logger.debug('batched CRNN failed, run crops one by one')
+                    self.batch = False
+            for idx in indexes:
+                try:
+                    preds = self.sess.run(['out'], {'input': inputs[idx][np.newaxis]})[0]
+                    results[idx] = preds.reshape(preds.shape[0], -1)
+                except Exception:
+                    logger.debug(traceback.format_exc())
+        return results
+
+    def predict_batch(self, images: list[np.ndarray], is_rgb: bool = False, trie: Trie = None) -> list[Optional[str]]:
+        """
+        recognize crops in numpy arrays, those in the same width bucket run in one batch
+
+        :param trie: words expected, a crop read as one of them with trie.min_score gets the word
+        :return: text of each crop, None if it fails
+        """
+        results = []
+        for preds in self.infer_batch(images, is_rgb):
+            if preds is None:
+                results.append(None)
+                continue
+            text = self.decode(preds)
+            # beam search only when the free decoding is not a word already
+            if trie is not None and text not in trie.words:
+                word, score = self.decode_constrained(preds, trie)
+                if word is not None and score >= trie.min_score:
+                    logger.info(f'约束解码: {text} -> {word} ({score:.2f})')
+                    text = word
+            results.append(text)
+        return results
+
+    def predict_constrained(self, images: list[np.ndarray], trie: Trie,
+                            is_rgb: bool = False) -> list[tuple[Optional[str], float]]:
+        """
+        recognize crops as words of the trie, by constrained beam search instead of greedy decoding
+
+        :return: the best word of each crop and its score, (None, 0) if it fails
+        """
+        return [(None, 0.0) if preds is None else self.decode_constrained(preds, trie)
+                for preds in self.infer_batch(images, is_rgb)]
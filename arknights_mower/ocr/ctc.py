@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import heapq
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+
+from ..data import agent_list, level_list, recruit_tag
+
+# width of the beam search
+CTC_BEAM_WIDTH = 10
+# a character is not tried in a frame where its probability is lower than this
+CTC_CHAR_PRUNE = math.log(1e-4)
+# a word is accepted only if its score is at least this, otherwise the free decoding is kept
+CTC_MIN_SCORE = 0.3
+# operators missing in agent.json, e.g. new ones, must not be taken as another name, so names need more
+CTC_MIN_SCORES = {'agent': 0.8}
+
+NEG_INF = -math.inf
+
+
+def logadd(a: float, b: float) -> float:
+    if a == NEG_INF:
+        return b
+    if b == NEG_INF:
+        return a
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def log_probs(preds: np.ndarray) -> np.ndarray:
+    """ log probabilities of the output of a CTC model, shape (length, classes), softmax applied if needed """
+    preds = preds.astype(np.float64)
+    if preds.min() >= 0 and np.allclose(preds.sum(axis=1), 1, atol=1e-3):
+        return np.log(np.maximum(preds, 1e-30))
+    preds = preds - preds.max(axis=1, keepdims=True)
+    return preds - np.log(np.exp(preds).sum(axis=1, keepdims=True))
+
+
+class TrieNode(object):
+    """ a prefix of the words """
+
+    __slots__ = ['char', 'children', 'word']
+
+    def __init__(self, char: str = '') -> None:
+        self.char = char
+        self.children: dict[str, TrieNode] = {}
+        # the word ending here, if any
+        self.word: Optional[str] = None
+
+
+class Trie(object):
+    """ the words a crop may read, e.g. names of operators """
+
+    def __init__(self, words: Iterable[str], min_score: float = CTC_MIN_SCORE) -> None:
+        self.root = TrieNode()
+        # the score a decoded word needs to be taken
+        self.min_score = min_score
+        self.words = set()
+        for word in words:
+            if len(word) == 0 or word in self.words:
+                continue
+            self.words.add(word)
+            node = self.root
+            for char in word:
+                if char not in node.children:
+                    node.children[char] = TrieNode(char)
+                node = node.children[char]
+            node.word = word
+        # id of charset -> {node: (class indexes of its children, the children)}
+        self.expansions: dict[int, dict[TrieNode, tuple[np.ndarray, list[TrieNode]]]] = {}
+
+    def expansion(self, charset: dict[str, int]) -> dict[TrieNode, tuple[np.ndarray, list[TrieNode]]]:
+        """ children of every node in the classes of a model, characters out of the charset are left out """
+        if id(charset) not in self.expansions:
+            expansion = {}
+            nodes = [self.root]
+            while len(nodes):
+                node = nodes.pop()
+                children = [child for char, child in node.children.items() if char in charset]
+                expansion[node] = (np.array([charset[child.char] for child in children], np.int64), children)
+                nodes.extend(children)
+            self.expansions[id(charset)] = expansion
+        return self.expansions[id(charset)]
+
+
+def constrained_decode(logp: np.ndarray, trie: Trie, charset: dict[str, int], blank: int = 0,
+                       beam_width: int = CTC_BEAM_WIDTH) -> tuple[Optional[str], float]:
+    """
+    CTC prefix beam search, where every prefix is a path in the trie
+
+    :param logp: log probabilities of a single crop, shape (length, classes)
+    :param charset: index of each character in the classes of the model
+    :param blank: index of the blank class
+    :return: the best word and its score in [0, 1], (None, 0) if no word fits.
+        the score is the likelihood of the word relative to the free decoding, per character.
+    """
+    expansion = trie.expansion(charset)
+    # prefix -> (log probability ending in blank, log probability ending in its last character)
+    beams: dict[TrieNode, tuple[float, float]] = {trie.root: (0.0, NEG_INF)}
+    for frame in logp:
+        new: dict[TrieNode, list[float]] = {}
+
+        def add(node: TrieNode, pb: float, pnb: float) -> None:
+            if node not in new:
+                new[node] = [NEG_INF, NEG_INF]
+            new[node][0] = logadd(new[node][0], pb)
+            new[node][1] = logadd(new[node][1], pnb)
+
+        for node, (pb, pnb) in beams.items():
+            total = logadd(pb, pnb)
+            add(node, total + frame[blank], NEG_INF)
+            if node.char in charset:
+                # the last character lasts, without a blank in between
+                add(node, NEG_INF, pnb + frame[charset[node.char]])
+            indexes, children = expansion[node]
+            for i in np.flatnonzero(frame[indexes] >= CTC_CHAR_PRUNE):
+                child = children[i]
+                # a repeated character needs a blank in between
+                add(child, NEG_INF, (pb if child.char == node.char else total) + frame[indexes[i]])
+        beams = dict(heapq.nlargest(beam_width, ((node, tuple(p)) for node, p in new.items()),
+                                    key=lambda x: logadd(*x[1])))
+
+    best, best_logp = None, NEG_INF
+    for node, (pb, pnb) in beams.items():
+        if node.word is not None and logadd(pb, pnb) > best_logp:
+            best, best_logp = node.word, logadd(pb, pnb)
+    if best is None:
+        return None, 0.0
+    # the best path of the free decoding is the upper bound in most cases
+    free_logp = float(logp.max(axis=1).sum())
+    return best, min(1.0, math.exp((best_logp - free_logp) / len(best)))
+
+
+__vocabularies: dict[str, Trie] = {}
+
+
+def vocabulary(name: str) -> Trie:
+    """ trie of a vocabulary in data: 'agent', 'recruit_tag' or 'level' """
+    if name not in __vocabularies:
+        words = {'agent': agent_list, 'recruit_tag': recruit_tag, 'level': level_list.keys()}[name]
+        __vocabularies[name] = Trie(words, CTC_MIN_SCORES.get(name, CTC_MIN_SCORE))
+    return __vocabularies[name]
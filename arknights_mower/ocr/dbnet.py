@@ -1,18 +1,21 @@
 import cv2
 import numpy as np
-import onnxruntime as rt
 
+from ..utils.runtime import runtime
 from .decode import SegDetectorRepresenter
 
 mean = (0.485, 0.456, 0.406)
 std = (0.229, 0.224, 0.225)
 
 
+def warmup(sess):
+    sess.run(['out1'], {'input0': np.zeros((1, 3, 32, 32), np.float32)})
+
+
 class DBNET():
     def __init__(self, model_path):
-        sess_options = rt.SessionOptions()
-        sess_options.log_severity_level = 3
-        self.sess = rt.InferenceSession(model_path, sess_options)
+        # loaded on first use or by the background warm-up
+        self.sess = runtime.register_onnx('dbnet', model_path, warmup)
         self.decode_handel = SegDetectorRepresenter()
 
     def process(self, img, short_size):
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from ..utils import typealias as tp
+
+# margin above and below a band, in proportion of the height of its text
+BAND_MARGIN = 0.5
+
+
+class TextBands(object):
+    """ rows where the text of a fixed layout has been found, per screen size """
+
+    def __init__(self) -> None:
+        # {'name@WxH': [[y0, y1], ...]}, sorted and not overlapping
+        self.bands: dict[str, list[list[int]]] = {}
+
+    @staticmethod
+    def key(name: str, w: int, h: int) -> str:
+        return f'{name}@{w}x{h}'
+
+    def rois(self, name: str, w: int, h: int, width: int = None) -> Optional[list[tp.Scope]]:
+        """ the bands as ROIs of the given width, w by default, None if the layout is not known yet """
+        bands = self.bands.get(self.key(name, w, h))
+        if not bands:
+            return None
+        return [[[0, y0], [w if width is None else width, y1]] for y0, y1 in bands]
+
+    def record(self, name: str, w: int, h: int, boxes: list) -> None:
+        """ extend the bands with text boxes found in the whole image """
+        bands = self.bands.setdefault(self.key(name, w, h), [])
+        for box in boxes:
+            ys = np.array(box)[:, 1]
+            margin = int((ys.max() - ys.min()) * BAND_MARGIN)
+            bands.append([max(0, int(ys.min()) - margin), min(h, int(ys.max()) + margin)])
+        bands.sort()
+        merged = []
+        for y0, y1 in bands:
+            if len(merged) and y0 <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], y1)
+            else:
+                merged.append([y0, y1])
+        self.bands[self.key(name, w, h)] = merged
+
+    def clear(self, name: str, w: int, h: int) -> None:
+        self.bands.pop(self.key(name, w, h), None)
+
+
+text_bands = TextBands()
@@ -1,16 +1,24 @@
 import copy
-import traceback
 
 import cv2
 import numpy as np
-from PIL import Image
 
 from ..utils.log import logger
+from ..utils.ocr_cache import ocr_cache
+from . import ctc
 from .config import crnn_model_path, dbnet_model_path
 from .crnn import CRNNHandle
 from .dbnet import DBNET
+from .layout import text_bands
 from .utils import fix
 
+# ROIs are stitched with this many pixels in between, so that no text box spans two of them
+ROI_GAP = 32
+
+
+def ceil32(x):
+    return -(-x // 32) * 32
+
 
 def sorted_boxes(dt_boxes):
     """
@@ -62,41 +70,111 @@ class OcrHandle(object):
     def __init__(self):
         self.text_handle = DBNET(dbnet_model_path)
         self.crnn_handle = CRNNHandle(crnn_model_path)
+        self.__predict = ocr_cache.cached('ocrhandle', self.recognize)
+        self.__predict_rois = ocr_cache.cached('ocrhandle_rois', self.recognize_rois)
 
-    def crnnRecWithBox(self, im, boxes_list, score_list, is_rgb=False):
+    def crnnRecWithBox(self, im, boxes_list, score_list, is_rgb=False, trie=None):
         results = []
         boxes_list = sorted_boxes(np.array(boxes_list))
 
+        boxes = [copy.deepcopy(box) for box in boxes_list]
+        crops = [get_rotate_crop_image(im, tmp_box.astype(np.float32)) for tmp_box in boxes]
+
         count = 1
-        for (box, score) in zip(boxes_list, score_list):
-
-            tmp_box = copy.deepcopy(box)
-            partImg_array = get_rotate_crop_image(
-                im, tmp_box.astype(np.float32))
-
-            try:
-                if is_rgb:
-                    partImg = Image.fromarray(partImg_array).convert('RGB')
-                    simPred = self.crnn_handle.predict_rbg(partImg)
-                else:
-                    partImg = Image.fromarray(partImg_array).convert('L')
-                    simPred = self.crnn_handle.predict(partImg)
-            except Exception as e:
-                logger.debug(traceback.format_exc())
-                continue
-
-            if simPred.strip() != '':
+        # crops are recognized in batches, a crop failed is skipped as before
+        preds = self.crnn_handle.predict_batch(crops, is_rgb, trie)
+        for (simPred, tmp_box, score) in zip(preds, boxes, score_list):
+            if simPred is not None and simPred.strip() != '':
                 results.append([count, simPred, tmp_box.tolist(), score])
                 count += 1
 
         return results
 
-    def predict(self, img, is_rgb=False):
+    def predict(self, img, is_rgb=False, vocabulary=None):
+        """
+        OCR with results cached by the content of img
+
+        :param vocabulary: 'agent', 'recruit_tag' or 'level', text read as one of its words gets the exact word
+        """
+        return self.__predict(img, is_rgb=is_rgb, vocabulary=vocabulary)
+
+    def recognize(self, img, is_rgb=False, vocabulary=None):
         short_size = min(img.shape[:-1])
         short_size = short_size // 32 * 32
         boxes_list, score_list = self.text_handle.process(img, short_size)
-        result = self.crnnRecWithBox(img, boxes_list, score_list, is_rgb)
+        return self.recognize_boxes(img, boxes_list, score_list, is_rgb, vocabulary)
+
+    def recognize_boxes(self, img, boxes_list, score_list, is_rgb=False, vocabulary=None):
+        trie = ctc.vocabulary(vocabulary) if vocabulary is not None else None
+        result = self.crnnRecWithBox(img, boxes_list, score_list, is_rgb, trie)
         for i in range(len(result)):
-            result[i][1] = fix(result[i][1])
+            if trie is None or result[i][1] not in trie.words:
+                result[i][1] = fix(result[i][1])
         logger.debug(result)
         return result
+
+    def predict_rois(self, img, rois, is_rgb=False, vocabulary=None):
+        """
+        OCR only inside the ROIs of img, results are in the coordinates of img
+
+        :param rois: list of scopes, [[x0, y0], [x1, y1]]
+        """
+        rois = tuple(((int(x0), int(y0)), (int(x1), int(y1))) for (x0, y0), (x1, y1) in rois)
+        return self.__predict_rois(img, rois=rois, is_rgb=is_rgb, vocabulary=vocabulary)
+
+    def recognize_rois(self, img, rois, is_rgb=False, vocabulary=None):
+        h, w = img.shape[:2]
+        rois = [((max(0, x0), max(0, y0)), (min(w, x1), min(h, y1))) for (x0, y0), (x1, y1) in rois]
+        rois = [roi for roi in rois if roi[1][0] > roi[0][0] and roi[1][1] > roi[0][1]]
+        boxes_list, score_list = self.detect_rois(img, rois)
+        return self.recognize_boxes(img, boxes_list, score_list, is_rgb, vocabulary)
+
+    def predict_layout(self, img, layout, accept, expected=1, is_rgb=False, vocabulary=None, full=False, size=None):
+        """
+        OCR of an image with a fixed layout, detection runs only in the rows where its text has been found before
+
+        :param layout: name of the layout, the rows are learned per layout and screen size
+        :param accept: whether a text is what the caller looks for
+        :param expected: the whole image is recognized again if fewer texts are accepted in the rows
+        :param full: recognize the whole image at once, and learn the rows from it
+        :param size: (w, h) of the screen when img is cropped from it horizontally, the size of img by default
+        """
+        h, w = img.shape[:2]
+        key_w, key_h = size if size is not None else (w, h)
+        rois = text_bands.rois(layout, key_w, key_h, w)
+        if rois is not None and not full:
+            result = self.predict_rois(img, rois, is_rgb, vocabulary)
+            if sum(accept(x[1]) for x in result) >= expected:
+                return result
+            logger.debug(f'text out of the known rows of {layout}, recognize the whole image')
+        result = self.predict(img, is_rgb, vocabulary)
+        text_bands.record(layout, key_w, key_h, [x[2] for x in result if accept(x[1])])
+        return result
+
+    def detect_rois(self, img, rois):
+        """ text detection in the ROIs stitched from top to bottom, in a single run of DBNet """
+        if len(rois) == 0:
+            return [], []
+        # every ROI starts at a multiple of 32 in the canvas, which is not resized by DBNet
+        offsets, top = [], 0
+        for (x0, y0), (x1, y1) in rois:
+            offsets.append(top)
+            top += ceil32(y1 - y0) + ROI_GAP
+        width = ceil32(max(x1 - x0 for (x0, _), (x1, _) in rois))
+        canvas = np.zeros((top - ROI_GAP, width) + img.shape[2:], img.dtype)
+        for offset, ((x0, y0), (x1, y1)) in zip(offsets, rois):
+            canvas[offset:offset + y1 - y0, :x1 - x0] = img[y0:y1, x0:x1]
+        boxes, scores = self.text_handle.process(canvas, min(canvas.shape[:2]))
+
+        boxes_list, score_list = [], []
+        for box, score in zip(boxes, scores):
+            cy = box[:, 1].mean()
+            for offset, ((x0, y0), (x1, y1)) in zip(offsets, rois):
+                if offset <= cy < offset + y1 - y0:
+                    box = box.astype(np.int32) + (x0, y0 - offset)
+                    box[:, 0] = np.clip(box[:, 0], x0, x1)
+                    box[:, 1] = np.clip(box[:, 1], y0, y1)
+                    boxes_list.append(box)
+                    score_list.append(score)
+                    break
+        return boxes_list, score_list
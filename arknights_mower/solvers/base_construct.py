@@ -498,14 +498,14 @@ class BaseConstructSolver(BaseSolver, BaseMixin):
                         self.recog.h * arrange_order_res[ArrangeOrder.SKILL][1]), interval=0.5, rebuild=False)
             not_match = False
             exists.extend(selected)
+            taps = []
             for idx, item in enumerate(agents):
                 if agents[idx] != exists[idx] or not_match:
                     not_match = True
                     p_idx = exists.index(agents[idx])
-                    self.tap((self.recog.w * position[p_idx][0], self.recog.h * position[p_idx][1]), interval=0,
-                                rebuild=False)
-                    self.tap((self.recog.w * position[p_idx][0], self.recog.h * position[p_idx][1]), interval=0,
-                                rebuild=False)
+                    # 取消再选中，干员排到最后
+                    taps += [(self.recog.w * position[p_idx][0], self.recog.h * position[p_idx][1])] * 2
+            self.tap_batch(taps, interval=0)
         self.last_room = room
         logger.info(f"设置上次房间为{self.last_room}")
 
@@ -84,17 +84,20 @@ class BaseMixin:
             ret = character_recognize.agent(self.recog.img)  # 返回的顺序是从左往右从上往下
             # 提取识别出来的干员的名字
             select_name = []
+            taps = []
             for y in ret:
                 name = y[0]
                 if name in agent:
                     select_name.append(name)
                     # self.get_agent_detail((y[1][0]))
-                    self.tap((y[1][0]), interval=0)
+                    taps.append(y[1][0])
                     agent.remove(name)
                     # 如果是按照个数选择 Free
                     if max_agent_count != -1:
                         if len(select_name) >= max_agent_count:
-                            return select_name, ret
+                            break
+            # 识别完成后一次性点击所有干员
+            self.tap_batch(taps, interval=0)
             return select_name, ret
         except Exception as e:
             error_count += 1
@@ -192,6 +195,12 @@ class BaseMixin:
         except Exception:
             return 24
 
+    def read_name(self, img):
+        """ 识别结果不是干员名时，先尝试约束解码，再使用 SIFT """
+        if name := rapidocr.read_word(img, 'agent'):
+            return name
+        return character_recognize.agent_name(img, self.recog.h)
+
     def read_screen(self, img, type="mood", limit=24, cord=None):
         if cord is not None:
             img = img[cord[1] : cord[3], cord[0] : cord[2]]
@@ -200,7 +209,7 @@ class BaseMixin:
             logger.debug(ret)
             if not ret or not ret[0][0]:
                 if "name" in type:
-                    return character_recognize.agent_name(img, self.recog.h)
+                    return self.read_name(img)
                 raise Exception("识别失败")
             ret = ret[0][0]
             if "赤金完成" in ret:
@@ -227,7 +236,7 @@ class BaseMixin:
                     name = ocr_error[ret]
                     logger.debug(f"{ret} =====> {name}")
                     return name
-                return character_recognize.agent_name(img, self.recog.h)
+                return self.read_name(img)
             else:
                 return ret
         except Exception as e:
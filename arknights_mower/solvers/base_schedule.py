@@ -51,6 +51,7 @@ class BaseSchedulerSolver(BaseSolver, BaseMixin):
     收集基建的产物：物资、赤金、信赖
     """
     package_name = ''
+    expected_scenes = [Scene.INFRA_MAIN, Scene.INFRA_DETAILS, Scene.INFRA_ARRANGE, Scene.INFRA_ARRANGE_CONFIRM]
 
     def __init__(self, device: Device = None, recog: Recognizer = None) -> None:
         super().__init__(device, recog)
@@ -1535,10 +1536,9 @@ class BaseSchedulerSolver(BaseSolver, BaseMixin):
                     differences.append(i)
                 else:
                     exists.append(current_room[i])
-            for pos in differences:
-                if current_room[pos] != '':
-                    self.tap((self.recog.w * position[pos][0], self.recog.h * position[pos][1]), interval=0,
-                             rebuild=False)
+            # 一次性点掉需要换下的干员
+            self.tap_batch([(self.recog.w * position[pos][0], self.recog.h * position[pos][1])
+                            for pos in differences if current_room[pos] != ''], interval=0)
             agent = [x for x in agents if x not in exists]
         logger.info(f'安排干员 ：{agent}')
         # 若不是空房间，则清空工作中的干员
@@ -1654,14 +1654,14 @@ class BaseSchedulerSolver(BaseSolver, BaseMixin):
                       self.recog.h * arrange_order_res[ArrangeOrder.SKILL][1]), interval=0.5, rebuild=False)
             not_match = False
             exists.extend(selected)
+            taps = []
             for idx, item in enumerate(agents):
                 if agents[idx] != exists[idx] or not_match:
                     not_match = True
                     p_idx = exists.index(agents[idx])
-                    self.tap((self.recog.w * position[p_idx][0], self.recog.h * position[p_idx][1]), interval=0,
-                             rebuild=False)
-                    self.tap((self.recog.w * position[p_idx][0], self.recog.h * position[p_idx][1]), interval=0,
-                             rebuild=False)
+                    # 取消再选中，干员排到最后
+                    taps += [(self.recog.w * position[p_idx][0], self.recog.h * position[p_idx][1])] * 2
+            self.tap_batch(taps, interval=0)
         self.last_room = room
         logger.info(f"设置上次房间为{self.last_room}")
 
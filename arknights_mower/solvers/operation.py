@@ -13,6 +13,8 @@ from ..utils.recognize import RecognizeError, Scene
 from ..utils.solver import BaseSolver, StrategyError
 
 BOTTOM_TAP_NUMER = 8
+# 关卡在 level_list 中的顺序，同一章节的关卡大致按地图上从左到右排列
+LEVEL_ORDER = {code: idx for idx, code in enumerate(level_list)}
 
 
 class LevelUnopenError(Exception):
@@ -24,6 +26,8 @@ class OpeSolver(BaseSolver):
     自动作战策略
     """
 
+    expected_scenes = [Scene.OPERATOR_BEFORE, Scene.OPERATOR_SELECT, Scene.OPERATOR_ONGOING, Scene.OPERATOR_FINISH]
+
     def __init__(self, device=None, recog=None):
         super().__init__(device, recog)
 
@@ -322,11 +326,28 @@ class OpeSolver(BaseSolver):
             # 修改状态
             self.recover_state = 2
 
-    def ocr_level(self) -> list:
-        ocr = ocrhandle.predict(self.recog.img)
-        ocr = list(filter(lambda x: x[1] in level_list.keys(), ocr))
-        levels = sorted([x[1] for x in ocr])
-        return ocr, levels
+    def ocr_level(self, level: str = None) -> list:
+        """
+        识别画面中的关卡，只检测以往出现过关卡名的行；
+        这些行中没有任何关卡，或者要找的关卡夹在识别出的同章节关卡之间时，已知的行有误，再检测整个画面
+        """
+        full = False
+        while True:
+            ocr = ocrhandle.predict_layout(self.recog.img, 'level', lambda x: x in level_list.keys(),
+                                           vocabulary='level', full=full)
+            ocr = list(filter(lambda x: x[1] in level_list.keys(), ocr))
+            levels = sorted([x[1] for x in ocr])
+            if full or level is None or level in levels or not self.level_between(level, levels):
+                return ocr, levels
+            logger.debug(f'关卡 {level} 应在画面中但不在已知的行中，检测整个画面')
+            full = True
+
+    @staticmethod
+    def level_between(level: str, levels: list[str]) -> bool:
+        """ 关卡是否夹在同章节的两个关卡之间，即一定在画面中 """
+        zone = level_list[level]['zone_id']
+        order = [LEVEL_ORDER[x] for x in levels if level_list[x]['zone_id'] == zone]
+        return len(order) > 0 and min(order) < LEVEL_ORDER[level] < max(order)
 
     def choose_level(self, level: str) -> None:
         """ 在终端主界面选择关卡 """
@@ -361,7 +382,7 @@ class OpeSolver(BaseSolver):
             raise RecognizeError('Unknown zone')
 
         # 关卡选择核心逻辑
-        ocr, levels = self.ocr_level()
+        ocr, levels = self.ocr_level(level)
 
         # 先向左滑动
         retry_times = 3
@@ -369,7 +390,7 @@ class OpeSolver(BaseSolver):
             _levels = levels
             self.swipe_noinertia((self.recog.w // 2, self.recog.h // 4),
                                  (self.recog.w // 3, 0), 100)
-            ocr, levels = self.ocr_level()
+            ocr, levels = self.ocr_level(level)
             if _levels == levels:
                 retry_times -= 1
                 if retry_times == 0:
@@ -383,7 +404,7 @@ class OpeSolver(BaseSolver):
             _levels = levels
             self.swipe_noinertia((self.recog.w // 2, self.recog.h // 4),
                                  (-self.recog.w // 3, 0), 100)
-            ocr, levels = self.ocr_level()
+            ocr, levels = self.ocr_level(level)
             if _levels == levels:
                 retry_times -= 1
                 if retry_times == 0:
@@ -234,7 +234,7 @@ class RecruitSolver(BaseSolver):
         while True:
             # ocr the recruitment tags and rectify
             img = self.recog.img[up:down, left:right]
-            ocr = ocrhandle.predict(img)
+            ocr = ocrhandle.predict_layout(img, 'recruit_tag', lambda x: x in recruit_tag, 5, vocabulary='recruit_tag')
             for x in ocr:
                 if x[1] not in recruit_tag:
                     x[1] = ocr_rectify(img, x, recruit_tag, '公招标签')
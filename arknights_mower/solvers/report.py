@@ -30,6 +30,8 @@ def remove_blank(target: str):
 
 
 class ReportSolver(BaseSolver):
+    expected_scenes = [Scene.INFRA_MAIN, Scene.CTRLCENTER_ASSISTANT, Scene.RIIC_REPORT]
+
     def __init__(self, device: Device = None, recog: Recognizer = None) -> None:
         super().__init__(device, recog)
         self.record_path = get_path("@app/tmp/report.csv")
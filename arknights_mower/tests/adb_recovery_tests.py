@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+
+from arknights_mower.tests.fake_adb_server import FakeADBServer
+from arknights_mower.utils.device.adb_client.recovery import Recovery
+
+
+class TestRecovery(unittest.TestCase):
+
+    def setUp(self):
+        self.booted = True
+        self.server = FakeADBServer(handlers={'getprop sys.boot_completed': lambda cmd: b'1\n' if self.booted else b'\n'})
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def recovery(self, **kwargs):
+        return Recovery(self.server.device_id, server=self.server.address, **kwargs)
+
+    def later(self, delay, func):
+        timer = threading.Timer(delay, func)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_ready(self):
+        start = time.monotonic()
+        self.assertTrue(self.recovery().wait(5))
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(self.server.commands(), ['getprop sys.boot_completed'])
+
+    def test_server_back(self):
+        # 服务器断开 0.5 秒后恢复，应在恢复后立即继续
+        self.server.stop()
+        self.later(0.5, self.server.start)
+        start = time.monotonic()
+        self.assertTrue(self.recovery().wait(5))
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_dropped_connections(self):
+        self.server.drop = True
+        self.later(0.5, lambda: setattr(self.server, 'drop', False))
+        self.assertTrue(self.recovery().wait(5))
+
+    def test_restart(self):
+        # 服务器无响应时只重启一次
+        self.server.stop()
+        restarts = []
+
+        def restart():
+            restarts.append(time.monotonic())
+            self.server.start()
+        self.assertTrue(self.recovery(restart=restart).wait(5))
+        self.assertEqual(len(restarts), 1)
+
+    def test_device_boot(self):
+        # 设备先离线，上线后等待开机完成
+        self.server.state = 'offline'
+        self.booted = False
+        self.later(0.3, lambda: setattr(self.server, 'state', 'device'))
+        self.later(0.8, lambda: setattr(self, 'booted', True))
+        recovery = self.recovery()
+        self.assertTrue(recovery.wait(1.0, Recovery.DEVICE))
+        self.assertFalse(recovery.passed(Recovery.BOOT))
+        start = time.monotonic()
+        self.assertTrue(recovery.wait(5))
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_connect(self):
+        # 网络设备在服务器重启后需要重新 connect
+        self.server.connected = False
+        self.assertTrue(self.recovery(connect=[self.server.device_id]).wait(5))
+        self.assertIn(f'host:connect:{self.server.device_id}', self.server.requests)
+
+    def test_timeout(self):
+        self.booted = False
+        start = time.monotonic()
+        self.assertFalse(self.recovery().wait(0.5))
+        self.assertAlmostEqual(time.monotonic() - start, 0.5, delta=0.2)
+
+    def test_backoff(self):
+        # 指数退避：探测次数远少于固定间隔轮询
+        self.booted = False
+        self.recovery().wait(2)
+        self.assertLess(len(self.server.commands()), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
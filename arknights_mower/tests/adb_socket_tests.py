@@ -0,0 +1,175 @@
+import socket
+import struct
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from arknights_mower.utils.device.adb_client.core import Client
+from arknights_mower.utils.device.adb_client.pool import ShellChannel, ShellChannelError
+from arknights_mower.utils.device.adb_client.session import Session
+from arknights_mower.utils.device.adb_client.socket import Socket
+from arknights_mower.utils.image import raw2img
+
+
+def socket_pair():
+    """ 本地 socket pair，一端包装为 Socket """
+    a, b = socket.socketpair()
+    sock = Socket.__new__(Socket)
+    sock.sock = a
+    return sock, b
+
+
+def raw_screencap(w, h, header=16):
+    data = struct.pack('<III', w, h, 1)
+    if header == 16:
+        data += struct.pack('<I', 0)
+    return data + np.random.randint(0, 256, w * h * 4, np.uint8).tobytes()
+
+
+def send_and_close(sock, data, chunk=100000):
+    for i in range(0, len(data), chunk):
+        sock.sendall(data[i:i+chunk])
+    sock.close()
+
+
+def sync_server(sock, received):
+    """ 按 sync 协议接收 push 的数据 """
+    f = sock.makefile('rb')
+    f.read(4 + 5)
+    sock.sendall(b'OKAY')
+    assert f.read(4) == b'SEND'
+    f.read(struct.unpack('<I', f.read(4))[0])
+    chunks = []
+    while True:
+        cmd = f.read(4)
+        length = struct.unpack('<I', f.read(4))[0]
+        if cmd == b'DONE':
+            break
+        assert cmd == b'DATA' and length <= 65536
+        chunks.append(f.read(length))
+    received.append(b''.join(chunks))
+    sock.sendall(b'OKAY\x00\x00\x00\x00')
+
+
+class TestSocket(unittest.TestCase):
+
+    def recv_raw(self, data):
+        sock, peer = socket_pair()
+        thread = threading.Thread(target=send_and_close, args=(peer, data))
+        thread.start()
+        ret = sock.recv_raw_screencap()
+        thread.join()
+        sock.close()
+        return ret
+
+    def test_raw_screencap(self):
+        for header in (12, 16):
+            data = raw_screencap(64, 48, header)
+            ret = self.recv_raw(data)
+            self.assertEqual(ret, data)
+            self.assertEqual(raw2img(ret).shape, (48, 64, 4))
+
+    def test_not_screencap(self):
+        for data in (b'', b'error', b'/system/bin/sh: screencap: not found\n'):
+            self.assertEqual(self.recv_raw(data), data)
+
+    def test_longer_than_header(self):
+        data = raw_screencap(8, 8) + b'extra'
+        self.assertEqual(self.recv_raw(data), data)
+
+    def test_raw_throughput(self):
+        # 1080p 截图，预分配一次 vs 逐块拼接
+        data = raw_screencap(1920, 1080)
+        elapsed = {}
+        for mode in ('sized', 'chunked'):
+            sock, peer = socket_pair()
+            thread = threading.Thread(target=send_and_close, args=(peer, data, 1 << 20))
+            thread.start()
+            start = time.perf_counter()
+            ret = sock.recv_raw_screencap() if mode == 'sized' else sock.recv_all()
+            elapsed[mode] = time.perf_counter() - start
+            thread.join()
+            sock.close()
+            self.assertEqual(len(ret), len(data))
+        # 至少 100 MB/s
+        self.assertLess(elapsed['sized'], len(data) / 100e6)
+
+
+class TestPush(unittest.TestCase):
+
+    def push(self, data):
+        sock, peer = socket_pair()
+        session = Session.__new__(Session)
+        session.sock, session.timeout, session.device_id = sock, 5, None
+        received = []
+        thread = threading.Thread(target=sync_server, args=(peer, received))
+        thread.start()
+        start = time.perf_counter()
+        session.push('/data/local/tmp/test', data)
+        elapsed = time.perf_counter() - start
+        thread.join()
+        sock.close()
+        peer.close()
+        self.assertEqual(received, [bytes(data)])
+        return elapsed
+
+    def test_push(self):
+        for size in (0, 1, 65536, 65537, 200000):
+            self.push(np.random.randint(0, 256, size, np.uint8).tobytes())
+
+    def test_push_throughput(self):
+        data = np.random.randint(0, 256, 16 << 20, np.uint8).tobytes()
+        # 至少 50 MB/s
+        self.assertLess(self.push(data), len(data) / 50e6)
+
+
+class TestShellChannel(unittest.TestCase):
+
+    def channel(self, answer):
+        """ 对端读入脚本后调用 answer(peer, marker) """
+        sock, peer = socket_pair()
+        channel = ShellChannel(None)
+        channel.sock = sock
+
+        def serve():
+            peer.recv(65536)
+            answer(peer, channel.marker)
+            peer.close()
+        threading.Thread(target=serve, daemon=True).start()
+        return channel
+
+    def client(self, channel):
+        client = Client.__new__(Client)
+        client.channel = channel
+        client.executed = []
+        client.run = lambda cmd: client.executed.append(cmd) or b''
+        return client
+
+    def test_run(self):
+        channel = self.channel(lambda peer, marker: peer.sendall(b'a\n' + marker + b'0\nb\n' + marker + b'1\n'))
+        self.assertEqual(channel.run(['echo a', 'echo b']), [b'a\n', b'b\n'])
+
+    def test_fail_after_sent(self):
+        channel = self.channel(lambda peer, marker: peer.sendall(marker + b'0\n'))
+        client = self.client(channel)
+        # 命令已经发出，可能已经执行过，不能再用 exec 重复执行
+        with self.assertRaises(ShellChannelError) as cm:
+            client.shell_batch(['input keyevent 4', 'input tap 1 1'])
+        self.assertEqual(cm.exception.outputs, [b''])
+        self.assertEqual(client.executed, [])
+        self.assertIsNone(channel.sock)
+
+    def test_fail_before_sent(self):
+        def refuse():
+            raise ConnectionRefusedError()
+        channel = ShellChannel(None)
+        channel.open = refuse
+        client = self.client(channel)
+        self.assertEqual(client.shell_batch(['input keyevent 4']), [b''])
+        self.assertEqual(client.executed, ['input keyevent 4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
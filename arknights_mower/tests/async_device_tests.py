@@ -0,0 +1,128 @@
+import asyncio
+import struct
+import time
+import unittest
+
+from arknights_mower.tests.fake_adb_server import FakeADBServer
+from arknights_mower.utils.device.adb_client.async_session import AsyncSession
+from arknights_mower.utils.device.async_device import AsyncDevice, SyncDevice
+from arknights_mower.utils.device.device import Device
+
+# 一张 2x1 的 RGBA 原始截图
+RAW_SCREENCAP = struct.pack('<IIII', 2, 1, 1, 0) + b'\xff' * 8
+
+
+class TestAsyncDevice(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeADBServer(handlers={'screencap': RAW_SCREENCAP, 'echo': lambda cmd: cmd[5:].encode()})
+        self.server.start()
+        self.device = AsyncDevice(self.server.device_id, server=self.server.address)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_run(self):
+        self.assertEqual(asyncio.run(self.device.run('echo ok')), b'ok')
+        self.assertEqual(self.server.requests, [f'host:transport:{self.server.device_id}', 'exec:echo ok'])
+
+    def test_devices_list(self):
+        async def devices():
+            async with AsyncSession(self.server.address) as session:
+                return await session.devices_list()
+        self.assertEqual(asyncio.run(devices()), [(self.server.device_id, 'device')])
+
+    def test_unknown_device(self):
+        # 服务器返回 FAIL 时不重试
+        device = AsyncDevice('unknown', server=self.server.address)
+        with self.assertRaises(ConnectionError):
+            asyncio.run(device.run('echo ok'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_screencap_raw(self):
+        self.assertEqual(asyncio.run(self.device.screencap_raw()), RAW_SCREENCAP)
+        self.assertEqual(self.device.frame_size, (2, 1))
+
+    def test_input(self):
+        async def operate():
+            await self.device.tap((1, 2))
+            await self.device.swipe((1, 2), (3, 4), 200)
+            await self.device.send_keyevent(4)
+        asyncio.run(operate())
+        self.assertEqual(self.server.commands(), ['input tap 1 2', 'input swipe 1 2 3 4 200', 'input keyevent 4'])
+        self.assertGreater(self.device.last_input, 0)
+
+    def test_control(self):
+        # minitouch/scrcpy 的阻塞调用在线程池中执行
+        calls = []
+
+        class FakeControl(object):
+            def tap(self, point):
+                calls.append(('tap', point))
+
+            def swipe(self, start, end, duration):
+                calls.append(('swipe', start, end, duration))
+        device = AsyncDevice(self.server.device_id, FakeControl(), self.server.address)
+
+        async def operate():
+            await device.tap((1, 2))
+            await device.swipe((1, 2), (3, 4), 200)
+        asyncio.run(operate())
+        self.assertEqual(calls, [('tap', (1, 2)), ('swipe', (1, 2), (3, 4), 200)])
+        self.assertEqual(self.server.commands(), [])
+
+    def test_concurrent(self):
+        # 两次截图同时进行，总耗时接近一次
+        self.server.delay = 0.3
+
+        async def capture():
+            return await asyncio.gather(self.device.screencap_raw(), self.device.screencap_raw())
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(capture()), [RAW_SCREENCAP] * 2)
+        self.assertLess(time.monotonic() - start, 0.55)
+
+
+class TestSyncDevice(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeADBServer(handlers={'screencap': RAW_SCREENCAP})
+        self.server.start()
+        # 不连接设备的 Device，只共享最后一次输入与画面尺寸
+        self.blocking = Device.__new__(Device)
+        self.blocking.last_input = 0.0
+        self.blocking.frame_size = None
+        self.blocking.display = None
+        self.device = SyncDevice(AsyncDevice(self.server.device_id, server=self.server.address, device=self.blocking))
+        self.blocking.facade = self.device
+
+    def tearDown(self):
+        self.device.close()
+        self.server.stop()
+
+    def test_facade(self):
+        self.device.tap((5, 6))
+        self.device.send_text('a"b')
+        self.assertEqual(self.device.screencap_raw(), RAW_SCREENCAP)
+        self.assertEqual(self.server.commands(), ['input tap 5 6', 'input text "a\\"b"', 'screencap 2>/dev/null'])
+        # 后台截图以 Device 的最后一次输入判断画面是否过时
+        self.assertGreater(self.blocking.last_input, 0)
+        self.assertEqual(self.device.last_input, self.blocking.last_input)
+        self.assertEqual(self.blocking.frame_size, (2, 1))
+
+    def test_device(self):
+        # 开启 async_adb 时 Device 的截图经由 asyncio 执行
+        self.assertEqual(self.blocking.screencap_raw(), RAW_SCREENCAP)
+        self.assertEqual(self.server.commands(), ['screencap 2>/dev/null'])
+
+    def test_overlap(self):
+        # 识别当前帧的同时获取下一帧
+        self.server.delay = 0.3
+        start = time.monotonic()
+        future = self.device.submit(self.device.device.screencap_raw())
+        time.sleep(0.3)
+        self.assertEqual(future.result(), RAW_SCREENCAP)
+        self.assertLess(time.monotonic() - start, 0.55)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+
+from arknights_mower.ocr.ctc import CTC_MIN_SCORE, Trie, constrained_decode, log_probs, vocabulary
+
+CHARS = ['夜', '刀', '力', '烟', '跃', '山']
+CHARSET = {char: i + 1 for i, char in enumerate(CHARS)}
+
+
+def frames(*steps):
+    """ 每帧给出 {字符: 概率}，其余概率平分给 blank 之外的类 """
+    logits = []
+    for step in steps:
+        p = np.full(len(CHARS) + 1, 0.01)
+        for char, prob in step.items():
+            p[0 if char == '' else CHARSET[char]] = prob
+        logits.append(p / p.sum())
+    return np.log(np.array(logits))
+
+
+def greedy(logp):
+    chars, last = [], 0
+    for idx in logp.argmax(axis=1):
+        if idx != 0 and idx != last:
+            chars.append(CHARS[idx - 1])
+        last = idx
+    return ''.join(chars)
+
+
+class TestConstrainedDecode(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = Trie(['夜刀', '夜烟', '跃跃', '山'])
+
+    def test_exact(self):
+        logp = frames({'夜': 0.9}, {'': 0.9}, {'刀': 0.9}, {'': 0.9})
+        word, score = constrained_decode(logp, self.trie, CHARSET)
+        self.assertEqual(word, '夜刀')
+        self.assertGreater(score, 0.9)
+
+    def test_misread(self):
+        # 自由解码读成不存在的“夜力”，约束解码得到“夜刀”
+        logp = frames({'夜': 0.9}, {'': 0.9}, {'力': 0.6, '刀': 0.3}, {'': 0.9})
+        self.assertEqual(greedy(logp), '夜力')
+        word, score = constrained_decode(logp, self.trie, CHARSET)
+        self.assertEqual(word, '夜刀')
+        self.assertGreater(score, 0.3)
+        self.assertLess(score, 1)
+
+    def test_repeated(self):
+        # 重复字符之间需要 blank
+        logp = frames({'跃': 0.9}, {'跃': 0.9}, {'': 0.9}, {'跃': 0.9})
+        self.assertEqual(constrained_decode(logp, self.trie, CHARSET)[0], '跃跃')
+        # 没有 blank 时只读到一个“跃”，得分很低
+        logp = frames({'跃': 0.9}, {'跃': 0.9}, {'跃': 0.9})
+        self.assertLess(constrained_decode(logp, self.trie, CHARSET)[1], CTC_MIN_SCORE)
+
+    def test_no_word(self):
+        logp = frames({'': 0.9}, {'': 0.9})
+        self.assertLess(constrained_decode(logp, self.trie, CHARSET)[1], CTC_MIN_SCORE)
+        # 词表中的字符不在模型字符集中
+        self.assertEqual(constrained_decode(frames({'夜': 0.9}), Trie(['W']), CHARSET), (None, 0.0))
+
+    def test_log_probs(self):
+        logits = np.random.randn(5, 7) * 3
+        logp = log_probs(logits)
+        np.testing.assert_allclose(np.exp(logp).sum(axis=1), 1)
+        np.testing.assert_allclose(log_probs(np.exp(logp)), logp, atol=1e-6)
+
+    def test_vocabulary(self):
+        trie = vocabulary('agent')
+        self.assertIn('夜刀', trie.words)
+        self.assertIs(vocabulary('agent'), trie)
+        self.assertIn('1-7', vocabulary('level').words)
+        self.assertIn('高级资深干员', vocabulary('recruit_tag').words)
+        # 干员名需要更高的得分，新干员不会被读成其他干员
+        self.assertGreater(vocabulary('agent').min_score, CTC_MIN_SCORE)
+        self.assertEqual(vocabulary('level').min_score, CTC_MIN_SCORE)
+
+
+class TestBucket(unittest.TestCase):
+
+    def test_preprocess(self):
+        from PIL import Image
+
+        from arknights_mower.ocr.crnn import CRNNHandle
+        from arknights_mower.ocr.utils import resizeNormalize
+        crop = np.random.randint(0, 256, (40, 300, 3), np.uint8)
+        image = CRNNHandle.preprocess(crop)
+        expected = resizeNormalize((240, 32))(Image.fromarray(crop).convert('L'))
+        self.assertEqual(image.shape, (3, 32, 240))
+        np.testing.assert_array_equal(image[0], expected[..., 0])
+
+    def test_trim(self):
+        from arknights_mower.ocr.crnn import CRNN_BUCKET_WIDTH, CRNNHandle
+        preds = np.zeros((81, 5))
+        self.assertEqual(CRNNHandle.trim(preds, 320, 320).shape[0], 81)
+        # 填充的列对应的输出被截掉，保留按宽度比例的部分
+        self.assertEqual(CRNNHandle.trim(preds, 320 - CRNN_BUCKET_WIDTH + 1, 320).shape[0], 75)
+        self.assertEqual(CRNNHandle.trim(preds, 1, 320).shape[0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+""" 测试用的本地 ADB server，按 ADB 协议应答，不需要真实设备 """
+from __future__ import annotations
+
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Union
+
+# output of a command, or a function of the command returning its output
+Handler = Union[bytes, Callable[[str], bytes]]
+
+
+class FakeADBServer(object):
+    """ a local ADB server with a single device, the output of each command is given by handlers """
+
+    def __init__(self, device_id: str = 'emulator-5554', handlers: dict[str, Handler] = None,
+                 delay: float = 0) -> None:
+        self.device_id = device_id
+        # command prefix -> output, the longest matching prefix wins
+        self.handlers: dict[str, Handler] = handlers or {}
+        # seconds to wait before answering a command, to simulate a slow device
+        self.delay = delay
+        self.version = 41
+        # state in `adb devices`, e.g. offline or unauthorized
+        self.state = 'device'
+        # a network device is listed only after `adb connect`
+        self.connected = True
+        # close every connection at once, like a hung server
+        self.drop = False
+        # bound to a random port at first, then the same port after restarts
+        self.port = 0
+        # every request received, in order
+        self.requests: list[str] = []
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return ('127.0.0.1', self.port)
+
+    def __enter__(self) -> FakeADBServer:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """ listen on 127.0.0.1 """
+        fake = self
+
+        class RequestHandler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                fake.serve(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', self.port), RequestHandler)
+        self.port = self.server.server_address[1]
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """ shut the server down, like `adb kill-server`; start() brings it back on the same port """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def commands(self) -> list[str]:
+        """ commands executed on the device """
+        with self.lock:
+            return [req[5:] for req in self.requests if req.startswith('exec:') or req.startswith('shell:')]
+
+    def output(self, cmd: str) -> bytes:
+        prefixes = [prefix for prefix in self.handlers if cmd.startswith(prefix)]
+        if not len(prefixes):
+            return b''
+        handler = self.handlers[max(prefixes, key=len)]
+        return handler(cmd) if callable(handler) else handler
+
+    @staticmethod
+    def recv_exactly(sock: socket.socket, n: int) -> bytes:
+        data = b''
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not len(chunk):
+                raise EOFError
+            data += chunk
+        return data
+
+    @staticmethod
+    def okay(sock: socket.socket, payload: bytes = None) -> None:
+        if payload is None:
+            sock.sendall(b'OKAY')
+        else:
+            sock.sendall(b'OKAY%04X%b' % (len(payload), payload))
+
+    @staticmethod
+    def fail(sock: socket.socket, message: bytes) -> None:
+        sock.sendall(b'FAIL%04X%b' % (len(message), message))
+
+    def serve(self, sock: socket.socket) -> None:
+        """ answer the requests of a connection, a transport request may be followed by a device service """
+        try:
+            while not self.drop:
+                length = int(self.recv_exactly(sock, 4), 16)
+                req = self.recv_exactly(sock, length).decode()
+                with self.lock:
+                    self.requests.append(req)
+                if req == 'host:version':
+                    self.okay(sock, b'%04x' % self.version)
+                    return
+                elif req == 'host:devices':
+                    self.okay(sock, f'{self.device_id}\t{self.state}\n'.encode() if self.connected else b'')
+                    return
+                elif req.startswith('host:connect:'):
+                    if req[13:] == self.device_id:
+                        self.connected = True
+                    self.okay(sock, f'connected to {req[13:]}'.encode())
+                    return
+                elif req in ('host:transport-any', f'host:transport:{self.device_id}') \
+                        and self.connected and self.state == 'device':
+                    self.okay(sock)
+                elif req.startswith('host:transport:'):
+                    self.fail(sock, f"device '{req[15:]}' not found".encode())
+                    return
+                elif req.startswith('exec:') or req.startswith('shell:'):
+                    self.okay(sock)
+                    if self.delay:
+                        time.sleep(self.delay)
+                    sock.sendall(self.output(req.split(':', 1)[1]))
+                    return
+                else:
+                    self.fail(sock, b'unknown host service')
+                    return
+        except (EOFError, OSError):
+            pass
+        finally:
+            sock.close()
@@ -0,0 +1,50 @@
+import time
+import unittest
+
+import numpy as np
+
+from arknights_mower.utils.device.device import Device
+from arknights_mower.utils.device.frame_source import ScrcpySource
+
+
+class FakeScrcpy(object):
+    """ 只记录是否关闭了视频流的 scrcpy """
+
+    def __init__(self):
+        self.video_socket = None
+        self.dropped = False
+
+    def drop_video(self):
+        self.dropped = True
+
+
+class TestScrcpySource(unittest.TestCase):
+
+    def setUp(self):
+        self.scrcpy = FakeScrcpy()
+        self.source = ScrcpySource(self.scrcpy)
+        # 不启动解码线程，直接放入画面
+        self.source.running = True
+        self.source.push(time.monotonic(), np.zeros((4, 4, 3), np.uint8))
+
+    def test_latest(self):
+        self.assertIsNotNone(self.source.latest(after=0, timeout=0))
+        # 早于最后一次输入的画面不会被当作当前画面
+        self.assertIsNone(self.source.latest(after=time.monotonic() + 1, timeout=0.01))
+
+    def test_stopped(self):
+        device = Device.__new__(Device)
+        device.control = Device.Control.__new__(Device.Control)
+        device.control.scrcpy = self.scrcpy
+        device.frame_source = self.source
+        device.last_input = 0.0
+        self.assertIsNotNone(device.latest_frame())
+        # 解码线程退出后视频流无人读取，scrcpy 以无视频模式重启
+        self.source.running = False
+        self.assertIsNone(device.latest_frame())
+        self.assertTrue(self.scrcpy.dropped)
+        self.assertIsNone(device.frame_source)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from arknights_mower.utils.location_prior import PRIOR_CANDIDATES, PRIOR_MIN_HITS, LocationPriors
+
+
+class TestLocationPriors(unittest.TestCase):
+
+    def setUp(self):
+        self.priors = LocationPriors()
+        self.priors.priors = {}
+        self.priors.register_unique('ope_plan')
+        for _ in range(PRIOR_MIN_HITS):
+            self.priors.record('ope_plan', 1920, 1080, [[1500, 900], [1800, 1000]])
+
+    def test_scope(self):
+        self.assertEqual(self.priors.scope('ope_plan', 1920, 1080), [[1446, 846], [1854, 1054]])
+        self.assertIsNone(self.priors.scope('ope_plan', 1280, 720))
+        self.assertIsNone(self.priors.scope('nav_button', 1920, 1080))
+
+    def test_inconclusive(self):
+        # 先验范围内几乎没有匹配点时，认为模板不在画面上
+        self.assertFalse(self.priors.inconclusive('ope_plan', 1920, 1080, 0))
+        self.assertTrue(self.priors.inconclusive('ope_plan', 1920, 1080, PRIOR_CANDIDATES))
+        # 模板离开过先验范围后，每次未命中都搜索全屏
+        self.priors.record_miss('ope_plan', 1920, 1080)
+        self.priors.record_fallback('ope_plan', 1920, 1080, True)
+        self.priors.record('ope_plan', 1920, 1080, [[100, 900], [400, 1000]])
+        self.assertTrue(self.priors.inconclusive('ope_plan', 1920, 1080, 0))
+        prior = self.priors.get('ope_plan', 1920, 1080)
+        self.assertEqual((prior['miss'], prior['fallback'], prior['escape']), (1, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from arknights_mower.data import template_roi
+from arknights_mower.utils import template
+from arknights_mower.utils.recognize import Recognizer
+
+
+def recognizer(gray):
+    """ 不连接设备的 Recognizer，只用于模板匹配 """
+    r = Recognizer.__new__(Recognizer)
+    r.gray = gray
+    r.h, r.w = gray.shape
+    r.matcher = None
+    r.find_cache = {}
+    return r
+
+
+class TestMatchRoi(unittest.TestCase):
+
+    def setUp(self):
+        self.tpl = template.get('nav_button')
+        gray = np.random.RandomState(0).randint(0, 64, (1080, 1920)).astype(np.uint8)
+        h, w = self.tpl.img.shape
+        gray[15:15 + h, 20:20 + w] = self.tpl.img
+        self.r = recognizer(gray)
+
+    def test_coordinates(self):
+        h, w = self.tpl.img.shape
+        meta = template_roi['nav_button']
+        decided, ret = self.r.match_roi(self.tpl, meta)
+        self.assertTrue(decided)
+        self.assertEqual(ret, [[20, 15], [20 + w, 15 + h]])
+        # 二值化时与 Matcher 一样，返回相对于 scope 的坐标
+        scope = ((10, 5), (580, 108))
+        decided, ret = self.r.match_roi(self.tpl.thres(128), meta, scope, 128)
+        self.assertTrue(decided)
+        self.assertEqual(ret, [[10, 10], [10 + w, 10 + h]])
+
+    def test_fallback(self):
+        # 需要分数或者宽松判断时不走快速路径
+        with mock.patch.object(Recognizer, 'match_roi', return_value=(True, None)) as match_roi:
+            self.r.find('nav_button', thres=128, scope=((0, 0), (580, 108)), score=0.5)
+            self.r.find('nav_button', thres=128, scope=((0, 0), (580, 108)), judge=False)
+            match_roi.assert_not_called()
+            self.assertIsNone(self.r.find('nav_button', thres=128, scope=((0, 0), (580, 108))))
+            match_roi.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import socket
+import threading
+import time
+import unittest
+
+from arknights_mower.utils.device.minitouch.session import Session
+
+HEADER = b'v 1\n^ 10 1079 1919 255\n$ 1234\n'
+
+
+class FakeMinitouch(object):
+    """ 发送 header 后按需关闭连接的 minitouch """
+
+    def __init__(self, header=HEADER):
+        self.header = header
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.conn = None
+        self.accepted = threading.Event()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        self.conn, _ = self.server.accept()
+        self.conn.sendall(self.header)
+        if not self.header:
+            self.conn.close()
+        self.accepted.set()
+
+    def close(self):
+        self.accepted.wait(1)
+        self.conn and self.conn.close()
+        self.server.close()
+
+
+class TestSession(unittest.TestCase):
+
+    def test_alive(self):
+        server = FakeMinitouch()
+        session = Session(server.port)
+        self.assertEqual((session.max_x, session.max_y, session.pid), ('1079', '1919', '1234'))
+        self.assertTrue(session.alive())
+        session.send('c\n')
+        self.assertTrue(session.alive())
+        # 服务端关闭后，写入仍可能成功，需要主动检查
+        server.close()
+        for _ in range(100):
+            if not session.alive():
+                break
+            time.sleep(0.01)
+        self.assertFalse(session.alive())
+        session.close()
+        self.assertFalse(session.alive())
+
+    def test_invalid_header(self):
+        # adb 转发的端口在 minitouch 退出后仍能连接，但会立刻断开
+        server = FakeMinitouch(b'')
+        with self.assertRaises(ConnectionError):
+            Session(server.port)
+        server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+
+from arknights_mower.utils.runtime import ModelRuntime
+
+
+class SlowModel(object):
+    """ 加载较慢的模型，记录调用 """
+
+    loads = 0
+
+    def __init__(self):
+        time.sleep(0.05)
+        SlowModel.loads += 1
+        self.calls = []
+
+    def __call__(self, x):
+        self.calls.append(x)
+        return x * 2
+
+
+class TestModelRuntime(unittest.TestCase):
+
+    def setUp(self):
+        SlowModel.loads = 0
+
+    def test_lazy(self):
+        runtime = ModelRuntime()
+        model = runtime.register('slow', SlowModel)
+        self.assertFalse(runtime.loaded('slow'))
+        self.assertEqual(model(3), 6)
+        self.assertTrue(runtime.loaded('slow'))
+        self.assertEqual(runtime.timings['slow'].runs, 1)
+
+    def test_load_once(self):
+        runtime = ModelRuntime()
+        model = runtime.register('slow', SlowModel)
+        threads = [threading.Thread(target=model, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowModel.loads, 1)
+        self.assertEqual(sorted(model.instance.calls), list(range(8)))
+
+    def test_warmup(self):
+        runtime = ModelRuntime()
+        runtime.register('slow', SlowModel, lambda instance: instance(0))
+        runtime.register('broken', lambda: open('/nonexistent/model.onnx'))
+        runtime.warmup().join()
+        self.assertTrue(runtime.loaded('slow'))
+        self.assertEqual(runtime.get('slow').calls, [0])
+        # 预热不计入推理时间
+        self.assertEqual(runtime.timings['slow'].runs, 0)
+        self.assertFalse(runtime.loaded('broken'))
+        with self.assertRaises(OSError):
+            runtime.get('broken')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from arknights_mower.utils.ocr_cache import CACHE_VERSION, OcrCache, fingerprint
+
+
+class FakeOcr(object):
+    """ 记录调用次数的 OCR """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, img, use_det=True):
+        self.calls += 1
+        return [[[0, 0], f'{int(img.sum())}', 0.9]]
+
+
+class TestOcrCache(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.cache_file = tempfile.mkstemp(suffix='.pkl')
+        os.close(fd)
+        os.remove(self.cache_file)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+
+    def test_hit(self):
+        cache = OcrCache(1 << 20, self.cache_file, False)
+        ocr = FakeOcr()
+        func = cache.cached('fake', ocr)
+        img = np.random.randint(0, 256, (32, 100, 3), np.uint8)
+        first = func(img)
+        first[0][1] = 'modified'
+        self.assertEqual(func(img.copy()), ocr(img))
+        self.assertEqual(ocr.calls, 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # 参数、形状不同的调用不共享结果
+        func(img, use_det=False)
+        func(img.reshape(100, 32, 3))
+        self.assertEqual(ocr.calls, 4)
+        # 视图与其连续副本命中同一条
+        func(img[:, :50])
+        func(np.ascontiguousarray(img[:, :50]))
+        self.assertEqual(ocr.calls, 5)
+
+    def test_bounded(self):
+        cache = OcrCache(2000, self.cache_file, False)
+        func = cache.cached('fake', FakeOcr())
+        imgs = [np.full((8, 8), i, np.uint8) for i in range(100)]
+        for img in imgs:
+            func(img)
+        self.assertLessEqual(cache.size, 2000)
+        self.assertLess(len(cache.entries), 100)
+        # 最近使用的保留，最早的被淘汰
+        self.assertTrue(cache.get(cache.key('fake', imgs[-1]))[0])
+        self.assertFalse(cache.get(cache.key('fake', imgs[0]))[0])
+
+    def test_disabled(self):
+        cache = OcrCache(0, self.cache_file, False)
+        ocr = FakeOcr()
+        func = cache.cached('fake', ocr)
+        img = np.zeros((8, 8), np.uint8)
+        func(img)
+        func(img)
+        self.assertEqual(ocr.calls, 2)
+
+    def test_persist(self):
+        img = np.random.randint(0, 256, (32, 100), np.uint8)
+        cache = OcrCache(1 << 20, self.cache_file, True)
+        ocr = FakeOcr()
+        cache.cached('fake', ocr)(img)
+        cache.save()
+        cache = OcrCache(1 << 20, self.cache_file, True)
+        self.assertEqual(cache.cached('fake', ocr)(img), ocr(img))
+        self.assertEqual(ocr.calls, 2)
+        with open(self.cache_file, 'rb') as f:
+            entries = pickle.load(f)['entries']
+        # 版本不同或由其他模型、词表生成的缓存文件被丢弃
+        for calls, data in enumerate([{'version': CACHE_VERSION + 1, 'fingerprint': fingerprint()},
+                                      {'version': CACHE_VERSION, 'fingerprint': 'other'},
+                                      {'version': CACHE_VERSION}], 3):
+            with open(self.cache_file, 'wb') as f:
+                pickle.dump({**data, 'entries': entries}, f)
+            cache = OcrCache(1 << 20, self.cache_file, True)
+            cache.cached('fake', ocr)(img)
+            self.assertEqual(ocr.calls, calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from arknights_mower.utils.matcher import Matcher
+from arknights_mower.utils.recognize import INFRA_SCENE_RULES, SCENE_RULES, Recognizer
+from arknights_mower.utils.scene import Scene
+
+
+def recognizer(last_scene=None, transitions=None):
+    """ 不连接设备的 Recognizer，只用于排序规则 """
+    r = Recognizer.__new__(Recognizer)
+    r.matcher = None
+    r.last_scene = last_scene
+    r.transitions = transitions or {}
+    return r
+
+
+class TestOrderedRules(unittest.TestCase):
+
+    def check_pinned(self, rules, ordered):
+        self.assertCountEqual(ordered, rules)
+        # 固定的规则位置不变，其余规则不会越过它们
+        for idx, rule in enumerate(rules):
+            if rule.pinned:
+                self.assertIs(ordered[idx], rule)
+
+    def test_no_hint(self):
+        self.assertEqual(recognizer().ordered_rules(SCENE_RULES), SCENE_RULES)
+
+    def test_expected(self):
+        ordered = recognizer().ordered_rules(SCENE_RULES, [Scene.INFRA_MAIN, Scene.FRIEND_LIST_OFF])
+        self.check_pinned(SCENE_RULES, ordered)
+        # 同一段内的画面规则按提示前移
+        main = next(x for x in ordered if Scene.INFRA_MAIN in x.scenes)
+        visiting = next(x for x in ordered if Scene.FRIEND_VISITING in x.scenes)
+        self.assertLess(ordered.index(main), ordered.index(visiting))
+        # friend_list_on 始终在 friend_list 之前
+        on = next(x for x in ordered if Scene.FRIEND_LIST_ON in x.scenes)
+        off = next(x for x in ordered if Scene.FRIEND_LIST_OFF in x.scenes)
+        self.assertLess(ordered.index(on), ordered.index(off))
+
+    def test_transitions(self):
+        r = recognizer(Scene.OPERATOR_BEFORE, {Scene.OPERATOR_BEFORE: Counter({Scene.OPERATOR_FINISH: 3, Scene.LOADING: 5})})
+        ordered = r.ordered_rules(SCENE_RULES)
+        self.check_pinned(SCENE_RULES, ordered)
+        # 弹窗与加载界面不会被画面规则越过
+        finish = next(x for x in ordered if Scene.OPERATOR_FINISH in x.scenes)
+        confirm = next(x for x in ordered if Scene.DOUBLE_CONFIRM in x.scenes)
+        self.assertLess(ordered.index(confirm), ordered.index(next(x for x in ordered if Scene.OPERATOR_FAILED in x.scenes)))
+        self.assertLess(ordered.index(finish), ordered.index(confirm))
+        self.check_pinned(INFRA_SCENE_RULES, r.ordered_rules(INFRA_SCENE_RULES, [Scene.INFRA_MAIN]))
+
+    def test_shadowing(self):
+        # 可能出现在同一画面上的规则，无论提示如何都保持原来的先后
+        pairs = [('arrange_check_in', 'infra_overview_in'), ('agent_unlock', 'shop_credit_2'),
+                 ('login_logo', 'login_iknow')]
+        later = [Scene.INFRA_ARRANGE, Scene.SHOP_OTHERS, Scene.LOGIN_ANNOUNCE]
+        for rules in (SCENE_RULES, INFRA_SCENE_RULES):
+            for ordered in (recognizer().ordered_rules(rules, later),
+                            recognizer(Scene.INDEX, {Scene.INDEX: Counter(later)}).ordered_rules(rules)):
+                self.check_pinned(rules, ordered)
+                res = [x.res for x in ordered]
+                for first, second in pairs:
+                    if first in res and second in res:
+                        self.assertLess(res.index(first), res.index(second), (first, second))
+
+
+class TestClassifyScene(unittest.TestCase):
+
+    def test_fresh_frame(self):
+        r = recognizer()
+        r.matcher = Matcher(np.random.RandomState(0).randint(0, 256, (720, 1280), np.uint8))
+        self.assertIsNone(r.classify_scene(SCENE_RULES))
+        # 分类时提取整帧的特征，之后的 find() 直接复用
+        self.assertCountEqual(r.matcher.tiles, r.matcher.tiles_of())
+
+
+if __name__ == '__main__':
+    unittest.main()
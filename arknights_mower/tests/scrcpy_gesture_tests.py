@@ -0,0 +1,114 @@
+import socket
+import struct
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from arknights_mower.utils.device.scrcpy import Scrcpy, const
+from arknights_mower.utils.device.scrcpy.gesture import Gesture
+
+PACKET_SIZE = 28
+
+
+class FakeScrcpy(Scrcpy):
+    """ 不启动 scrcpy-server，控制数据写入 socketpair """
+
+    def start(self):
+        self.resolution = (1920, 1080)
+        self.control_socket, self.device_socket = socket.socketpair()
+
+
+def receive(sock, arrivals):
+    # 记录每个触摸事件的到达时间和内容
+    buffer = b''
+    while True:
+        data = sock.recv(65536)
+        if not len(data):
+            return
+        now = time.perf_counter()
+        buffer += data
+        while len(buffer) >= PACKET_SIZE:
+            _, action, _, x, y = struct.unpack('>BBqii', buffer[:18])
+            arrivals.append((now, action, x, y))
+            buffer = buffer[PACKET_SIZE:]
+
+
+class TestGesture(unittest.TestCase):
+
+    def test_packet(self):
+        # 与 ControlSender.touch 的数据包一致
+        client = FakeScrcpy(None)
+        expected = client.control.touch(100, 200, const.ACTION_DOWN)
+        client.device_socket.recv(PACKET_SIZE)
+        self.assertEqual(Gesture(client.resolution).down(100, 200).events[0][1], expected)
+        client.stop()
+
+    def test_trajectory(self):
+        gesture = Gesture((1920, 1080)).down(0, 0).move(100, 0, 0.5, 'ease_in_out').hold(0.2).up()
+        offsets = [offset for offset, _ in gesture.events]
+        self.assertEqual(offsets, sorted(offsets))
+        self.assertAlmostEqual(gesture.duration, 0.7)
+        # 30 次移动，停顿结束时再报告一次位置，然后抬起
+        self.assertEqual(len(gesture.events), 1 + 30 + 1 + 1)
+        xs = [struct.unpack('>i', package[10:14])[0] for _, package in gesture.events]
+        self.assertEqual(xs[-3:], [100, 100, 100])
+        # 缓动：中间快，两端慢
+        steps = np.diff(xs[1:32])
+        self.assertGreater(steps[15], steps[0])
+        self.assertGreater(steps[15], steps[-1])
+
+    def test_jitter(self):
+        client = FakeScrcpy(None)
+        arrivals = []
+        thread = threading.Thread(target=receive, args=(client.device_socket, arrivals))
+        thread.start()
+        points = [(100, 500), (100, 600), (900, 600), (900, 500)]
+        start = time.perf_counter()
+        client.swipe_ext(points, [0.2, 0.5, 0.2], 0.1)
+        elapsed = time.perf_counter() - start
+        client.control_socket.close()
+        thread.join()
+
+        self.assertEqual(arrivals[0][1:], (const.ACTION_DOWN, 100, 500))
+        self.assertEqual(arrivals[-1][1:], (const.ACTION_UP, 900, 500))
+        self.assertAlmostEqual(elapsed, 1.0, delta=0.05)
+        # 实际到达时间与计划时间之差
+        gesture = Gesture(client.resolution).down(*points[0])
+        for point, duration in zip(points[1:], [0.2, 0.5, 0.2]):
+            gesture.move(*point, duration)
+        gesture.hold(0.1).up()
+        planned = np.array([offset for offset, _ in gesture.events])
+        actual = np.array([arrival[0] for arrival in arrivals]) - arrivals[0][0]
+        self.assertEqual(len(planned), len(actual))
+        jitter = np.abs(actual - planned)
+        self.assertLess(np.percentile(jitter, 95), 0.005)
+        self.assertLess(jitter.max(), 0.02)
+
+    def test_tap_batch(self):
+        client = FakeScrcpy(None)
+        arrivals = []
+        thread = threading.Thread(target=receive, args=(client.device_socket, arrivals))
+        thread.start()
+        points = [(100, 200), (300, 400), (500, 600)]
+        start = time.perf_counter()
+        client.tap_batch(points, interval=0.05)
+        elapsed = time.perf_counter() - start
+        client.control_socket.close()
+        thread.join()
+        self.assertEqual([arrival[1:] for arrival in arrivals],
+                         [(action, *point) for point in points for action in (const.ACTION_DOWN, const.ACTION_UP)])
+        # 每次按住 0.07 秒，间隔 0.05 秒
+        self.assertAlmostEqual(elapsed, 0.07 * 3 + 0.05 * 2, delta=0.03)
+
+    def test_throughput(self):
+        # 预计算和打包不应成为瓶颈
+        start = time.perf_counter()
+        for _ in range(1000):
+            Gesture((1920, 1080)).down(0, 0).move(100, 0, 0.2).move(100, 500, 0.5).hold(0.1).up().packets()
+        self.assertLess((time.perf_counter() - start) / 1000, 0.002)
+
+
+if __name__ == '__main__':
+    unittest.main()
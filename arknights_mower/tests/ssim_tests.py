@@ -0,0 +1,52 @@
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from arknights_mower import __rootdir__
+from arknights_mower.utils.matcher import ssim
+
+try:
+    from skimage.metrics import structural_similarity
+except ImportError:
+    structural_similarity = None
+
+
+def compare_ssim(img1, img2):
+    """ 原先的实现，skimage 0.19 起 multichannel 改为 channel_axis """
+    try:
+        return structural_similarity(img1, img2, channel_axis=-1)
+    except TypeError:
+        return structural_similarity(img1, img2, multichannel=True)
+
+
+@unittest.skipIf(structural_similarity is None, 'skimage is not installed')
+class TestSsim(unittest.TestCase):
+
+    def test_templates(self):
+        rng = np.random.default_rng(0)
+        paths = sorted(Path(f'{__rootdir__}/resources').glob('*.png'))
+        self.assertTrue(len(paths))
+        for path in paths:
+            img = cv2.imdecode(np.fromfile(str(path), np.uint8), cv2.IMREAD_GRAYSCALE)
+            if img is None or img.shape[0] < 7:
+                continue
+            # skimage 逐列计算，较宽的模板只取左侧以缩短用时
+            img = img[:, :48]
+            # 模板与加噪、平移后的自身比较
+            noisy = np.clip(img + rng.normal(0, 20, img.shape), 0, 255).astype(np.uint8)
+            shifted = np.roll(img, 3, axis=1)
+            for other in (noisy, shifted):
+                self.assertAlmostEqual(ssim(img, other), compare_ssim(img, other), places=9, msg=path.name)
+
+    def test_small(self):
+        with self.assertRaises(ValueError):
+            ssim(np.zeros((6, 100), np.uint8), np.zeros((6, 100), np.uint8))
+        # 只有高度受窗口限制，与原先一致
+        img = np.random.randint(0, 256, (7, 3), np.uint8)
+        self.assertAlmostEqual(ssim(img, img[::-1]), compare_ssim(img, img[::-1]), places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
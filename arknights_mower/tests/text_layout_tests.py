@@ -0,0 +1,50 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from arknights_mower.ocr import ocrhandle
+from arknights_mower.ocr.layout import TextBands
+
+
+def box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+class TestTextBands(unittest.TestCase):
+
+    def test_record(self):
+        bands = TextBands()
+        self.assertIsNone(bands.rois('agent', 1920, 1080))
+        bands.record('agent', 1920, 1080, [box(0, 100, 50, 120), box(300, 104, 350, 124), box(0, 500, 50, 540)])
+        self.assertEqual(bands.rois('agent', 1920, 1080), [[[0, 90], [1920, 134]], [[0, 480], [1920, 560]]])
+        # 不同尺寸分别记录
+        self.assertIsNone(bands.rois('agent', 1280, 720))
+        # 从屏幕上横向裁剪的图像按屏幕尺寸记录，ROI 的宽度取裁剪的宽度
+        self.assertEqual(bands.rois('agent', 1920, 1080, 1500), [[[0, 90], [1500, 134]], [[0, 480], [1500, 560]]])
+        bands.clear('agent', 1920, 1080)
+        self.assertIsNone(bands.rois('agent', 1920, 1080))
+
+
+class TestDetectRois(unittest.TestCase):
+
+    def test_stitched(self):
+        img = np.full((720, 1280, 3), 40, np.uint8)
+        rows = (150, 400, 650)
+        for y in rows:
+            for x in (100, 600):
+                cv2.putText(img, f'TEXT {x}', (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
+        rois = [[[0, y - 50], [1280, y + 25]] for y in rows]
+        boxes, scores = ocrhandle.detect_rois(img, rois)
+        self.assertEqual(len(boxes), 6)
+        self.assertEqual(len(scores), 6)
+        for b in boxes:
+            # 坐标换算回原图，文字左下角在 (x, y) 附近
+            x0, y1 = b[:, 0].min(), b[:, 1].max()
+            self.assertTrue(any(abs(x0 - x) < 15 for x in (100, 600)))
+            self.assertTrue(any(abs(y1 - y) < 20 for y in rows))
+        self.assertEqual(ocrhandle.detect_rois(img, []), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from arknights_mower.utils import config, solver
+from arknights_mower.utils.solver import BaseSolver
+
+
+class FakeRecog(object):
+    """ 按顺序返回给定画面的 Recognizer """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.gray = frames.pop(0)
+        self.rebuilt = False
+
+    def capture(self):
+        if len(self.frames):
+            self.gray = self.frames.pop(0)
+
+    def rebuild(self, build=True):
+        self.rebuilt = True
+
+    def update(self, rebuild=True):
+        self.capture()
+
+
+def frame(value):
+    return np.full((720, 1280), value, np.uint8)
+
+
+class TestWaitStable(unittest.TestCase):
+
+    def setUp(self):
+        self.adaptive_wait = getattr(config, 'ADAPTIVE_WAIT', None)
+        config.ADAPTIVE_WAIT = True
+
+    def tearDown(self):
+        config.ADAPTIVE_WAIT = self.adaptive_wait
+
+    def wait(self, frames, interval=3):
+        s = BaseSolver.__new__(BaseSolver)
+        s.recog = FakeRecog(frames)
+        s.wait_stable(interval)
+        return s.recog
+
+    def test_pause(self):
+        # 动画中途停顿一帧，不能当作已稳定
+        recog = self.wait([frame(0), frame(100), frame(100), frame(200)] + [frame(200)] * 10)
+        self.assertTrue(recog.rebuilt)
+        self.assertEqual(recog.gray[0, 0], 200)
+        self.assertGreaterEqual(len(recog.frames), 10 - solver.STABLE_POLLS - 1)
+
+    def test_unchanged(self):
+        # 画面一直没有变化，等满 interval
+        recog = self.wait([frame(0)] * 20, 0.5)
+        self.assertFalse(recog.rebuilt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -163,7 +163,8 @@ def paddle_recog(__img):
                 op_name = ocr_error[r[0]]
                 logger.debug(f"{r[0]} =====> {op_name}")
                 return op_name
-    return None
+    # 识别结果不是干员名时，才使用约束解码
+    return rapidocr.read_word(__img, 'agent')
 
 
 def agent(img, draw=False):
@@ -281,7 +282,7 @@ def agent_name(__img, height, draw: bool = False):
     dim = (w*4, h*4)
     # resize image
     resized = cv2.resize(__img, dim, interpolation=cv2.INTER_AREA)
-    ocr = ocrhandle.predict(resized)
+    ocr = ocrhandle.predict(resized, vocabulary='agent')
     name = ''
     try:
         if len(ocr) > 0 and ocr[0][1] in agent_list and ocr[0][1] not in ['砾', '陈']:
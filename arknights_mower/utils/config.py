@@ -130,6 +130,16 @@ def init_config() -> None:
     global MNT_COMPATIBILITY_MODE
     MNT_COMPATIBILITY_MODE = __get('device/mnt_compatibility_mode', False)
 
+    global SCREENCAP_MODE
+    SCREENCAP_MODE = __get('device/screencap_mode', 'png')
+
+    global FRAME_SOURCE, SCRCPY_SERVER
+    FRAME_SOURCE = __get('device/frame_source', 'none')
+    SCRCPY_SERVER = __get('device/scrcpy_server', None)
+
+    global ASYNC_ADB
+    ASYNC_ADB = __get('device/async_adb', False)
+
     global USERNAME, PASSWORD
     USERNAME = __get('account/username', None)
     PASSWORD = __get('account/password', None)
@@ -150,9 +160,22 @@ def init_config() -> None:
     global MAX_RETRYTIME
     MAX_RETRYTIME = __get('behavior/max_retry', 5)
 
+    global ADAPTIVE_WAIT
+    ADAPTIVE_WAIT = __get('behavior/adaptive_wait', True)
+
     global OCR_APIKEY
     OCR_APIKEY = __get('ocr/ocr_space_api', 'c7431c9d7288957')
 
+    global OCR_INTRA_OP_THREADS, OCR_INTER_OP_THREADS, OCR_GRAPH_OPTIMIZATION, OCR_WARMUP
+    OCR_INTRA_OP_THREADS = __get('ocr/intra_op_threads', 0)
+    OCR_INTER_OP_THREADS = __get('ocr/inter_op_threads', 0)
+    OCR_GRAPH_OPTIMIZATION = __get('ocr/graph_optimization', 'all')
+    OCR_WARMUP = __get('ocr/warmup', True)
+
+    global OCR_CACHE_SIZE, OCR_CACHE_PERSIST
+    OCR_CACHE_SIZE = __get('ocr/cache_size', 16)
+    OCR_CACHE_PERSIST = __get('ocr/cache_persist', False)
+
     global BASE_CONSTRUCT_PLAN
     BASE_CONSTRUCT_PLAN = __get('arrangement', None)
 
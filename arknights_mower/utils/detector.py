@@ -1,9 +1,8 @@
 import cv2
 import numpy as np
 
-from .. import __rootdir__
+from . import template
 from . import typealias as tp
-from .image import loadimg
 from .log import logger
 from .matcher import Matcher
 
@@ -164,20 +163,16 @@ def visit_next(img: tp.Image) -> tp.Coordinate:
     return point
 
 
-on_shift = loadimg(f'{__rootdir__}/resources/agent_on_shift.png', True)
-distracted = loadimg(f'{__rootdir__}/resources/distracted.png', True)
-resting = loadimg(f'{__rootdir__}/resources/agent_resting.png', True)
-
 def is_on_shift(img: tp.Image) -> bool:
     """
     检测干员是否正在工作中
     """
     matcher = Matcher(cv2.cvtColor(img, cv2.COLOR_RGB2GRAY))
-    if matcher.match(on_shift, judge=False) is not None:
+    if matcher.match(template.get('agent_on_shift'), judge=False) is not None:
         return True
-    if matcher.match(resting, judge=False) is not None:
+    if matcher.match(template.get('agent_resting'), judge=False) is not None:
         return True
-    if matcher.match(distracted, judge=False) is not None:
+    if matcher.match(template.get('distracted'), judge=False) is not None:
         return False
     width = img.shape[1]
     __width = int(width * 0.7)
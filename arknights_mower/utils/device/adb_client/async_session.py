@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+
+from ... import config
+from ...log import logger
+
+
+class AsyncSession(object):
+    """ Session between ADB client and ADB server, on asyncio streams """
+
+    def __init__(self, server: tuple[str, int] = None, timeout: int = None) -> None:
+        if server is None:
+            server = (config.ADB_SERVER_IP, config.ADB_SERVER_PORT)
+        if timeout is None:
+            timeout = config.ADB_SERVER_TIMEOUT
+        self.server = server
+        self.timeout = timeout
+        self.device_id = None
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+
+    async def __aenter__(self) -> AsyncSession:
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback) -> None:
+        await self.close()
+
+    async def open(self) -> AsyncSession:
+        """ connect to ADB server """
+        logger.debug(f'server: {self.server}, timeout: {self.timeout}')
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(*self.server), self.timeout)
+        return self
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+    async def recv_exactly(self, len: int) -> bytes:
+        try:
+            return await asyncio.wait_for(self.reader.readexactly(len), self.timeout)
+        except asyncio.IncompleteReadError:
+            raise EOFError('recv_exactly %d bytes failed' % len)
+
+    async def recv_all(self) -> bytes:
+        """ read till the server closes the connection """
+        return await asyncio.wait_for(self.reader.read(), self.timeout)
+
+    async def recv_response(self) -> bytes:
+        """ read a chunk of length indicated by 4 hex digits """
+        len = int(await self.recv_exactly(4), 16)
+        if len == 0:
+            return b''
+        return await self.recv_exactly(len)
+
+    async def request(self, cmd: str) -> AsyncSession:
+        """ make a service request to ADB server, consult ADB sources for available services """
+        cmdbytes = cmd.encode()
+        self.writer.write(b'%04X%b' % (len(cmdbytes), cmdbytes))
+        await self.writer.drain()
+        result = await self.recv_exactly(4)
+        if result != b'OKAY':
+            raise ConnectionError(await self.recv_response())
+        return self
+
+    async def response(self, recv_all: bool = False) -> bytes:
+        """ receive response """
+        if recv_all:
+            return await self.recv_all()
+        else:
+            return await self.recv_response()
+
+    async def exec(self, cmd: str) -> bytes:
+        """ exec: cmd """
+        if len(cmd) == 0:
+            raise ValueError('no command specified for exec')
+        return await (await self.request('exec:' + cmd)).response(True)
+
+    async def host(self, cmd: str) -> bytes:
+        """ host: cmd """
+        if len(cmd) == 0:
+            raise ValueError('no command specified for host')
+        return await (await self.request('host:' + cmd)).response()
+
+    async def device(self, device_id: str = None) -> AsyncSession:
+        """ switch to a device """
+        self.device_id = device_id
+        if device_id is None:
+            return await self.request('host:transport-any')
+        else:
+            return await self.request('host:transport:' + device_id)
+
+    async def devices_list(self) -> list[tuple[str, str]]:
+        """ returns list of devices that the adb server knows """
+        resp = (await self.host('devices')).decode(errors='ignore')
+        return [tuple(line.split('\t')) for line in resp.splitlines()]
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import socket
 import subprocess
-import time
-from typing import Optional, Union
+from typing import Callable, Optional, Union
 
 from ... import config
 from ...log import logger
+from .pool import SessionPool, ShellChannel, ShellChannelError
+from .recovery import Recovery, connect_targets
 from .session import Session
 from .socket import Socket
 from .utils import adb_buildin, run_cmd
@@ -20,6 +21,8 @@ class Client(object):
         self.connect = connect
         self.adb_bin = adb_bin
         self.error_limit = 3
+        self.pool = None
+        self.channel = None
         self.__init_adb()
         self.__init_device()
 
@@ -39,8 +42,8 @@ class Client(object):
         raise RuntimeError("Can't start adb server")
 
     def __init_device(self) -> None:
-        # wait for the newly started ADB server to probe emulators
-        time.sleep(1)
+        # wait for the newly started ADB server to probe emulators, at most 1s
+        Recovery(self.device_id).wait(1, Recovery.DEVICE)
         if self.device_id is None or self.device_id not in config.ADB_DEVICE:
             self.device_id = self.__choose_devices()
         if self.device_id is None :
@@ -65,6 +68,17 @@ class Client(object):
         if self.device_id not in self.__available_devices():
             logger.error('未检测到相应设备。请运行 `adb devices` 确认列表中列出了目标模拟器或设备。')
             raise RuntimeError('Device connection failure')
+        self.__init_pool()
+
+    def __init_pool(self) -> None:
+        """ transport sessions kept ready, and the persistent shell on top of them """
+        if self.pool is not None:
+            self.pool.clear()
+        if self.channel is not None:
+            self.channel.close()
+        self.pool = SessionPool(self.device_id)
+        self.channel = ShellChannel(self.pool)
+        self.pool.refill()
 
     def __choose_devices(self) -> Optional[str]:
         """ choose available devices """
@@ -97,12 +111,15 @@ class Client(object):
             except (socket.timeout, ConnectionRefusedError, RuntimeError):
                 if restart and error_limit > 0:
                     error_limit -= 1
-                    self.__exec('kill-server')
-                    self.__exec('start-server')
-                    time.sleep(10)
+                    self.__restart_server()
+                    Recovery().wait(stage=Recovery.SERVER)
                     continue
                 return
 
+    def __restart_server(self, adb_bin: str = None) -> None:
+        self.__exec('kill-server', adb_bin)
+        self.__exec('start-server', adb_bin)
+
     def check_server_alive(self, restart: bool = True) -> bool:
         """ check adb server if it works """
         return self.__run('host:version', restart) is not None
@@ -113,10 +130,8 @@ class Client(object):
             self.__exec('start-server', adb_bin)
             if self.check_server_alive(False):
                 return True
-            self.__exec('kill-server', adb_bin)
-            self.__exec('start-server', adb_bin)
-            time.sleep(10)
-            if self.check_server_alive(False):
+            self.__restart_server(adb_bin)
+            if Recovery().wait(10, Recovery.SERVER):
                 return True
         except (FileNotFoundError, subprocess.CalledProcessError):
             return False
@@ -125,31 +140,70 @@ class Client(object):
 
     def session(self) -> Session:
         """ get a session between adb client and adb server """
-        if not self.check_server_alive():
-            raise RuntimeError('ADB server is not working')
-        return Session().device(self.device_id)
+        return self.pool.get()
+
+    def recover(self, error: Exception, error_limit: int) -> None:
+        """ called after a request fails, check the server only now instead of before each request """
+        logger.debug(f'adb request failed: {repr(error)}')
+        self.pool.clear()
+        self.channel.close()
+        # pooled sessions may be stale while the server is fine, retry at once for the first time
+        if error_limit == self.error_limit and self.check_server_alive(False):
+            return
+        self.__restart_server()
+        # resume as soon as the device is back, instead of a fixed wait
+        Recovery(self.device_id, connect_targets(self.device_id, self.connect)).wait()
+        self.__init_device()
 
-    def run(self, cmd: str) -> Optional[bytes]:
-        """ run adb exec command """
-        logger.debug(f'command: {cmd}')
-        error_limit = 3
+    def __request(self, request: Callable[[Session], bytes]) -> bytes:
+        """ make a request on a pooled session, recover and retry on failure """
+        error_limit = self.error_limit
         while True:
             try:
-                resp = self.session().exec(cmd)
-                break
-            except (socket.timeout, ConnectionRefusedError, RuntimeError) as e:
+                return request(self.session())
+            except (socket.timeout, ConnectionError, EOFError, RuntimeError) as e:
                 if error_limit > 0:
+                    self.recover(e, error_limit)
                     error_limit -= 1
-                    self.__exec('kill-server')
-                    self.__exec('start-server')
-                    time.sleep(10)
-                    self.__init_device()
                     continue
                 raise e
+
+    def run(self, cmd: str) -> Optional[bytes]:
+        """ run adb exec command """
+        logger.debug(f'command: {cmd}')
+        resp = self.__request(lambda session: session.exec(cmd))
         if len(resp) <= 256:
             logger.debug(f'response: {repr(resp)}')
         return resp
 
+    def screencap_raw(self) -> bytearray:
+        """ raw screencap, received into a single buffer preallocated from its header """
+        logger.debug('command: screencap')
+        return self.__request(lambda session: session.screencap_raw())
+
+    def shell(self, cmd: str) -> bytes:
+        """ run a small command on the persistent shell channel """
+        return self.shell_batch([cmd])[0]
+
+    def shell_batch(self, cmds: list[str]) -> list[bytes]:
+        """
+        run small commands pipelined on the persistent shell channel,
+        fall back to exec one by one only if the channel fails before the commands are sent
+        """
+        logger.debug(f'shell: {cmds}')
+        try:
+            resp = self.channel.run(cmds)
+        except ShellChannelError:
+            # commands such as taps and key events must not run twice, leave it to the caller
+            raise
+        except (OSError, EOFError, RuntimeError) as e:
+            logger.debug(f'shell channel failed: {repr(e)}')
+            resp = [self.run(cmd) for cmd in cmds]
+        for r in resp:
+            if len(r) <= 256:
+                logger.debug(f'response: {repr(r)}')
+        return resp
+
     def cmd(self, cmd: str, decode: bool = False) -> Union[bytes, str]:
         """ run adb command with adb_bin """
         cmd = [self.adb_bin, '-s', self.device_id] + cmd.split(' ')
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import secrets
+import threading
+from typing import Optional
+
+from ...log import logger
+from .session import Session
+from .socket import Socket
+
+# number of transport sessions kept ready
+POOL_SIZE = 2
+
+
+class SessionPool(object):
+    """ sessions already switched to the transport of a device, each one serves a single request """
+
+    def __init__(self, device_id: str, size: int = POOL_SIZE) -> None:
+        self.device_id = device_id
+        self.size = size
+        self.sessions: list[Session] = []
+        self.lock = threading.Lock()
+        self.filling = False
+
+    def create(self) -> Session:
+        return Session().device(self.device_id)
+
+    def get(self) -> Session:
+        """ take a ready session, and refill the pool in background """
+        with self.lock:
+            session = self.sessions.pop() if len(self.sessions) else None
+        if session is None:
+            session = self.create()
+        self.refill()
+        return session
+
+    def refill(self) -> None:
+        with self.lock:
+            if self.filling or len(self.sessions) >= self.size:
+                return
+            self.filling = True
+        threading.Thread(target=self.__fill, daemon=True).start()
+
+    def __fill(self) -> None:
+        try:
+            while True:
+                with self.lock:
+                    if len(self.sessions) >= self.size:
+                        return
+                session = self.create()
+                with self.lock:
+                    self.sessions.append(session)
+        except Exception as e:
+            # the next request will fail and recover, see Client.run
+            logger.debug(f'failed to fill session pool: {e}')
+        finally:
+            with self.lock:
+                self.filling = False
+
+    def clear(self) -> None:
+        """ drop all ready sessions, e.g. after the server restarts """
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.sock.close()
+
+
+class ShellChannelError(ConnectionError):
+    """ the channel fails after the commands are sent, those without output may have run or not """
+
+    def __init__(self, error: Exception, outputs: list[bytes]) -> None:
+        super().__init__(f'shell channel failed after {len(outputs)} outputs: {repr(error)}')
+        # outputs of the commands finished before the failure
+        self.outputs = outputs
+
+
+class ShellChannel(object):
+    """ a long-lived `sh` on the device, running small commands one after another without new connections """
+
+    def __init__(self, pool: SessionPool) -> None:
+        self.pool = pool
+        self.sock: Optional[Socket] = None
+        self.lock = threading.Lock()
+        # printed after each command, followed by its exit code
+        self.marker = f'__MOWER_{secrets.token_hex(8)}__'.encode()
+        self.buffer = b''
+
+    def open(self) -> None:
+        self.sock = self.pool.get().request('exec:sh', True).sock
+        self.buffer = b''
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def run(self, cmds: list[str]) -> list[bytes]:
+        """ send all commands at once, return the output of each one """
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.open()
+                # commands must not read stdin, which carries the commands behind
+                script = ''.join(f'{{ {cmd}\n}} </dev/null; echo {self.marker.decode()}$?\n' for cmd in cmds)
+            except Exception:
+                self.close()
+                raise
+            outputs = []
+            try:
+                self.sock.sendall(script.encode())
+                for _ in cmds:
+                    outputs.append(self.__read())
+                return outputs
+            except Exception as e:
+                self.close()
+                raise ShellChannelError(e, outputs)
+
+    def __read(self) -> bytes:
+        """ read the output of a command, till the marker and the line of exit code """
+        while True:
+            idx = self.buffer.find(self.marker)
+            if idx >= 0:
+                end = self.buffer.find(b'\n', idx)
+                if end >= 0:
+                    output = self.buffer[:idx]
+                    code = self.buffer[idx + len(self.marker):end]
+                    self.buffer = self.buffer[end + 1:]
+                    if code != b'0':
+                        logger.debug(f'exit code: {code.decode(errors="ignore")}')
+                    return output
+            data = self.sock.recv(65536)
+            if not len(data):
+                raise ConnectionError('shell channel closed')
+            self.buffer += data
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional
+
+from ...log import logger
+from .session import Session
+
+# seconds to wait at most for ADB to come back
+RECOVERY_TIMEOUT = 30
+# wait between probes starts from this, and doubles after each failure up to RECOVERY_MAX_DELAY
+RECOVERY_INITIAL_DELAY = 0.1
+RECOVERY_MAX_DELAY = 2
+# timeout of the connection of each probe
+PROBE_TIMEOUT = 2
+
+
+class Recovery(object):
+    """ wait for ADB to be usable again: the server, then the device, then its boot, probed with exponential backoff """
+
+    SERVER = 'server'
+    DEVICE = 'device'
+    BOOT = 'boot'
+    READY = 'ready'
+    STAGES = [SERVER, DEVICE, BOOT, READY]
+
+    def __init__(self, device_id: str = None, connect: list[str] = None, restart: Callable[[], None] = None,
+                 server: tuple[str, int] = None) -> None:
+        """
+        :param device_id: device to wait for, any online device if None
+        :param connect: addresses to `adb connect` while the device is missing
+        :param restart: called once when the server does not answer, e.g. to restart it
+        :param server: address of ADB server, config.ADB_SERVER_* by default
+        """
+        self.device_id = device_id
+        self.connect = connect or []
+        self.restart = restart
+        self.server = server
+        self.state = self.SERVER
+
+    def session(self) -> Session:
+        return Session(self.server, PROBE_TIMEOUT)
+
+    def probe_server(self) -> bool:
+        return len(self.session().run('host:version')) > 0
+
+    def probe_device(self) -> bool:
+        """ the device is listed and in `device` state, not offline or unauthorized """
+        online = [x[0] for x in self.session().devices_list() if len(x) > 1 and x[1] == 'device']
+        if self.device_id is None and len(online):
+            self.device_id = online[0]
+        if self.device_id in online:
+            return True
+        for target in self.connect:
+            self.session().connect(target)
+        return False
+
+    def probe_boot(self) -> bool:
+        return self.session().device(self.device_id).exec('getprop sys.boot_completed').strip() == b'1'
+
+    def probe(self) -> bool:
+        """ probe the current stage, True if it is passed """
+        if self.state == self.SERVER:
+            return self.probe_server()
+        if self.state == self.DEVICE:
+            return self.probe_device()
+        if self.state == self.BOOT:
+            return self.probe_boot()
+        return True
+
+    def passed(self, stage: str) -> bool:
+        return self.STAGES.index(self.state) > self.STAGES.index(stage)
+
+    def wait(self, timeout: float = RECOVERY_TIMEOUT, stage: str = BOOT) -> bool:
+        """
+        advance through the stages as soon as each one is ready
+
+        :param timeout: seconds to wait at most
+        :param stage: the last stage to wait for, e.g. Recovery.SERVER to wait for the server only
+        :return: True if the stage is passed, False on timeout
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        delay = RECOVERY_INITIAL_DELAY
+        restarted = False
+        while not self.passed(stage):
+            try:
+                ready = self.probe()
+            except (OSError, EOFError, RuntimeError, ValueError) as e:
+                logger.debug(f'adb probe of {self.state} failed: {repr(e)}')
+                ready = False
+            if ready:
+                logger.debug(f'adb {self.state} ready in {time.monotonic() - start:.2f}s')
+                self.state = self.STAGES[self.STAGES.index(self.state) + 1]
+                delay = RECOVERY_INITIAL_DELAY
+                continue
+            if self.state == self.SERVER and self.restart is not None and not restarted:
+                restarted = True
+                self.restart()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f'adb {self.state} not ready in {timeout}s')
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, RECOVERY_MAX_DELAY)
+        return True
+
+
+def connect_targets(device_id: Optional[str], connect: Optional[str] = None) -> list[str]:
+    """ addresses to reconnect after the server restarts, only network devices need it """
+    if connect is not None:
+        return [connect]
+    if device_id is not None and ':' in device_id:
+        return [device_id]
+    return []
@@ -8,6 +8,9 @@ from ... import config
 from ...log import logger
 from .socket import Socket
 
+# the limit of each DATA frame of the sync protocol
+PUSH_CHUNK_SIZE = 65536
+
 
 class Session(object):
     """ Session between ADB client and ADB server """
@@ -57,6 +60,10 @@ class Session(object):
             raise ValueError('no command specified for exec')
         return self.request('exec:' + cmd, True).response(True)
 
+    def screencap_raw(self) -> bytearray:
+        """ exec: screencap, received into a buffer sized from its header """
+        return self.request('exec:screencap 2>/dev/null', True).sock.recv_raw_screencap()
+
     def shell(self, cmd: str) -> bytes:
         """ shell: cmd """
         if len(cmd) == 0:
@@ -109,16 +116,18 @@ class Session(object):
         self.request('sync:', True)
         request = b'%s,%d' % (target_path.encode(), mode)
         self.sock.send(b'SEND' + struct.pack('<I', len(request)) + request)
-        buf = bytearray(65536+8)
+        # each DATA frame is framed in place in one reused buffer, the data is copied only once
+        view = memoryview(target)
+        buf = bytearray(PUSH_CHUNK_SIZE + 8)
         buf[0:4] = b'DATA'
+        frame = memoryview(buf)
         idx = 0
-        while idx < len(target):
-            content = target[idx:idx+65536]
-            content_len = len(content)
+        while idx < len(view):
+            content_len = min(PUSH_CHUNK_SIZE, len(view) - idx)
+            struct.pack_into('<I', buf, 4, content_len)
+            frame[8:8+content_len] = view[idx:idx+content_len]
+            self.sock.sendall(frame[:8+content_len])
             idx += content_len
-            buf[4:8] = struct.pack('<I', content_len)
-            buf[8:8+content_len] = content
-            self.sock.sendall(bytes(buf[0:8+content_len]))
         if mtime is None:
             mtime = int(time.time())
         self.sock.send(b'DONE' + struct.pack('<I', mtime))
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import socket
+import struct
 
 from ...log import logger
 
+# width, height and pixel format of raw screencap
+RAW_HEADER_SIZE = 12
+# larger width or height is not a screencap
+RAW_MAX_SIZE = 16384
+
 
 class Socket(object):
     """ Connect ADB server with socket """
@@ -51,6 +57,39 @@ class Socket(object):
         data.append(buf[:pos])
         return b''.join(data)
 
+    def recv_raw_screencap(self) -> bytearray:
+        """ read the output of `screencap` without -p till EOF, into one buffer sized by its header """
+        header = bytearray(RAW_HEADER_SIZE)
+        view = memoryview(header)
+        pos = 0
+        while pos < RAW_HEADER_SIZE:
+            rcvlen = self.sock.recv_into(view[pos:])
+            if rcvlen == 0:
+                return header[:pos]
+            pos += rcvlen
+        w, h, _ = struct.unpack('<III', header)
+        if w > RAW_MAX_SIZE or h > RAW_MAX_SIZE:
+            # not a raw screencap, e.g. an error message
+            return header + self.recv_all()
+        # RGBA pixels after a header of 12 bytes, or 16 bytes with the color space on Android 12+
+        buf = bytearray(16 + w * h * 4)
+        buf[:RAW_HEADER_SIZE] = header
+        view = memoryview(buf)
+        while pos < len(buf):
+            rcvlen = self.sock.recv_into(view[pos:])
+            if rcvlen == 0:
+                break
+            pos += rcvlen
+        else:
+            # longer than expected, keep reading
+            rest = self.recv_all()
+            if len(rest):
+                return buf + rest
+        del view
+        # shrinking in place, no copy
+        del buf[pos:]
+        return buf
+
     def recv_exactly(self, len: int) -> bytes:
         buf = bytearray(len)
         view = memoryview(buf)
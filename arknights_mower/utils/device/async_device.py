@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Coroutine, Optional
+
+from ..log import logger
+from .adb_client.async_session import AsyncSession
+
+if TYPE_CHECKING:
+    from .device import Device
+
+# attempts of a command before giving up on the ADB server
+ASYNC_RETRIES = 2
+
+
+class AsyncDevice(object):
+    """ asyncio interface of an Android device, commands go to ADB server without blocking the loop """
+
+    def __init__(self, device_id: str, control: Device.Control = None, server: tuple[str, int] = None,
+                 device: Device = None) -> None:
+        self.device_id = device_id
+        # minitouch and scrcpy are blocking, they are run in a worker thread
+        self.control = control
+        self.server = server
+        # the blocking Device sharing the last input and the frame size, see from_device()
+        self.device = device
+        self.__last_input = 0.0
+        self.__frame_size = None
+
+    @classmethod
+    def from_device(cls, device: Device) -> AsyncDevice:
+        """ share the device, the touch control, the last input and the frame size of a blocking Device """
+        return cls(device.client.device_id, device.control, device=device)
+
+    @property
+    def last_input(self) -> float:
+        """ time.monotonic() of the last input event, frame sources drop frames taken before it """
+        return self.__last_input if self.device is None else self.device.last_input
+
+    @last_input.setter
+    def last_input(self, value: float) -> None:
+        if self.device is None:
+            self.__last_input = value
+        else:
+            self.device.last_input = value
+
+    @property
+    def frame_size(self) -> Optional[tuple[int, int]]:
+        return self.__frame_size if self.device is None else self.device.frame_size
+
+    @frame_size.setter
+    def frame_size(self, value: tuple[int, int]) -> None:
+        if self.device is None:
+            self.__frame_size = value
+        else:
+            self.device.check_frame_size(*value)
+
+    async def run(self, cmd: str) -> bytes:
+        """ run command on the device, each command takes its own connection so they can overlap """
+        for retry in range(ASYNC_RETRIES):
+            try:
+                async with AsyncSession(self.server) as session:
+                    await session.device(self.device_id)
+                    return await session.exec(cmd)
+            except (OSError, EOFError, asyncio.TimeoutError) as e:
+                # a plain ConnectionError is a FAIL from the server, retrying won't help
+                if type(e) is ConnectionError or retry == ASYNC_RETRIES - 1:
+                    raise
+                logger.debug(f'async adb command failed, retry: {e}')
+
+    async def shell(self, cmd: str) -> bytes:
+        return await self.run(cmd)
+
+    async def screencap(self) -> bytes:
+        """ get a screencap in PNG """
+        screencap = await self.run('screencap -p 2>/dev/null')
+        if len(screencap) >= 24:
+            self.frame_size = struct.unpack('>II', screencap[16:24])
+        return screencap
+
+    async def screencap_raw(self) -> bytes:
+        """ get a screencap without PNG encoding, see image.raw2img """
+        screencap = await self.run('screencap 2>/dev/null')
+        if len(screencap) >= 8:
+            self.frame_size = struct.unpack('<II', screencap[:8])
+        return screencap
+
+    async def send_keyevent(self, keycode: int) -> None:
+        """ send a key event """
+        logger.debug(f'keyevent: {keycode}')
+        await self.run(f'input keyevent {keycode}')
+        self.last_input = time.monotonic()
+
+    async def send_text(self, text: str) -> None:
+        """ send a text """
+        logger.debug(f'text: {repr(text)}')
+        text = text.replace('"', '\\"')
+        await self.run(f'input text "{text}"')
+        self.last_input = time.monotonic()
+
+    async def tap(self, point: tuple[int, int]) -> None:
+        """ tap """
+        logger.debug(f'tap: {point}')
+        if self.control is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.control.tap, point)
+        else:
+            await self.run(f'input tap {point[0]} {point[1]}')
+        self.last_input = time.monotonic()
+
+    async def swipe(self, start: tuple[int, int], end: tuple[int, int], duration: int = 100) -> None:
+        """ swipe """
+        logger.debug(f'swipe: {start} -> {end}, duration={duration}')
+        if self.control is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.control.swipe, start, end, duration)
+        else:
+            await self.run(f'input swipe {start[0]} {start[1]} {end[0]} {end[1]} {duration}')
+        self.last_input = time.monotonic()
+
+
+class SyncDevice(object):
+    """ blocking facade of AsyncDevice for the solvers, the coroutines run on an event loop in background """
+
+    def __init__(self, device: AsyncDevice) -> None:
+        self.device = device
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> SyncDevice:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+        self.loop.close()
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """ start a coroutine without waiting, e.g. capture the next frame while recognizing this one """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, coro: Coroutine) -> Any:
+        return self.submit(coro).result()
+
+    @property
+    def last_input(self) -> float:
+        return self.device.last_input
+
+    def run(self, cmd: str) -> bytes:
+        return self.call(self.device.run(cmd))
+
+    def shell(self, cmd: str) -> bytes:
+        return self.call(self.device.shell(cmd))
+
+    def screencap(self) -> bytes:
+        return self.call(self.device.screencap())
+
+    def screencap_raw(self) -> bytes:
+        return self.call(self.device.screencap_raw())
+
+    def send_keyevent(self, keycode: int) -> None:
+        self.call(self.device.send_keyevent(keycode))
+
+    def send_text(self, text: str) -> None:
+        self.call(self.device.send_text(text))
+
+    def tap(self, point: tuple[int, int]) -> None:
+        self.call(self.device.tap(point))
+
+    def swipe(self, start: tuple[int, int], end: tuple[int, int], duration: int = 100) -> None:
+        self.call(self.device.swipe(start, end, duration))
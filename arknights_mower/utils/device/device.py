@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import struct
 import time
 from typing import Optional
 
 from .. import config
+from .. import typealias as tp
 from ..log import logger, save_screenshot
 from .adb_client import ADBClient
+from .async_device import AsyncDevice, SyncDevice
+from .frame_source import ScrcpySource, ScreencapSource
 from .minitouch import MiniTouch
 from .scrcpy import Scrcpy
 
+# seconds before the cached DisplayFrames are read again,
+# a 180 degree rotation keeps the size of frames and can only be found this way
+DISPLAY_FRAMES_TTL = 10
+
 
 class Device(object):
     """ Android Device """
@@ -21,16 +30,20 @@ class Device(object):
             self.minitouch = None
             self.scrcpy = None
 
+            # the video stream of scrcpy is kept only when it is used as the frame source
+            # a full server streams video anyway, so it is deployed only with the stream read
+            video = config.FRAME_SOURCE == 'scrcpy' and config.SCRCPY_SERVER is not None
+            server_file = config.SCRCPY_SERVER if video else None
             if config.ADB_CONTROL_CLIENT == 'minitouch':
                 self.minitouch = MiniTouch(client, touch_device)
             elif config.ADB_CONTROL_CLIENT == 'scrcpy':
-                self.scrcpy = Scrcpy(client)
+                self.scrcpy = Scrcpy(client, video=video, server_file=server_file)
             else:
                 # MiniTouch does not support Android 10+
                 if int(client.android_version().split('.')[0]) < 10:
                     self.minitouch = MiniTouch(client, touch_device)
                 else:
-                    self.scrcpy = Scrcpy(client)
+                    self.scrcpy = Scrcpy(client, video=video, server_file=server_file)
 
         def tap(self, point: tuple[int, int]) -> None:
             if self.minitouch:
@@ -40,6 +53,14 @@ class Device(object):
             else:
                 raise NotImplementedError
 
+        def tap_batch(self, points: list[tuple[int, int]], interval: int) -> None:
+            if self.minitouch:
+                self.minitouch.tap_batch(points, self.device.display_frames(), interval=interval)
+            elif self.scrcpy:
+                self.scrcpy.tap_batch(points, interval / 1000)
+            else:
+                raise NotImplementedError
+
         def swipe(self, start: tuple[int, int], end: tuple[int, int], duration: int) -> None:
             if self.minitouch:
                 self.minitouch.swipe(
@@ -55,11 +76,7 @@ class Device(object):
                 self.minitouch.swipe(
                     points, self.device.display_frames(), duration=durations, up_wait=up_wait)
             elif self.scrcpy:
-                total = len(durations)
-                for idx, (S, E, D) in enumerate(zip(points[:-1], points[1:], durations)):
-                    self.scrcpy.swipe(S[0], S[1], E[0], E[1], D / 1000,
-                                      up_wait / 1000 if idx == total-1 else 0,
-                                      fall=idx == 0, lift=idx == total-1)
+                self.scrcpy.swipe_ext(points, [D / 1000 for D in durations], up_wait / 1000)
             else:
                 raise NotImplementedError
 
@@ -69,15 +86,84 @@ class Device(object):
         self.touch_device = touch_device
         self.client = None
         self.control = None
+        self.frame_source = None
+        # asyncio facade taking screencaps on their own connections, see async_device.SyncDevice
+        self.facade = None
+        # time.monotonic() of the last input event
+        self.last_input = 0.0
+        # DisplayFrames cached for minitouch, refreshed when the size of screencap changes or it expires
+        self.display = None
+        self.display_time = 0.0
+        self.frame_size = None
         self.start()
 
     def start(self) -> None:
+        if self.facade is not None:
+            self.facade.close()
+            self.facade = None
         self.client = ADBClient(self.device_id, self.connect)
         self.control = Device.Control(self, self.client)
+        if config.ASYNC_ADB:
+            self.facade = SyncDevice(AsyncDevice.from_device(self))
+        self.start_frame_source()
+
+    def start_frame_source(self) -> None:
+        """ capture frames in background if configured, see frame_source.FrameSource """
+        if self.frame_source is not None:
+            self.frame_source.stop()
+            self.frame_source = None
+        if config.FRAME_SOURCE == 'screencap':
+            self.frame_source = ScreencapSource(self, raw=config.SCREENCAP_MODE == 'raw')
+        elif config.FRAME_SOURCE == 'scrcpy':
+            if self.control.scrcpy is None or self.control.scrcpy.video_socket is None:
+                logger.warning('scrcpy 视频流不可用，请检查 adb_control_client 与 scrcpy_server 设置')
+                return
+            self.frame_source = ScrcpySource(self.control.scrcpy)
+        else:
+            return
+        try:
+            self.frame_source.start()
+        except RuntimeError as e:
+            logger.warning(e)
+            self.drop_frame_source()
+
+    def drop_frame_source(self) -> None:
+        """ give up the frame source, the video stream of scrcpy would stall the server once nobody reads it """
+        if isinstance(self.frame_source, ScrcpySource) and self.control.scrcpy is not None:
+            self.control.scrcpy.drop_video()
+        self.frame_source = None
+
+    def latest_frame(self) -> Optional[tp.Image]:
+        """ the newest frame from the frame source taken after the last input, RGB """
+        if self.frame_source is None:
+            return None
+        if not self.frame_source.running:
+            self.drop_frame_source()
+            return None
+        frame = self.frame_source.latest(after=self.last_input)
+        if frame is None:
+            return None
+        logger.debug(f'latest frame: {time.monotonic() - frame[0]:.3f}s ago')
+        return frame[1]
 
     def run(self, cmd: str) -> Optional[bytes]:
         return self.client.run(cmd)
 
+    def run_async(self, cmd: str) -> Optional[bytes]:
+        """ run a command which can be repeated on the asyncio facade, None if it is off or fails """
+        if self.facade is None:
+            return None
+        try:
+            return self.facade.run(cmd)
+        except (OSError, EOFError, asyncio.TimeoutError) as e:
+            # the blocking client takes it over and recovers the server if needed
+            logger.debug(f'async adb command failed: {repr(e)}')
+            return None
+
+    def shell(self, cmd: str) -> bytes:
+        """ run a small command with text output, on the persistent shell """
+        return self.client.shell(cmd)
+
     def launch(self) -> None:
         """ launch the application """
         logger.info("明日方舟，启动！")
@@ -87,68 +173,109 @@ class Device(object):
         y = config.TAP_TO_LAUNCH["y"]
 
         if tap:
-            self.run(f'input tap {x} {y}')
+            self.shell(f'input tap {x} {y}')
         else:
-            self.run(f'am start -n {config.APPNAME}/{config.APP_ACTIVITY_NAME}')
+            self.shell(f'am start -n {config.APPNAME}/{config.APP_ACTIVITY_NAME}')
 
     def exit(self) -> None:
         """ exit the application """
         logger.info("退出游戏")
-        self.run(f'am force-stop {config.APPNAME}')
+        self.shell(f'am force-stop {config.APPNAME}')
 
     def send_keyevent(self, keycode: int) -> None:
         """ send a key event """
         logger.debug(f'keyevent: {keycode}')
         command = f'input keyevent {keycode}'
-        self.run(command)
+        self.shell(command)
+        self.last_input = time.monotonic()
 
     def send_text(self, text: str) -> None:
         """ send a text """
         logger.debug(f'text: {repr(text)}')
         text = text.replace('"', '\\"')
         command = f'input text "{text}"'
-        self.run(command)
+        self.shell(command)
+        self.last_input = time.monotonic()
 
     def screencap(self, save: bool = False) -> bytes:
         """ get a screencap """
         command = 'screencap -p 2>/dev/null'
-        screencap = self.run(command)
+        screencap = self.run_async(command)
+        if screencap is None:
+            screencap = self.run(command)
+        # width and height in the IHDR chunk
+        if len(screencap) >= 24:
+            self.check_frame_size(*struct.unpack('>II', screencap[16:24]))
         if save:
             save_screenshot(screencap)
         return screencap
 
+    def screencap_raw(self) -> bytes:
+        """ get a screencap without PNG encoding, see image.raw2img """
+        screencap = self.run_async('screencap 2>/dev/null')
+        if screencap is None:
+            screencap = self.client.screencap_raw()
+        if len(screencap) >= 8:
+            self.check_frame_size(*struct.unpack('<II', screencap[:8]))
+        return screencap
+
+    def check_frame_size(self, w: int, h: int) -> None:
+        """ drop cached display geometry when the size of frames changes, e.g. rotation or resolution """
+        if self.frame_size != (w, h):
+            if self.frame_size is not None:
+                logger.debug(f'frame size changed: {self.frame_size} -> {(w, h)}')
+            self.frame_size = (w, h)
+            self.display = None
+
     def current_focus(self) -> str:
         """ detect current focus app """
         command = 'dumpsys window | grep mCurrentFocus'
-        line = self.run(command).decode('utf8')
+        line = self.shell(command).decode('utf8')
         return line.strip()[:-1].split(' ')[-1]
 
     def display_frames(self) -> tuple[int, int, int]:
         """ get display frames if in compatibility mode"""
         if not config.MNT_COMPATIBILITY_MODE:
             return None
+        if self.display is not None and time.monotonic() - self.display_time < DISPLAY_FRAMES_TTL:
+            return self.display
 
         command = 'dumpsys window | grep DisplayFrames'
-        line = self.run(command).decode('utf8')
+        line = self.shell(command).decode('utf8')
         """ eg. DisplayFrames w=1920 h=1080 r=3 """
         res = line.strip().replace('=', ' ').split(' ')
-        return int(res[2]), int(res[4]), int(res[6])
+        display = int(res[2]), int(res[4]), int(res[6])
+        if self.display is not None and display != self.display:
+            logger.debug(f'display frames changed: {self.display} -> {display}')
+        self.display, self.display_time = display, time.monotonic()
+        return self.display
 
     def tap(self, point: tuple[int, int]) -> None:
         """ tap """
         logger.debug(f'tap: {point}')
         self.control.tap(point)
+        self.last_input = time.monotonic()
+
+    def tap_batch(self, points: list[tuple[int, int]], interval: int = 0) -> None:
+        """ tap points one after another in a single interaction, interval is in milliseconds """
+        if not len(points):
+            return
+        logger.debug(f'tap_batch: {points}, interval={interval}')
+        self.control.tap_batch(points, interval)
+        self.last_input = time.monotonic()
 
     def swipe(self, start: tuple[int, int], end: tuple[int, int], duration: int = 100) -> None:
         """ swipe """
         logger.debug(f'swipe: {start} -> {end}, duration={duration}')
         self.control.swipe(start, end, duration)
+        self.last_input = time.monotonic()
 
     def swipe_ext(self, points: list[tuple[int, int]], durations: list[int], up_wait: int = 500) -> None:
         """ swipe_ext """
         logger.debug(
             f'swipe_ext: points={points}, durations={durations}, up_wait={up_wait}')
         self.control.swipe_ext(points, durations, up_wait)
+        self.last_input = time.monotonic()
 
     def check_current_focus(self):
         """ check if the application is in the foreground """
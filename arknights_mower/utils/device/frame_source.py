@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from typing import TYPE_CHECKING, Optional
+
+import cv2
+
+from .. import typealias as tp
+from ..image import bytes2img, raw2img
+from ..log import logger
+
+if TYPE_CHECKING:
+    from .device import Device
+    from .scrcpy import Scrcpy
+
+# number of frames kept in the ring buffer
+FRAME_BUFFER_SIZE = 4
+# a decoded video frame was captured at most this long before it arrives, in seconds
+SCRCPY_LATENCY = 0.1
+
+
+class FrameSource(object):
+    """ capture frames in background, and keep the newest ones in a ring buffer """
+
+    # seconds to wait for a frame newer than the last input
+    timeout = 5
+
+    def __init__(self, size: int = FRAME_BUFFER_SIZE) -> None:
+        # (timestamp, RGB image), the timestamp is never later than the moment of capture
+        self.frames: deque[tuple[float, tp.Image]] = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.error = None
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.thread = None
+
+    def __run(self) -> None:
+        try:
+            self.capture()
+        except Exception as e:
+            logger.debug(traceback.format_exc())
+            logger.warning(f'frame source stopped: {e}')
+            self.error = e
+        finally:
+            self.running = False
+            with self.cond:
+                self.cond.notify_all()
+
+    def capture(self) -> None:
+        """ loop of capturing, call push() with each frame until self.running is False """
+        raise NotImplementedError
+
+    def push(self, timestamp: float, img: tp.Image) -> None:
+        with self.cond:
+            self.frames.append((timestamp, img))
+            self.cond.notify_all()
+
+    def latest(self, after: float = 0, timeout: float = None) -> Optional[tuple[float, tp.Image]]:
+        """
+        the newest frame captured after the timestamp
+
+        :param after: timestamp, e.g. the last input event, in time.monotonic()
+        :param timeout: seconds to wait for such a frame, self.timeout by default
+        :return: (timestamp, RGB image), None if the source has stopped or timed out
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self.cond:
+            while self.running:
+                if len(self.frames) and self.frames[-1][0] >= after:
+                    return self.frames[-1]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+        return None
+
+
+class ScreencapSource(FrameSource):
+    """ frames from repeated `screencap` """
+
+    def __init__(self, device: Device, raw: bool = True, size: int = FRAME_BUFFER_SIZE) -> None:
+        super().__init__(size)
+        self.device = device
+        self.raw = raw
+
+    def capture(self) -> None:
+        while self.running:
+            # the frame is taken after the command is sent
+            timestamp = time.monotonic()
+            if self.raw:
+                img = cv2.cvtColor(raw2img(self.device.screencap_raw()), cv2.COLOR_RGBA2RGB)
+            else:
+                img = bytes2img(self.device.screencap())
+            self.push(timestamp, img)
+
+
+class ScrcpySource(FrameSource):
+    """ frames decoded from the video stream of scrcpy """
+
+    # scrcpy only sends a frame when the screen changes, so an input which changes nothing gets no new frame;
+    # wait shortly, the caller falls back to screencap instead of a frame older than the input
+    timeout = 0.3
+
+    def __init__(self, scrcpy: Scrcpy, size: int = FRAME_BUFFER_SIZE) -> None:
+        super().__init__(size)
+        self.scrcpy = scrcpy
+
+    def start(self) -> None:
+        try:
+            import av
+        except ImportError:
+            raise RuntimeError('PyAV is required to decode the video stream of scrcpy')
+        self.av = av
+        if self.scrcpy.video_socket is None:
+            raise RuntimeError('scrcpy is started without video')
+        super().start()
+
+    def capture(self) -> None:
+        sock = None
+        while self.running:
+            if sock is not self.scrcpy.video_socket:
+                # scrcpy (re)started, decode the new stream from scratch
+                sock = self.scrcpy.video_socket
+                self.codec = self.av.CodecContext.create('h264', 'r')
+            if sock is None:
+                time.sleep(0.1)
+                continue
+            try:
+                data = sock.recv(1 << 16)
+            except socket.timeout:
+                # nothing changes on the screen
+                continue
+            except OSError:
+                data = b''
+            if not len(data):
+                if sock is self.scrcpy.video_socket:
+                    raise ConnectionError('video stream of scrcpy closed')
+                continue
+            for packet in self.codec.parse(data):
+                for frame in self.codec.decode(packet):
+                    self.push(time.monotonic() - SCRCPY_LATENCY, frame.to_ndarray(format='rgb24'))
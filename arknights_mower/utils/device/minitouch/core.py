@@ -3,7 +3,7 @@ from __future__ import annotations
 import os
 import time
 # import random
-from typing import Union
+from typing import Callable, Optional, Union
 
 from ... import config
 from ...log import log_sync, logger
@@ -24,6 +24,8 @@ class Client(object):
         self.client = client
         self.touch_device = touch_device
         self.process = None
+        # kept open between touches
+        self.conn: Optional[Session] = None
         self.start()
 
     def start(self) -> None:
@@ -87,8 +89,35 @@ class Client(object):
 
     def __server_stop(self) -> None:
         """ stop minitouch """
+        self.close_session()
         self.process and self.process.kill()
 
+    def session(self) -> Session:
+        """ the persistent connection to minitouch, reopened if it has been closed by the other side """
+        if self.conn is not None and not self.conn.alive():
+            logger.debug('minitouch connection closed by the server')
+            self.close_session()
+        if self.conn is None:
+            self.conn = Session(self.port)
+        return self.conn
+
+    def close_session(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __operate(self, operation: Callable[[Session], None]) -> None:
+        """ run operation on the persistent connection, check adb and reconnect only after a failure """
+        self.check_mnt_alive()
+        try:
+            operation(self.session())
+        except OSError as e:
+            logger.debug(f'minitouch connection failed: {repr(e)}')
+            self.close_session()
+            self.check_adb_alive()
+            self.check_mnt_alive()
+            operation(self.session())
+
     # def __get_port(cls) -> int:
     #     """ get a random port from port set """
     #     while True:
@@ -153,12 +182,10 @@ class Client(object):
         :param duration: in milliseconds
         :param lift: if True, "lift" the touch point
         """
-        self.check_adb_alive()
-        self.check_mnt_alive()
-
-        builder = CommandBuilder()
         points = [list(map(int, point)) for point in points]
-        with Session(self.port) as conn:
+
+        def operation(conn: Session) -> None:
+            builder = CommandBuilder()
             for id, point in enumerate(points):
                 x, y = self.convert_coordinate(point, display_frames, int(conn.max_x), int(conn.max_y))
                 builder.down(id, x, y, pressure)
@@ -174,6 +201,38 @@ class Client(object):
 
             builder.publish(conn)
 
+        self.__operate(operation)
+
+    def tap_batch(self, points: list[tuple[int, int]], display_frames: tuple[int, int, int], pressure: int = 100, duration: int = None, interval: int = None) -> None:
+        """
+        tap points one after another, in a single command script
+
+        :param points: list, look like [(x1, y1), (x2, y2), ...]
+        :param display_frames: tuple[int, int, int], which means [weight, high, rotation] by "adb shell dumpsys window | grep DisplayFrames"
+        :param pressure: default to 100
+        :param duration: hold time of each tap, in milliseconds
+        :param interval: wait between taps, in milliseconds
+        """
+        points = [list(map(int, point)) for point in points]
+
+        def operation(conn: Session) -> None:
+            builder = CommandBuilder()
+            for idx, point in enumerate(points):
+                x, y = self.convert_coordinate(point, display_frames, int(conn.max_x), int(conn.max_y))
+                builder.down(0, x, y, pressure)
+                builder.commit()
+                if duration:
+                    builder.wait(duration)
+                    builder.commit()
+                builder.up(0)
+                builder.commit()
+                if interval and idx < len(points) - 1:
+                    builder.wait(interval)
+                    builder.commit()
+            builder.publish(conn)
+
+        self.__operate(operation)
+
     def __swipe(self, points: list[tuple[int, int]], display_frames: tuple[int, int, int], pressure: int = 100, duration: Union[list[int], int] = None, up_wait: int = 0, fall: bool = True, lift: bool = True) -> None:
         """
         swipe between points one by one, with pressure and duration
@@ -186,16 +245,13 @@ class Client(object):
         :param fall: if True, "fall" the first touch point
         :param lift: if True, "lift" the last touch point
         """
-        self.check_adb_alive()
-        self.check_mnt_alive()
-
         points = [list(map(int, point)) for point in points]
         if not isinstance(duration, list):
             duration = [duration] * (len(points) - 1)
         assert len(duration) + 1 == len(points)
 
-        builder = CommandBuilder()
-        with Session(self.port) as conn:
+        def operation(conn: Session) -> None:
+            builder = CommandBuilder()
             if fall:
                 x, y = self.convert_coordinate(points[0], display_frames, int(conn.max_x), int(conn.max_y))
                 builder.down(0, x, y, pressure)
@@ -215,6 +271,8 @@ class Client(object):
                     builder.wait(up_wait)
                 builder.publish(conn)
 
+        self.__operate(operation)
+
     def swipe(self, points: list[tuple[int, int]], display_frames: tuple[int, int, int], pressure: int = 100, duration: Union[list[int], int] = None, up_wait: int = 0, part: int = 10, fall: bool = True, lift: bool = True) -> None:
         """
         swipe between points one by one, with pressure and duration
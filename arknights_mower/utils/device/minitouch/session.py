@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import select
 import socket
 
 from ...log import logger
@@ -16,22 +17,26 @@ class Session(object):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.connect((DEFAULT_HOST, port))
         socket_out = self.sock.makefile()
+        try:
+            # v <version>
+            # protocol version, usually it is 1. needn't use this
+            socket_out.readline()
 
-        # v <version>
-        # protocol version, usually it is 1. needn't use this
-        socket_out.readline()
+            # ^ <max-contacts> <max-x> <max-y> <max-pressure>
+            _, max_contacts, max_x, max_y, max_pressure, *_ = (
+                socket_out.readline().strip().split(' '))
+            self.max_contacts = max_contacts
+            self.max_x = max_x
+            self.max_y = max_y
+            self.max_pressure = max_pressure
 
-        # ^ <max-contacts> <max-x> <max-y> <max-pressure>
-        _, max_contacts, max_x, max_y, max_pressure, *_ = (
-            socket_out.readline().strip().split(' '))
-        self.max_contacts = max_contacts
-        self.max_x = max_x
-        self.max_y = max_y
-        self.max_pressure = max_pressure
-
-        # $ <pid>
-        _, pid = socket_out.readline().strip().split(' ')
-        self.pid = pid
+            # $ <pid>
+            _, pid = socket_out.readline().strip().split(' ')
+            self.pid = pid
+        except ValueError:
+            # adb accepts the forwarded connection even if minitouch is gone, and closes it at once
+            self.close()
+            raise ConnectionError('invalid minitouch header')
 
         logger.debug(
             f'minitouch running on port: {self.port}, pid: {self.pid}')
@@ -52,6 +57,16 @@ class Session(object):
         self.sock and self.sock.close()
         self.sock = None
 
+    def alive(self) -> bool:
+        """ minitouch never writes after the header, so a readable socket is closed by the other side """
+        if self.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            return not readable or len(self.sock.recv(1, socket.MSG_PEEK)) > 0
+        except OSError:
+            return False
+
     def send(self, content: str) -> bytes:
         content = content.encode('utf8')
         self.sock.sendall(content)
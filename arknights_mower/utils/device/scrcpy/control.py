@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import functools
 import socket
 import struct
@@ -6,6 +8,22 @@ from time import sleep
 from . import const
 
 
+def touch_payload(x: int, y: int, action: int, touch_id: int, resolution: tuple[int, int]) -> bytes:
+    """ body of a touch event, after the byte of control type """
+    x, y = max(x, 0), max(y, 0)
+    return struct.pack(
+        ">BqiiHHHi",
+        action,
+        touch_id,
+        int(x),
+        int(y),
+        int(resolution[0]),
+        int(resolution[1]),
+        0xFFFF,
+        1,
+    )
+
+
 def inject(control_type: int):
     """
     Inject control code, with this inject, we will be able to do unit test
@@ -67,18 +85,7 @@ class ControlSender:
             action: ACTION_DOWN | ACTION_UP | ACTION_MOVE
             touch_id: Default using virtual id -1, you can specify it to emulate multi finger touch
         """
-        x, y = max(x, 0), max(y, 0)
-        return struct.pack(
-            ">BqiiHHHi",
-            action,
-            touch_id,
-            int(x),
-            int(y),
-            int(self.parent.resolution[0]),
-            int(self.parent.resolution[1]),
-            0xFFFF,
-            1,
-        )
+        return touch_payload(x, y, action, touch_id, self.parent.resolution)
 
     @inject(const.TYPE_INJECT_SCROLL_EVENT)
     def scroll(self, x: int, y: int, h: int, v: int) -> bytes:
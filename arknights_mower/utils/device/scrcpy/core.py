@@ -6,6 +6,7 @@ import struct
 import threading
 import time
 import traceback
+from pathlib import Path
 from typing import Optional, Tuple
 
 import numpy as np
@@ -16,6 +17,7 @@ from ..adb_client import ADBClient
 from ..adb_client.socket import Socket
 from . import const
 from .control import ControlSender
+from .gesture import Gesture
 
 SCR_PATH = '/data/local/tmp/minitouch'
 
@@ -33,6 +35,8 @@ class Client:
         lock_screen_orientation: int = const.LOCK_SCREEN_ORIENTATION_UNLOCKED,
         displayid: Optional[int] = None,
         connection_timeout: int = 3000,
+        video: bool = False,
+        server_file: Optional[str] = None,
     ):
         """
         Create a scrcpy client, this client won't be started until you call the start function
@@ -46,6 +50,8 @@ class Client:
             stay_awake: keep Android device awake
             lock_screen_orientation: lock screen orientation, LOCK_SCREEN_ORIENTATION_*
             connection_timeout: timeout for connection, unit is ms
+            video: keep the video stream, read it from video_socket
+            server_file: scrcpy-server 1.21 jar to deploy, the vendored one has no video
         """
 
         # User accessible
@@ -65,6 +71,8 @@ class Client:
         self.lock_screen_orientation = lock_screen_orientation
         self.connection_timeout = connection_timeout
         self.displayid = displayid
+        self.video = video
+        self.server_file = server_file
 
         # Need to destroy
         self.__server_stream: Optional[Socket] = None
@@ -77,11 +85,19 @@ class Client:
     def __del__(self) -> None:
         self.stop()
 
+    @property
+    def video_socket(self) -> Optional[Socket]:
+        """ H.264 stream of the screen, only when started with video """
+        return self.__video_socket if self.video else None
+
     def __start_server(self) -> None:
         """
         Start server and get the connection
         """
         cmdline = f'CLASSPATH={SCR_PATH} app_process /data/local/tmp com.genymobile.scrcpy.Server 1.21 log_level=verbose control=true tunnel_forward=true'
+        if self.video:
+            # raw H.264 stream, without the header of each packet
+            cmdline += f' bit_rate={self.bitrate} max_fps={self.max_fps} max_size={self.max_width} send_frame_meta=false'
         if self.displayid is not None:
             cmdline += f' display_id={self.displayid}'
         self.__server_stream: Socket = self.client.stream_shell(cmdline)
@@ -96,8 +112,11 @@ class Client:
         """
         Deploy server to android device
         """
-        server_file_path = __rootdir__ / 'vendor' / \
-            'scrcpy-server-novideo' / 'scrcpy-server-novideo.jar'
+        if self.server_file is not None:
+            server_file_path = Path(self.server_file)
+        else:
+            server_file_path = __rootdir__ / 'vendor' / \
+                'scrcpy-server-novideo' / 'scrcpy-server-novideo.jar'
         server_buf = server_file_path.read_bytes()
         self.client.push(SCR_PATH, server_buf)
         self.__start_server()
@@ -165,6 +184,16 @@ class Client:
             self.__video_socket.close()
             self.__video_socket = None
 
+    def drop_video(self) -> None:
+        """ restart the vendored server without video, for a video stream nobody reads """
+        if not self.video:
+            return
+        logger.warning('scrcpy 视频流无人读取，以无视频模式重启 scrcpy-server')
+        self.video = False
+        self.server_file = None
+        self.stop()
+        self.start()
+
     def check_adb_alive(self) -> bool:
         """ check if adb server alive """
         return self.client.check_server_alive()
@@ -191,30 +220,35 @@ class Client:
     def tap(self, x: int, y: int) -> None:
         self.control.tap(x, y)
 
+    def tap_batch(self, points: list[tuple[int, int]], interval: float = 0, hold_time: float = 0.07) -> None:
+        """ tap points one after another in one burst of control packets, interval is in seconds """
+        gesture = Gesture(self.resolution)
+        for idx, (x, y) in enumerate(points):
+            gesture.down(x, y).wait(hold_time).up()
+            if idx < len(points) - 1:
+                gesture.wait(interval)
+        self.gesture(gesture)
+
     @stable
+    def gesture(self, gesture: Gesture) -> None:
+        """ send a precomputed gesture, other control events wait till it ends """
+        with self.control_socket_lock:
+            gesture.play(self.control_socket)
+
     def swipe(self, x0, y0, x1, y1, move_duraion: float = 1, hold_before_release: float = 0, fall: bool = True, lift: bool = True):
-        frame_time = 1 / 60
-
-        start_time = time.perf_counter()
-        end_time = start_time + move_duraion
-        fall and self.control.touch(x0, y0, const.ACTION_DOWN)
-        t1 = time.perf_counter()
-        step_time = t1 - start_time
-        if step_time < frame_time:
-            time.sleep(frame_time - step_time)
-        while True:
-            t0 = time.perf_counter()
-            if t0 > end_time:
-                break
-            time_progress = (t0 - start_time) / move_duraion
-            path_progress = time_progress
-            self.control.touch(int(x0 + (x1 - x0) * path_progress),
-                               int(y0 + (y1 - y0) * path_progress), const.ACTION_MOVE)
-            t1 = time.perf_counter()
-            step_time = t1 - t0
-            if step_time < frame_time:
-                time.sleep(frame_time - step_time)
-        self.control.touch(x1, y1, const.ACTION_MOVE)
-        if hold_before_release > 0:
-            time.sleep(hold_before_release)
-        lift and self.control.touch(x1, y1, const.ACTION_UP)
+        gesture = Gesture(self.resolution)
+        if fall:
+            gesture.down(x0, y0)
+        else:
+            gesture.pos = (int(x0), int(y0))
+        gesture.move(x1, y1, move_duraion).hold(hold_before_release)
+        lift and gesture.up()
+        self.gesture(gesture)
+
+    def swipe_ext(self, points: list[tuple[int, int]], durations: list[float], up_wait: float = 0, easing: str = 'linear') -> None:
+        """ swipe through points in one gesture, durations and up_wait are in seconds """
+        gesture = Gesture(self.resolution).down(*points[0])
+        for (x, y), duration in zip(points[1:], durations):
+            gesture.move(x, y, duration, easing)
+        gesture.hold(up_wait).up()
+        self.gesture(gesture)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import math
+import struct
+import time
+from typing import Callable
+
+from . import const
+from .control import touch_payload
+
+# interval between two touch-move events, in seconds
+FRAME_TIME = 1 / 60
+# the last part of each wait is spent spinning, sleep() may oversleep by this much
+SPIN_TIME = 0.002
+
+EASING: dict[str, Callable[[float], float]] = {
+    'linear': lambda t: t,
+    'ease_in': lambda t: t * t,
+    'ease_out': lambda t: 1 - (1 - t) * (1 - t),
+    'ease_in_out': lambda t: 3 * t * t - 2 * t * t * t,
+}
+
+
+class Gesture(object):
+    """ a touch gesture computed beforehand, as control packets with the time to send each one """
+
+    def __init__(self, resolution: tuple[int, int], touch_id: int = -1, frame_time: float = FRAME_TIME) -> None:
+        self.resolution = resolution
+        self.touch_id = touch_id
+        self.frame_time = frame_time
+        # (seconds since the gesture begins, packet)
+        self.events: list[tuple[float, bytes]] = []
+        self.time = 0.0
+        self.pos: tuple[int, int] = None
+
+    @property
+    def duration(self) -> float:
+        return self.time
+
+    def touch(self, x: int, y: int, action: int) -> Gesture:
+        self.pos = (int(x), int(y))
+        package = struct.pack('>B', const.TYPE_INJECT_TOUCH_EVENT) + \
+            touch_payload(self.pos[0], self.pos[1], action, self.touch_id, self.resolution)
+        self.events.append((self.time, package))
+        return self
+
+    def down(self, x: int, y: int) -> Gesture:
+        return self.touch(x, y, const.ACTION_DOWN)
+
+    def up(self) -> Gesture:
+        return self.touch(*self.pos, const.ACTION_UP)
+
+    def move(self, x: int, y: int, duration: float, easing: str = 'linear') -> Gesture:
+        """ move to (x, y) in duration seconds, one event each frame """
+        x0, y0 = self.pos
+        ease = EASING[easing]
+        steps = max(1, math.ceil(duration / self.frame_time - 1e-6))
+        start = self.time
+        for i in range(1, steps + 1):
+            self.time = start + duration * i / steps
+            progress = ease(i / steps)
+            self.touch(x0 + (x - x0) * progress, y0 + (y - y0) * progress, const.ACTION_MOVE)
+        return self
+
+    def wait(self, duration: float) -> Gesture:
+        """ nothing happens for duration seconds """
+        self.time += duration
+        return self
+
+    def hold(self, duration: float) -> Gesture:
+        """ keep still, the move event at the end tells the device that the velocity is zero """
+        if duration > 0:
+            self.time += duration
+            self.touch(*self.pos, const.ACTION_MOVE)
+        return self
+
+    def packets(self) -> list[tuple[float, bytes]]:
+        """ events at the same time are sent together """
+        packets = []
+        for offset, package in self.events:
+            if len(packets) and packets[-1][0] == offset:
+                packets[-1] = (offset, packets[-1][1] + package)
+            else:
+                packets.append((offset, package))
+        return packets
+
+    def play(self, sock) -> list[float]:
+        """ send all packets on time, return the time each one is actually sent, for measurement """
+        packets = self.packets()
+        sent = []
+        start = time.perf_counter()
+        for offset, data in packets:
+            delay = start + offset - time.perf_counter()
+            if delay > SPIN_TIME:
+                time.sleep(delay - SPIN_TIME)
+            while time.perf_counter() < start + offset:
+                pass
+            sock.send(data)
+            sent.append(time.perf_counter() - start)
+        return sent
@@ -6,6 +6,9 @@ import numpy as np
 from . import typealias as tp
 from .log import logger, save_screenshot
 
+# pixel formats of raw screencap, see android.graphics.PixelFormat
+RAW_FORMATS = {1: 'RGBA', 2: 'RGBA', 5: 'BGRA'}
+
 
 def bytes2img(data: bytes, gray: bool = False) -> Union[tp.Image, tp.GrayImage]:
     """ bytes -> image """
@@ -18,6 +21,21 @@ def bytes2img(data: bytes, gray: bool = False) -> Union[tp.Image, tp.GrayImage]:
         )
 
 
+def raw2img(data: bytes) -> tp.Image:
+    """ output of `screencap` without -p -> RGBA image, sharing memory with data """
+    if len(data) < 12:
+        raise ValueError(f'invalid raw screencap: {len(data)} bytes')
+    w, h, fmt = np.frombuffer(data, '<u4', 3)
+    # the header is 12 bytes, Android 12+ appends the color space as the 4th field
+    header = len(data) - int(w) * int(h) * 4
+    if header not in (12, 16) or fmt not in RAW_FORMATS:
+        raise ValueError(f'unsupported raw screencap: {w}x{h}, format {fmt}, {len(data)} bytes')
+    img = np.frombuffer(data, np.uint8, offset=header).reshape(h, w, 4)
+    if RAW_FORMATS[fmt] == 'BGRA':
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+    return img
+
+
 def img2bytes(img) -> bytes:
     """ bytes -> image """
     return cv2.imencode('.png', img)[1]
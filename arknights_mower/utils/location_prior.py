@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import atexit
+import json
+from typing import Optional
+
+from . import typealias as tp
+from .log import logger
+from .path import get_path
+
+PRIOR_FILE = '@app/tmp/location_prior.json'
+# a prior is trusted only after the template has been found this many times
+PRIOR_MIN_HITS = 2
+# margin around the prior, in proportion of the screen height
+PRIOR_MARGIN = 0.05
+# a miss around the prior is inconclusive with this many good matches there, as the matcher needs more than 4
+PRIOR_CANDIDATES = 5
+# the full screen is searched after every miss once the template has been found outside its prior this often
+PRIOR_ESCAPE_RATE = 0.1
+
+
+class LocationPriors(object):
+    """
+    where each template has been found before, per resolution
+
+    only templates registered as unique are searched around their priors,
+    the prior of a template with several instances may hold another one than the best match
+    """
+
+    def __init__(self, prior_file: str = PRIOR_FILE) -> None:
+        self.prior_file = prior_file
+        # {'res@WxH': {'box': [[x0, y0], [x1, y1]], 'hit': n, 'miss': n, 'fallback': n, 'escape': n}},
+        # fallback counts the full-screen searches after a miss around the prior, escape the hits among them
+        self.priors: Optional[dict[str, dict]] = None
+        self.dirty = False
+        # templates which show at most once on the screen
+        self.unique: set[str] = set()
+
+    def register_unique(self, *res: str) -> None:
+        self.unique.update(res)
+
+    @staticmethod
+    def key(res: str, w: int, h: int) -> str:
+        return f'{res}@{w}x{h}'
+
+    def load(self) -> None:
+        """ load priors learned by previous runs """
+        self.priors = {}
+        path = get_path(self.prior_file)
+        if not path.exists():
+            return
+        try:
+            self.priors = json.loads(path.read_text('utf-8'))
+            logger.debug(f'location priors loaded: {len(self.priors)} entries')
+        except Exception as e:
+            logger.warning(f'failed to load location priors: {e}')
+
+    def save(self) -> None:
+        """ write priors back to disk, the file is plain json for inspection """
+        if not self.dirty:
+            return
+        path = get_path(self.prior_file)
+        try:
+            path.parent.mkdir(exist_ok=True, parents=True)
+            path.write_text(json.dumps(self.priors, indent=2, sort_keys=True), 'utf-8')
+            self.dirty = False
+        except Exception as e:
+            logger.warning(f'failed to save location priors: {e}')
+
+    def get(self, res: str, w: int, h: int) -> Optional[dict]:
+        if self.priors is None:
+            self.load()
+        return self.priors.get(self.key(res, w, h))
+
+    def scope(self, res: str, w: int, h: int) -> Optional[tp.Scope]:
+        """ the region to search first, None if there is no trusted prior """
+        if res not in self.unique:
+            return None
+        prior = self.get(res, w, h)
+        if prior is None or prior['hit'] < PRIOR_MIN_HITS:
+            return None
+        margin = int(h * PRIOR_MARGIN)
+        (x0, y0), (x1, y1) = prior['box']
+        return [[max(0, x0 - margin), max(0, y0 - margin)], [min(w, x1 + margin), min(h, y1 + margin)]]
+
+    def record(self, res: str, w: int, h: int, ret: tp.Scope) -> None:
+        """ extend the prior with a successful match """
+        if res not in self.unique:
+            return
+        prior = self.get(res, w, h)
+        box = [[int(ret[0][0]), int(ret[0][1])], [int(ret[1][0]), int(ret[1][1])]]
+        if prior is None:
+            self.priors[self.key(res, w, h)] = {'box': box, 'hit': 1, 'miss': 0}
+        else:
+            (x0, y0), (x1, y1) = prior['box']
+            prior['box'] = [[min(x0, box[0][0]), min(y0, box[0][1])],
+                            [max(x1, box[1][0]), max(y1, box[1][1])]]
+            prior['hit'] += 1
+        self.dirty = True
+
+    def record_miss(self, res: str, w: int, h: int) -> None:
+        """ the template was outside of its prior, count it for debugging """
+        prior = self.get(res, w, h)
+        if prior is not None:
+            prior['miss'] += 1
+            self.dirty = True
+
+    def inconclusive(self, res: str, w: int, h: int, candidates: int) -> bool:
+        """
+        whether a miss around the prior needs a full-screen search
+
+        :param candidates: good matches of the template around the prior
+        """
+        if candidates >= PRIOR_CANDIDATES:
+            return True
+        prior = self.get(res, w, h)
+        return prior is not None and prior.get('escape', 0) > prior['hit'] * PRIOR_ESCAPE_RATE
+
+    def record_fallback(self, res: str, w: int, h: int, found: bool) -> None:
+        """ count the result of a full-screen search after a miss around the prior """
+        prior = self.get(res, w, h)
+        if prior is None:
+            return
+        prior['fallback'] = prior.get('fallback', 0) + 1
+        prior['escape'] = prior.get('escape', 0) + found
+        self.dirty = True
+        logger.debug(f'prior fallback: {res}, missed {prior["fallback"] - prior["escape"]}/{prior["fallback"]}')
+
+
+priors = LocationPriors()
+atexit.register(priors.save)
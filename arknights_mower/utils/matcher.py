@@ -1,23 +1,35 @@
 from __future__ import annotations
 
 import pickle
+import time
 import traceback
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 import sklearn
 from matplotlib import pyplot as plt
-from skimage.metrics import structural_similarity as compare_ssim
 
 from .. import __rootdir__
 from . import typealias as tp
 from .image import cropimg
 from .log import logger
 
+if TYPE_CHECKING:
+    from .template import Template
+
 MATCHER_DEBUG = False
-FLANN_INDEX_KDTREE = 0
+# FLANN algorithms: the screen is searched exhaustively as before,
+# the randomized KD-tree is for approximate queries over many templates, see SceneClassifier
+FLANN_INDEX_LINEAR = 0
+FLANN_INDEX_KDTREE = 1
 GOOD_DISTANCE_LIMIT = 0.7
+# features of the screen are extracted tile by tile
+TILE_SIZE = 256
+TILE_MARGIN = 48
+# pixels differ no more than it are considered unchanged between frames
+TILE_DIFF_THRES = 8
+SSIM_WIN_SIZE = 7
 SIFT = cv2.SIFT_create()
 with open(f'{__rootdir__}/models/svm.model', 'rb') as f:
     SVC = pickle.loads(f.read())
@@ -43,21 +55,190 @@ def aHash(img1: tp.GrayImage, img2: tp.GrayImage) -> int:
     return hammingDistance(hash1, hash2)
 
 
+def ssim(img1: tp.GrayImage, img2: tp.GrayImage) -> float:
+    """
+    mean structural similarity of two gray images, the same as
+    skimage.metrics.structural_similarity(img1, img2, multichannel=True) used before:
+    the last axis is taken as channels, so every column is compared as a 1-D signal
+    """
+    if img1.shape[0] < SSIM_WIN_SIZE:
+        raise ValueError('image is smaller than the ssim window')
+    x, y = img1.astype(np.float64), img2.astype(np.float64)
+    ksize = (1, SSIM_WIN_SIZE)
+    ux, uy = cv2.blur(x, ksize), cv2.blur(y, ksize)
+    uxx, uyy, uxy = cv2.blur(x * x, ksize), cv2.blur(y * y, ksize), cv2.blur(x * y, ksize)
+    # sample covariance
+    cov_norm = SSIM_WIN_SIZE / (SSIM_WIN_SIZE - 1)
+    vx, vy, vxy = cov_norm * (uxx - ux * ux), cov_norm * (uyy - uy * uy), cov_norm * (uxy - ux * uy)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    s = ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux * ux + uy * uy + c1) * (vx + vy + c2))
+    # the border is affected by padding
+    pad = (SSIM_WIN_SIZE - 1) // 2
+    return float(s[pad:-pad].mean())
+
+
+class ScoreProfile(object):
+    """ accumulated time of each stage of Matcher.score, for profiling """
+
+    STAGES = ('index', 'count', 'geometry', 'hash', 'ssim', 'judge')
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.time = dict.fromkeys(self.STAGES, 0.0)
+        self.calls = dict.fromkeys(self.STAGES, 0)
+
+    def add(self, stage: str, start: float) -> float:
+        """ count the time since start into stage, return now as the start of the next stage """
+        now = time.perf_counter()
+        self.time[stage] += now - start
+        self.calls[stage] += 1
+        return now
+
+    def summary(self) -> str:
+        return ', '.join(f'{stage}: {self.calls[stage]} calls {self.time[stage] * 1000:.1f}ms'
+                         for stage in self.STAGES)
+
+
+profile = ScoreProfile()
+
+
+def kp2pts(kp: tuple[cv2.KeyPoint]) -> np.ndarray:
+    """ cv2.KeyPoint -> coordinates, in shape (N, 2) """
+    if len(kp) == 0:
+        return np.empty((0, 2), np.float32)
+    return cv2.KeyPoint_convert(kp).reshape(-1, 2)
+
+
+def pts2kp(pts: np.ndarray) -> tuple[cv2.KeyPoint]:
+    """ coordinates -> cv2.KeyPoint, only for drawing """
+    return cv2.KeyPoint_convert(pts.reshape(-1, 1, 2))
+
+
+def dmatches(good: np.ndarray, idx: np.ndarray, dist: np.ndarray) -> list[cv2.DMatch]:
+    """ good matches -> cv2.DMatch, only for drawing """
+    return [cv2.DMatch(int(q), int(idx[q, 0]), float(np.sqrt(dist[q, 0]))) for q in good]
+
+
 class Matcher(object):
     """ image matching module """
 
     def __init__(self, origin: tp.GrayImage) -> None:
         logger.debug(f'Matcher init: shape ({origin.shape})')
         self.origin = origin
-        self.init_sift()
-
-    def init_sift(self) -> None:
-        """ get SIFT feature points """
-        self.kp, self.des = SIFT.detectAndCompute(self.origin, None)
-
-    def match(self, query: tp.GrayImage, draw: bool = False, scope: tp.Scope = None, judge: bool = True,prescore = 0.0) -> Optional(tp.Scope):
+        self.rows = (origin.shape[0] + TILE_SIZE - 1) // TILE_SIZE
+        self.cols = (origin.shape[1] + TILE_SIZE - 1) // TILE_SIZE
+        # SIFT features of each tile as (coordinates of keypoints, descriptors),
+        # extracted on demand during the lifetime of the frame
+        self.tiles: dict[tuple[int, int], tuple[np.ndarray, np.ndarray]] = {}
+        # tiles unchanged since the previous frame, see inherit()
+        self.clean: set[tuple[int, int]] = set()
+        # FLANN index of each scope, see index()
+        self.indexes: dict[Optional[tuple], tuple] = {}
+
+    @property
+    def pts(self) -> np.ndarray:
+        return self.features()[0]
+
+    @property
+    def des(self) -> Optional[np.ndarray]:
+        return self.features()[1]
+
+    def tiles_of(self, scope: tp.Scope = None) -> list[tuple[int, int]]:
+        """ tiles covered by scope """
+        if scope is None:
+            return [(r, c) for r in range(self.rows) for c in range(self.cols)]
+        (x0, y0), (x1, y1) = scope
+        r0, r1 = max(int(y0) // TILE_SIZE, 0), min(int(y1) // TILE_SIZE, self.rows - 1)
+        c0, c1 = max(int(x0) // TILE_SIZE, 0), min(int(x1) // TILE_SIZE, self.cols - 1)
+        return [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def extract(self, tiles: list[tuple[int, int]]) -> None:
+        """ get SIFT feature points of the bounding box of tiles, and split them into tiles """
+        h, w = self.origin.shape
+        r0, r1 = min(t[0] for t in tiles), max(t[0] for t in tiles)
+        c0, c1 = min(t[1] for t in tiles), max(t[1] for t in tiles)
+        # extend the box with margin, so that keypoints near the tile border stay the same
+        x0, y0 = max(c0 * TILE_SIZE - TILE_MARGIN, 0), max(r0 * TILE_SIZE - TILE_MARGIN, 0)
+        x1 = min((c1 + 1) * TILE_SIZE + TILE_MARGIN, w)
+        y1 = min((r1 + 1) * TILE_SIZE + TILE_MARGIN, h)
+        kp, des = SIFT.detectAndCompute(self.origin[y0:y1, x0:x1], None)
+        if des is None:
+            des = np.empty((0, 128), np.float32)
+        pts = kp2pts(kp) + np.float32([x0, y0])
+
+        row, col = pts[:, 1].astype(int) // TILE_SIZE, pts[:, 0].astype(int) // TILE_SIZE
+        for tile in tiles:
+            mask = (row == tile[0]) & (col == tile[1])
+            self.tiles[tile] = (pts[mask], des[mask])
+        logger.debug(f'Matcher extract: tiles ({r0}, {c0}) - ({r1}, {c1}), {len(kp)} keypoints')
+
+    def inherit(self, prev: Matcher) -> float:
+        """
+        take over the features of tiles which are unchanged since the previous frame
+
+        :return: the rate of tiles reused
+        """
+        if prev.origin.shape != self.origin.shape:
+            return 0.0
+        h, w = self.origin.shape
+        changed = cv2.absdiff(self.origin, prev.origin) > TILE_DIFF_THRES
+        changed = np.pad(changed, ((0, self.rows * TILE_SIZE - h), (0, self.cols * TILE_SIZE - w)))
+        changed = changed.reshape(self.rows, TILE_SIZE, self.cols, TILE_SIZE).any(axis=(1, 3))
+        # keypoints of a tile look into the margin, so the neighbours of a changed tile are dirty as well
+        dirty = cv2.dilate(changed.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+        self.clean = {(r, c) for r, c in zip(*np.nonzero(~dirty))}
+        for tile in self.clean:
+            if tile in prev.tiles:
+                self.tiles[tile] = prev.tiles[tile]
+        return len(self.clean) / (self.rows * self.cols)
+
+    def features(self, scope: tp.Scope = None) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """ get SIFT feature points (coordinates, descriptors) of the tiles covered by scope """
+        tiles = self.tiles_of(scope)
+        missing = [t for t in tiles if t not in self.tiles]
+        if len(missing):
+            self.extract(missing)
+        pts = np.concatenate([self.tiles[t][0] for t in tiles])
+        if len(pts) == 0:
+            return pts, None
+        return pts, np.concatenate([self.tiles[t][1] for t in tiles])
+
+    def index(self, scope: tp.Scope = None) -> tuple[np.ndarray, Optional[np.ndarray], Optional[cv2.flann_Index]]:
+        """ get feature points in scope and the FLANN index built with them, built once per frame """
+        key = None if scope is None else tuple(tuple(x) for x in scope)
+        if key in self.indexes:
+            return self.indexes[key]
+        ori_pts, ori_des = self.features(scope)
+
+        # specify the crop scope
+        if scope is not None and ori_des is not None:
+            inside = (ori_pts >= np.float32(scope[0])).all(axis=1) & (ori_pts <= np.float32(scope[1])).all(axis=1)
+            logger.debug(
+                f'match crop: {scope}, {len(ori_pts)} -> {np.count_nonzero(inside)}')
+            ori_pts, ori_des = ori_pts[inside], ori_des[inside]
+
+        flann = None
+        if ori_des is not None and len(ori_pts) >= 2:
+            flann = cv2.flann_Index(ori_des, dict(algorithm=FLANN_INDEX_LINEAR, trees=5))
+        self.indexes[key] = (ori_pts, ori_des, flann)
+        return self.indexes[key]
+
+    def candidates(self, query: Template, scope: tp.Scope = None) -> int:
+        """ the number of good matches of the template in scope, without locating it """
+        _, _, flann = self.index(scope)
+        if flann is None or query.des is None or len(query.des) == 0:
+            return 0
+        _, dist = flann.knnSearch(query.des, 2, params=dict(checks=50))
+        return int(np.count_nonzero(dist[:, 0] < GOOD_DISTANCE_LIMIT ** 2 * dist[:, 1]))
+
+    def match(self, query: Union[tp.GrayImage, Template], draw: bool = False, scope: tp.Scope = None, judge: bool = True,prescore = 0.0) -> Optional(tp.Scope):
         """ check if the image can be matched """
-        rect_score = self.score(query, draw, scope)  # get matching score
+        # a positive prescore settles the result with ssim alone, SVC needs all four dimensions
+        need_hash = judge and prescore <= 0.0
+        need_ssim = judge or prescore != 0.0
+        rect_score = self.score(query, draw, scope, need_hash=need_hash, need_ssim=need_ssim)  # get matching score
         if rect_score is None:
             return None  # failed in matching
         else:
@@ -66,66 +247,65 @@ class Matcher(object):
         if prescore != 0.0 and score[3] >= prescore:
             logger.debug(f'match success: {score}')
             return rect
+        if prescore > 0.0:
+            logger.debug(f'score is not greater than {prescore}: {score}')
+            return None
         # use SVC to determine if the score falls within the legal range
-        if judge and not SVC.predict([score])[0]:  # numpy.bool_
-            logger.debug(f'match fail: {score}')
-            return None  # failed in matching
-        else:
-            if prescore>0 and score[3]<prescore:
-                logger.debug(f'score is not greater than {prescore}: {score}')
-                return None
-            logger.debug(f'match success: {score}')
-            return rect  # success in matching
-
-    def score(self, query: tp.GrayImage, draw: bool = False, scope: tp.Scope = None, only_score: bool = False) -> Optional(Tuple[tp.Scope, tp.Score]):
-        """ scoring of image matching """
+        if judge:
+            start = time.perf_counter()
+            legal = SVC.predict([score])[0]  # numpy.bool_
+            profile.add('judge', start)
+            if not legal:
+                logger.debug(f'match fail: {score}')
+                return None  # failed in matching
+        logger.debug(f'match success: {score}')
+        return rect  # success in matching
+
+    def score(self, query: Union[tp.GrayImage, Template], draw: bool = False, scope: tp.Scope = None, only_score: bool = False,
+              need_hash: bool = True, need_ssim: bool = True) -> Optional(Tuple[tp.Scope, tp.Score]):
+        """
+        scoring of image matching, in stages from cheap to expensive: count -> geometry -> hash -> ssim
+
+        :param need_hash: compute the hash dimension of score, None if not
+        :param need_ssim: compute the ssim dimension of score, None if not
+        """
         try:
+            start = time.perf_counter()
+            # the index over the feature points in scope, shared by all queries of the frame
+            ori_pts, ori_des, flann = self.index(scope)
+            start = profile.add('index', start)
+
             # if feature points is empty
-            if self.des is None:
+            if ori_des is None:
                 logger.debug('feature points is None')
                 return None
 
-            # specify the crop scope
-            if scope is not None:
-                ori_kp, ori_des = [], []
-                for _kp, _des in zip(self.kp, self.des):
-                    if scope[0][0] <= _kp.pt[0] and scope[0][1] <= _kp.pt[1] and _kp.pt[0] <= scope[1][0] and _kp.pt[1] <= scope[1][1]:
-                        ori_kp.append(_kp)
-                        ori_des.append(_des)
-                logger.debug(
-                    f'match crop: {scope}, {len(self.kp)} -> {len(ori_kp)}')
-                ori_kp, ori_des = np.array(ori_kp), np.array(ori_des)
-            else:
-                ori_kp, ori_des = self.kp, self.des
-
             # if feature points is less than 2
-            if len(ori_kp) < 2:
+            if len(ori_pts) < 2:
                 logger.debug('feature points is less than 2')
                 return None
 
+            # the feature point of query image, templates carry precomputed ones
+            if isinstance(query, np.ndarray):
+                qry_kp, qry_des = SIFT.detectAndCompute(query, None)
+                qry_pts = kp2pts(qry_kp)
+            else:
+                query, qry_pts, qry_des = query.img, query.pts, query.des
+
             # the height & width of query image
             h, w = query.shape
 
-            # the feature point of query image
-            qry_kp, qry_des = SIFT.detectAndCompute(query, None)
-
-            # build FlannBasedMatcher
-            index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-            search_params = dict(checks=50)
-            flann = cv2.FlannBasedMatcher(index_params, search_params)
-            matches = flann.knnMatch(qry_des, ori_des, k=2)
+            idx, dist = flann.knnSearch(qry_des, 2, params=dict(checks=50))
 
-            # store all the good matches as per Lowe's ratio test
-            good = []
-            for x, y in matches:
-                if x.distance < GOOD_DISTANCE_LIMIT * y.distance:
-                    good.append(x)
+            # store all the good matches as per Lowe's ratio test, with squared L2 distances
+            good = np.flatnonzero(dist[:, 0] < GOOD_DISTANCE_LIMIT ** 2 * dist[:, 1])
             good_matches_rate = len(good) / len(qry_des)
+            start = profile.add('count', start)
 
             # draw all the good matches, for debug
             if draw:
                 result = cv2.drawMatches(
-                    query, qry_kp, self.origin, ori_kp, good, None)
+                    query, pts2kp(qry_pts), self.origin, pts2kp(ori_pts), dmatches(good, idx, dist), None)
                 plt.imshow(result, 'gray')
                 plt.show()
             # if the number of good matches no more than 4
@@ -135,19 +315,17 @@ class Matcher(object):
                 return None
 
             # get the coordinates of good matches
-            qry_pts = np.float32(
-                [qry_kp[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-            ori_pts = np.float32(
-                [ori_kp[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+            good_qry_pts = qry_pts[good]
+            good_ori_pts = ori_pts[idx[good, 0]]
 
             # calculated transformation matrix and the mask
-            M, mask = cv2.findHomography(qry_pts, ori_pts, cv2.RANSAC, 5.0)
-            matchesMask = mask.ravel().tolist()
+            M, mask = cv2.findHomography(good_qry_pts.reshape(-1, 1, 2), good_ori_pts.reshape(-1, 1, 2), cv2.RANSAC, 5.0)
 
             # if transformation matrix is None
             if M is None:
                 logger.debug('calculated transformation matrix failed')
                 return None
+            matchesMask = mask.ravel().tolist()
 
             # calc the location of the query image
             quad = np.float32([[[0, 0]], [[0, h-1]], [[w-1, h-1]], [[w-1, 0]]])
@@ -160,8 +338,8 @@ class Matcher(object):
                               True, 0, 2, cv2.LINE_AA)
                 draw_params = dict(matchColor=(0, 255, 0), singlePointColor=None,
                                    matchesMask=matchesMask, flags=2)
-                result = cv2.drawMatches(query, qry_kp, self.origin, ori_kp,
-                                         good, None, **draw_params)
+                result = cv2.drawMatches(query, pts2kp(qry_pts), self.origin, pts2kp(ori_pts),
+                                         dmatches(good, idx, dist), None, **draw_params)
                 plt.imshow(result, 'gray')
                 plt.show()
 
@@ -180,10 +358,8 @@ class Matcher(object):
                 return None
 
             # measure the rate of good match within the rectangle (x-axis)
-            better = filter(
-                lambda m:
-                    rect[0][0] < ori_kp[m.trainIdx].pt[0] < rect[1][0] and rect[0][1] < ori_kp[m.trainIdx].pt[1] < rect[1][1], good)
-            better_kp_x = [qry_kp[m.queryIdx].pt[0] for m in better]
+            better = (good_ori_pts > np.float32(rect[0])).all(axis=1) & (good_ori_pts < np.float32(rect[1])).all(axis=1)
+            better_kp_x = good_qry_pts[better, 0]
             if len(better_kp_x):
                 good_area_rate = np.ptp(better_kp_x) / w
             else:
@@ -200,6 +376,7 @@ class Matcher(object):
 
             # transpose rect_img
             rect_img = cv2.resize(rect_img, query.shape[::-1])
+            start = profile.add('geometry', start)
 
             # draw the result
             if draw or MATCHER_DEBUG:
@@ -210,16 +387,22 @@ class Matcher(object):
                 plt.show()
 
             # calc aHash between query image and rect_img
-            hash = 1 - (aHash(query, rect_img) / 32)
+            hash = None
+            if need_hash or only_score:
+                hash = 1 - (aHash(query, rect_img) / 32)
+                start = profile.add('hash', start)
 
             # calc ssim between query image and rect_img
-            ssim = compare_ssim(query, rect_img, multichannel=True)
+            similarity = None
+            if need_ssim or only_score:
+                similarity = ssim(query, rect_img)
+                profile.add('ssim', start)
 
             # return final rectangle and four dimensions of scoring
             if only_score:
-                return (good_matches_rate, good_area_rate, hash, ssim)
+                return (good_matches_rate, good_area_rate, hash, similarity)
             else:
-                return rect, (good_matches_rate, good_area_rate, hash, ssim)
+                return rect, (good_matches_rate, good_area_rate, hash, similarity)
 
         except Exception as e:
             logger.error(e)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from .. import __rootdir__
+from . import config
+from .log import logger
+from .path import get_path
+
+CACHE_FILE = '@app/tmp/ocr_cache.pkl'
+# bump it when the models or the post-processing of OCR results change
+CACHE_VERSION = 1
+# log the hit rate every this many lookups
+CACHE_LOG_EVERY = 200
+# the models and the data of vocabularies and corrections, a cache saved with other files is discarded
+FINGERPRINT_FILES = [
+    'models/dbnet.onnx',
+    'models/crnn_lite_lstm.onnx',
+    'data/agent.json',
+    'data/level.json',
+    'data/recruit.json',
+    'data/ocr.json',
+]
+
+
+@functools.lru_cache(maxsize=None)
+def fingerprint() -> str:
+    """ hash of FINGERPRINT_FILES and the version of rapidocr, which ships its own models """
+    h = hashlib.blake2b(digest_size=16)
+    for name in FINGERPRINT_FILES:
+        h.update(name.encode())
+        try:
+            with open(f'{__rootdir__}/{name}', 'rb') as f:
+                h.update(hashlib.blake2b(f.read(), digest_size=16).digest())
+        except OSError:
+            h.update(b'missing')
+    try:
+        from importlib.metadata import version
+        h.update(version('rapidocr_onnxruntime').encode())
+    except Exception:
+        h.update(b'missing')
+    return h.hexdigest()
+
+
+class OcrCache(object):
+    """ LRU cache of OCR results, keyed by the exact content of the image """
+
+    def __init__(self, max_bytes: int = None, cache_file: str = CACHE_FILE, persist: bool = None) -> None:
+        """
+        :param max_bytes: memory limit of cached results, config.OCR_CACHE_SIZE MB by default, 0 to disable
+        :param persist: keep the cache on disk across runs, config.OCR_CACHE_PERSIST by default
+        """
+        self.max_bytes = max_bytes
+        self.cache_file = cache_file
+        self.persist = persist
+        # key -> pickled result, so that a hit returns a copy
+        self.entries: Optional[OrderedDict[bytes, bytes]] = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return self.max_bytes if self.max_bytes is not None else int(config.OCR_CACHE_SIZE * (1 << 20))
+
+    @property
+    def persistent(self) -> bool:
+        return self.persist if self.persist is not None else config.OCR_CACHE_PERSIST
+
+    @staticmethod
+    def key(name: str, img: np.ndarray, *args, **kwargs) -> bytes:
+        """ hash of the image bytes, shape and dtype, with the name and arguments of the OCR call """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((name, img.shape, img.dtype.str, args, sorted(kwargs.items()))).encode())
+        h.update(np.ascontiguousarray(img).data)
+        return h.digest()
+
+    def load(self) -> None:
+        """ load results cached by previous runs """
+        self.entries = OrderedDict()
+        self.size = 0
+        if not self.persistent:
+            return
+        path = get_path(self.cache_file)
+        if not path.exists():
+            return
+        try:
+            with path.open('rb') as f:
+                data = pickle.load(f)
+            if data['version'] == CACHE_VERSION and data.get('fingerprint') == fingerprint():
+                for key, value in data['entries']:
+                    self.entries[key] = value
+                    self.size += len(value)
+                self.evict()
+                logger.debug(f'OCR cache loaded: {len(self.entries)} entries')
+            else:
+                logger.debug('OCR cache is outdated or made by other models, discard it')
+        except Exception as e:
+            logger.warning(f'failed to load OCR cache: {e}')
+
+    def save(self) -> None:
+        """ write the cache back to disk, least recently used first """
+        if not self.dirty or not self.persistent:
+            return
+        path = get_path(self.cache_file)
+        try:
+            path.parent.mkdir(exist_ok=True, parents=True)
+            with self.lock:
+                data = {'version': CACHE_VERSION, 'fingerprint': fingerprint(), 'entries': list(self.entries.items())}
+            with path.open('wb') as f:
+                pickle.dump(data, f)
+            self.dirty = False
+            logger.debug(f'OCR cache saved: {len(data["entries"])} entries')
+        except Exception as e:
+            logger.warning(f'failed to save OCR cache: {e}')
+
+    def evict(self) -> None:
+        while self.size > self.limit and len(self.entries):
+            _, value = self.entries.popitem(last=False)
+            self.size -= len(value)
+
+    def get(self, key: bytes) -> tuple[bool, Any]:
+        """ (True, result) on a hit, the result is a fresh copy that the caller may modify """
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            if (self.hits + self.misses) % CACHE_LOG_EVERY == 0:
+                logger.debug(f'OCR 缓存: 命中 {self.hits} 次, 未命中 {self.misses} 次, {len(self.entries)} 条 '
+                             f'{self.size / (1 << 20):.1f}MB')
+        if value is None:
+            return False, None
+        return True, pickle.loads(value)
+
+    def put(self, key: bytes, result: Any) -> None:
+        value = pickle.dumps(result)
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            if len(value) > self.limit:
+                return
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += len(value)
+            self.evict()
+            self.dirty = True
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries = OrderedDict()
+            self.size = 0
+            self.dirty = True
+
+    def cached(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """ wrap an OCR function whose first argument is the image """
+        @functools.wraps(func)
+        def wrapper(img: np.ndarray, *args, **kwargs) -> Any:
+            if self.limit <= 0:
+                return func(img, *args, **kwargs)
+            key = self.key(name, img, *args, **kwargs)
+            hit, result = self.get(key)
+            if hit:
+                return result
+            result = func(img, *args, **kwargs)
+            self.put(key, result)
+            return result
+
+        return wrapper
+
+
+ocr_cache = OcrCache()
+atexit.register(ocr_cache.save)
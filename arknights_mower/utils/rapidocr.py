@@ -1,9 +1,98 @@
+from __future__ import annotations
+
+import traceback
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from ..ocr import ctc
+from .log import logger
+from .ocr_cache import ocr_cache
+from .runtime import runtime
+
 engine = None
+# __recognize_word relies on the internals of TextRecognizer of this version
+RAPIDOCR_VERSION = '1.3.7'
+
+
+def create_engine():
+    from rapidocr_onnxruntime import RapidOCR
+
+    return RapidOCR(text_score=0.3, **runtime.rapidocr_options())
+
+
+def warmup(instance):
+    instance(np.full((32, 100, 3), 255, np.uint8), use_det=False, use_cls=False, use_rec=True)
 
 
 def initialize_ocr():
+    """ register RapidOCR and start warming up every OCR model in background, while the device connects """
     global engine
     if not engine:
-        from rapidocr_onnxruntime import RapidOCR
+        # the same crops, e.g. names of operators, are recognized again and again
+        engine = ocr_cache.cached('rapidocr', runtime.register('rapidocr', create_engine, warmup))
+        runtime.warmup()
+
+
+__charsets: dict[int, dict[str, int]] = {}
+__word_supported = None
+
+
+def word_supported() -> bool:
+    """ whether constrained decoding can run on the installed RapidOCR """
+    global __word_supported
+    if __word_supported is None:
+        try:
+            from importlib.metadata import version
+            installed = version('rapidocr_onnxruntime')
+        except Exception:
+            installed = None
+        __word_supported = installed == RAPIDOCR_VERSION
+        if not __word_supported:
+            logger.warning(f'rapidocr_onnxruntime 版本为 {installed} 而非 {RAPIDOCR_VERSION}，不使用约束解码')
+    return __word_supported
+
+
+def __recognize_word(img: np.ndarray, vocabulary: str) -> tuple[Optional[str], float]:
+    # the recognition model of RapidOCR, prepared the same way as its TextRecognizer
+    rec = runtime.get('rapidocr').text_rec
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    elif img.shape[2] == 4:
+        img = img[..., :3]
+    _, h, w = rec.rec_image_shape
+    norm = rec.resize_norm_img(img, max(w / h, img.shape[1] / img.shape[0]))
+    with runtime.timed('rapidocr'):
+        preds = rec.session(norm[np.newaxis].astype(np.float32))[0][0]
+    # the characters of the model, blank first
+    character = rec.postprocess_op.character
+    if id(character) not in __charsets:
+        __charsets[id(character)] = {char: idx for idx, char in enumerate(character) if idx > 0}
+    return ctc.constrained_decode(ctc.log_probs(preds), ctc.vocabulary(vocabulary), __charsets[id(character)])
+
+
+__cached_recognize_word = ocr_cache.cached('rapidocr_word', __recognize_word)
+
+
+def recognize_word(img: np.ndarray, vocabulary: str) -> tuple[Optional[str], float]:
+    """ the best word of the vocabulary for a single line of text and its score, (None, 0) if it fails """
+    global __word_supported
+    if engine is None or not word_supported():
+        return None, 0.0
+    try:
+        return __cached_recognize_word(img, vocabulary)
+    except Exception:
+        logger.debug(traceback.format_exc())
+        logger.warning('约束解码失败，之后不再使用')
+        __word_supported = False
+        return None, 0.0
+
 
-        engine = RapidOCR(text_score=0.3)
+def read_word(img: np.ndarray, vocabulary: str) -> Optional[str]:
+    """ read a single line of text as a word of the vocabulary, None if no word fits well """
+    word, score = recognize_word(img, vocabulary)
+    if word is not None and score >= ctc.vocabulary(vocabulary).min_score:
+        logger.info(f'约束解码: {vocabulary} -> {word} ({score:.2f})')
+        return word
+    return None
@@ -1,19 +1,21 @@
 from __future__ import annotations
 
 import time
-from typing import List, Optional
+from collections import Counter
+from typing import Callable, List, Optional
 
 import cv2
 import numpy as np
 
-from .. import __rootdir__
-from . import config, detector
+from . import config, detector, location_prior, template
 from . import typealias as tp
+from ..data import template_roi
 from .device import Device
-from .image import bytes2img, cropimg, loadimg, thres2
+from .image import bytes2img, cropimg, img2bytes, raw2img, thres2
 from .log import logger, save_screenshot
 from .matcher import Matcher
 from .scene import Scene, SceneComment
+from .scene_classifier import SceneClassifier
 
 
 class RecognizeError(Exception):
@@ -24,25 +26,46 @@ class Recognizer(object):
 
     def __init__(self, device: Device, screencap: bytes = None) -> None:
         self.device = device
+        self.matcher = None
+        # results of find(), kept as long as the tiles they depend on are unchanged
+        self.find_cache: dict[tuple, tuple[set, Optional[tp.Scope]]] = {}
+        self.raw_unsupported = False
+        template.registry.preload()
         self.start(screencap)
         self.loading_time = 0
         self.LOADING_TIME_LIMIT = 5
         self.CONN_SCOPE = ((1087, 978), (1430, 1017))
         self.CONN_PRESCORE = 0.15
+        self.last_scene = None
+        self.transitions: dict[int, Counter] = {}
 
     def start(self, screencap: bytes = None, build: bool = True) -> None:
         """ init with screencap, build matcher  """
+        self.capture(screencap)
+        self.rebuild(build)
+
+    def capture(self, screencap: bytes = None) -> None:
+        """ take a new frame, leave the matcher to rebuild() """
         retry_times = config.MAX_RETRYTIME
         while retry_times > 0:
+            raw = False
             try:
-                if screencap is not None:
-                    self.screencap = screencap
+                frame = self.device.latest_frame() if screencap is None else None
+                if frame is not None:
+                    self._screencap = None
+                    self.img = frame
+                elif screencap is None and config.SCREENCAP_MODE == 'raw' and not self.raw_unsupported:
+                    raw = True
+                    rgba = raw2img(self.device.screencap_raw())
+                    raw = False
+                    # encoded only when the screencap is saved
+                    self._screencap = None
+                    self.img = cv2.cvtColor(rgba, cv2.COLOR_RGBA2RGB)
                 else:
-                    self.screencap = self.device.screencap()
-                self.img = bytes2img(self.screencap, False)
-                self.gray = bytes2img(self.screencap, True)
+                    self._screencap = screencap if screencap is not None else self.device.screencap()
+                    self.img = bytes2img(self._screencap, False)
+                self.gray = cv2.cvtColor(self.img, cv2.COLOR_RGB2GRAY)
                 self.h, self.w, _ = self.img.shape
-                self.matcher = Matcher(self.gray) if build else None
                 self.scene = Scene.UNDEFINED
                 return
             except cv2.error as e:
@@ -50,12 +73,44 @@ class Recognizer(object):
                 retry_times -= 1
                 time.sleep(1)
                 continue
+            except ValueError as e:
+                if raw:
+                    # an unsupported raw format, retried at once with png
+                    logger.warning(f'{e}, fall back to png screencap')
+                    self.raw_unsupported = True
+                else:
+                    logger.warning(e)
+                    retry_times -= 1
+                    time.sleep(1)
+                continue
         raise RuntimeError('init Recognizer failed')
 
+    @property
+    def screencap(self) -> bytes:
+        """ the screencap in PNG """
+        if self._screencap is None:
+            self._screencap = img2bytes(cv2.cvtColor(self.img, cv2.COLOR_RGB2BGR)).tobytes()
+        return self._screencap
+
+    def rebuild(self, build: bool = True) -> None:
+        """ build matcher for the current frame """
+        prev, self.matcher = self.matcher, Matcher(self.gray) if build else None
+        self.reuse(prev)
+
     def update(self, screencap: bytes = None, rebuild: bool = True) -> None:
         """ rebuild matcher """
         self.start(screencap, rebuild)
 
+    def reuse(self, prev: Optional[Matcher]) -> None:
+        """ reuse features and find() results of the tiles unchanged since the previous frame """
+        if self.matcher is None or prev is None:
+            self.reuse_rate = 0.0
+            self.find_cache = {}
+            return
+        self.reuse_rate = self.matcher.inherit(prev)
+        self.find_cache = {k: v for k, v in self.find_cache.items() if v[0] <= self.matcher.clean}
+        logger.debug(f'frame reused: {self.reuse_rate:.0%}, {len(self.find_cache)} results kept')
+
     def color(self, x: int, y: int) -> tp.Pixel:
         """ get the color of the pixel """
         return self.img[y][x]
@@ -63,226 +118,82 @@ class Recognizer(object):
     def save_screencap(self, folder):
         save_screenshot(self.screencap, subdir=f'{folder}/{self.h}x{self.w}')
 
-    def get_scene(self) -> int:
-        """ get the current scene in the game """
+    def get_scene(self, expected: list[int] = None) -> int:
+        """
+        get the current scene in the game
+
+        :param expected: scenes which are likely to show, they will be checked first
+        """
         if self.scene != Scene.UNDEFINED:
             return self.scene
-        if self.find('connecting', scope=self.CONN_SCOPE, score=self.CONN_PRESCORE) is not None:
-            self.scene = Scene.CONNECTING
-        elif self.find('index_nav', thres=250, scope=((0, 0), (100+self.w//4, self.h//10))) is not None:
-            self.scene = Scene.INDEX
-        elif self.find('nav_index') is not None:
-            self.scene = Scene.NAVIGATION_BAR
-        elif self.find('login_new', score=0.8) is not None:
-            self.scene = Scene.LOGIN_NEW
-        elif self.find('login_bilibili_entry', score=0.8) is not None:  # 会被识别成公告，优先级应当比公告高
-            self.scene = Scene.LOGIN_BILIBILI
-        elif self.find('login_bilibili_privacy_accept', score=0.8) is not None:
-            self.scene = Scene.LOGIN_BILIBILI_PRIVACY
-        elif self.find('close_mine') is not None:
-            self.scene = Scene.CLOSE_MINE
-        elif self.find('check_in') is not None:
-            self.scene = Scene.CHECK_IN
-        elif self.find('materiel_ico') is not None:
-            self.scene = Scene.MATERIEL
-        elif self.find('read_mail') is not None:
-            self.scene = Scene.MAIL
-        elif self.find('loading') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading2') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading3') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading4') is not None:
-            self.scene = Scene.LOADING
-        elif self.is_black():
-            self.scene = Scene.LOADING
-        elif self.find('ope_plan') is not None:
-            self.scene = Scene.OPERATOR_BEFORE
-        elif self.find('ope_select_start') is not None:
-            self.scene = Scene.OPERATOR_SELECT
-        elif self.find('ope_agency_going') is not None:
-            self.scene = Scene.OPERATOR_ONGOING
-        elif self.find('ope_elimi_finished') is not None:
-            self.scene = Scene.OPERATOR_ELIMINATE_FINISH
-        elif self.find('ope_finish') is not None:
-            self.scene = Scene.OPERATOR_FINISH
-        elif self.find('ope_recover_potion_on') is not None:
-            self.scene = Scene.OPERATOR_RECOVER_POTION
-        elif self.find('ope_recover_originite_on') is not None:
-            self.scene = Scene.OPERATOR_RECOVER_ORIGINITE
-        elif self.find('double_confirm') is not None:
-            if self.find('network_check') is not None:
-                self.scene = Scene.NETWORK_CHECK
-            else:
-                self.scene = Scene.DOUBLE_CONFIRM
-        elif self.find('ope_firstdrop') is not None:
-            self.scene = Scene.OPERATOR_DROP
-        elif self.find('ope_eliminate') is not None:
-            self.scene = Scene.OPERATOR_ELIMINATE
-        elif self.find('ope_elimi_agency_panel') is not None:
-            self.scene = Scene.OPERATOR_ELIMINATE_AGENCY
-        elif self.find('ope_giveup') is not None:
-            self.scene = Scene.OPERATOR_GIVEUP
-        elif self.find('ope_failed') is not None:
-            self.scene = Scene.OPERATOR_FAILED
-        elif self.find('friend_list_on') is not None:
-            self.scene = Scene.FRIEND_LIST_ON
-        elif self.find('credit_visiting') is not None:
-            self.scene = Scene.FRIEND_VISITING
-        elif self.find('riic_report_title'):
-            self.scene = Scene.RIIC_REPORT
-        elif self.find('control_central_assistants') is not None:
-            self.scene = Scene.CTRLCENTER_ASSISTANT
-        elif self.find('infra_overview') is not None:
-            self.scene = Scene.INFRA_MAIN
-        elif self.find('infra_todo') is not None:
-            self.scene = Scene.INFRA_TODOLIST
-        elif self.find('clue') is not None:
-            self.scene = Scene.INFRA_CONFIDENTIAL
-        elif self.find('arrange_check_in') or self.find('arrange_check_in_on') is not None:
-            self.scene = Scene.INFRA_DETAILS
-        elif self.find('infra_overview_in') is not None:
-            self.scene = Scene.INFRA_ARRANGE
-        elif self.find('arrange_confirm') is not None:
-            self.scene = Scene.INFRA_ARRANGE_CONFIRM
-        elif self.find('friend_list') is not None:
-            self.scene = Scene.FRIEND_LIST_OFF
-        elif self.find("mission_trainee_on") is not None:
-            self.scene = Scene.MISSION_TRAINEE
-        elif self.find('mission_daily_on') is not None:
-            self.scene = Scene.MISSION_DAILY
-        elif self.find('mission_weekly_on') is not None:
-            self.scene = Scene.MISSION_WEEKLY
-        elif self.find('terminal_pre') is not None:
-            self.scene = Scene.TERMINAL_MAIN
-        elif self.find('open_recruitment') is not None:
-            self.scene = Scene.RECRUIT_MAIN
-        elif self.find('recruiting_instructions') is not None:
-            self.scene = Scene.RECRUIT_TAGS
-        elif self.find('agent_token') is not None:
-            self.scene = Scene.RECRUIT_AGENT
-        elif self.find('agent_token_1080_1440') is not None:
-            self.scene = Scene.RECRUIT_AGENT
-        elif self.find('agent_token_900_1440') is not None:
-            self.scene = Scene.RECRUIT_AGENT
-        elif self.find('agent_unlock') is not None:
-            self.scene = Scene.SHOP_CREDIT
-        elif self.find('shop_credit_2') is not None:
-            self.scene = Scene.SHOP_OTHERS
-        elif self.find('shop_cart') is not None:
-            self.scene = Scene.SHOP_CREDIT_CONFIRM
-        elif self.find('shop_assist') is not None:
-            self.scene = Scene.SHOP_ASSIST
-        elif self.find('login_logo') is not None and self.find('hypergryph') is not None:
-            if self.find('login_awake') is not None:
-                self.scene = Scene.LOGIN_QUICKLY
-            elif self.find('login_account') is not None:
-                self.scene = Scene.LOGIN_MAIN
-            elif self.find('login_iknow') is not None:
-                self.scene = Scene.LOGIN_ANNOUNCE
-            else:
-                self.scene = Scene.LOGIN_MAIN_NOENTRY
-        elif self.find('register') is not None:
-            self.scene = Scene.LOGIN_REGISTER
-        elif self.find('login_loading') is not None:
-            self.scene = Scene.LOGIN_LOADING
-        elif self.find('login_iknow') is not None:
-            self.scene = Scene.LOGIN_ANNOUNCE
-        elif self.find('12cadpa') is not None:
-            if self.find('cadpa_detail') is not None:
-                self.scene = Scene.LOGIN_CADPA_DETAIL
-            else:
-                self.scene = Scene.LOGIN_START
-        elif detector.announcement_close(self.img) is not None:
-            self.scene = Scene.ANNOUNCEMENT
-        elif self.find('skip') is not None:
-            self.scene = Scene.SKIP
-        elif self.find('upgrade') is not None:
-            self.scene = Scene.UPGRADE
-        elif detector.confirm(self.img) is not None:
-            self.scene = Scene.CONFIRM
-        elif self.find('login_verify') is not None:
-            self.scene = Scene.LOGIN_INPUT
-        elif self.find('login_captcha') is not None:
-            self.scene = Scene.LOGIN_CAPTCHA
-        elif self.find('login_connecting') is not None:
-            self.scene = Scene.LOGIN_LOADING
-        elif self.find('main_theme') is not None:
-            self.scene = Scene.TERMINAL_MAIN_THEME
-        elif self.find('episode') is not None:
-            self.scene = Scene.TERMINAL_EPISODE
-        elif self.find('biography') is not None:
-            self.scene = Scene.TERMINAL_BIOGRAPHY
-        elif self.find('collection') is not None:
-            self.scene = Scene.TERMINAL_COLLECTION
-        elif self.find('loading6') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading7') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('arrange_order_options_scene') is not None:
-            self.scene = Scene.INFRA_ARRANGE_ORDER
-        else:
-            self.scene = Scene.UNKNOWN
-            self.device.check_current_focus()
-        # save screencap to analyse
-        if config.SCREENSHOT_PATH is not None:
-            self.save_screencap(self.scene)
-        logger.info(f'Scene: {self.scene}: {SceneComment[self.scene]}')
-
-        if self.scene == Scene.CONNECTING:
-            self.loading_time += 1
-            if self.loading_time > 1:
-                logger.debug(f"检测到连续等待{self.loading_time}次")
-        else:
-            self.loading_time = 0
-        if self.loading_time > self.LOADING_TIME_LIMIT:
-            logger.info(f"检测到连续等待{self.loading_time}次")
-            self.device.exit()
-            time.sleep(3)
-            self.device.check_current_focus()
-
-        return self.scene
+        self.scene = self.detect_scene(SCENE_RULES, expected)
+        return self.scene_detected()
 
-    def get_infra_scene(self) -> int:
+    def get_infra_scene(self, expected: list[int] = None) -> int:
         if self.scene != Scene.UNDEFINED:
             return self.scene
-        if self.find('connecting', scope=self.CONN_SCOPE, score=self.CONN_PRESCORE) is not None:
-            self.scene = Scene.CONNECTING
-        elif self.find('double_confirm') is not None:
-            if self.find('network_check') is not None:
-                self.scene = Scene.NETWORK_CHECK
+        self.scene = self.detect_scene(INFRA_SCENE_RULES, expected)
+        return self.scene_detected()
+
+    def detect_scene(self, rules: list[SceneRule], expected: list[int] = None) -> int:
+        """ check the rules in the order of ordered_rules() """
+        for rule in self.ordered_rules(rules, expected):
+            if (scene := rule.check(self)) is not None:
+                return scene
+        self.device.check_current_focus()
+        return Scene.UNKNOWN
+
+    def ordered_rules(self, rules: list[SceneRule], expected: list[int] = None) -> list[SceneRule]:
+        """
+        pinned rules keep their places, the screen rules between two pinned rules are reordered:
+        the candidate of the scene classifier, then the rules of expected scenes,
+        then observed successors of the last scene
+        """
+        candidate = self.classify_scene(rules)
+        priority = list(expected or [])
+        if self.last_scene in self.transitions:
+            priority += [x for x, _ in self.transitions[self.last_scene].most_common()]
+        if candidate is None and len(priority) == 0:
+            return rules
+        rank = {}
+        for idx, scene in enumerate(priority):
+            rank.setdefault(scene, idx)
+
+        def key(rule: SceneRule) -> int:
+            if rule is candidate:
+                return -1
+            return min(rank.get(x, len(priority)) for x in rule.scenes)
+
+        ordered, screens = [], []
+        for rule in rules:
+            if rule.pinned:
+                # sorted is stable, so the other rules keep their original order
+                ordered += sorted(screens, key=key) + [rule]
+                screens = []
             else:
-                self.scene = Scene.DOUBLE_CONFIRM
-        elif self.find('infra_overview') is not None:
-            self.scene = Scene.INFRA_MAIN
-        elif self.find('infra_todo') is not None:
-            self.scene = Scene.INFRA_TODOLIST
-        elif self.find('clue') is not None:
-            self.scene = Scene.INFRA_CONFIDENTIAL
-        elif self.find('arrange_check_in') or self.find('arrange_check_in_on') is not None:
-            self.scene = Scene.INFRA_DETAILS
-        elif self.find('infra_overview_in') is not None:
-            self.scene = Scene.INFRA_ARRANGE
-        elif self.find('arrange_confirm') is not None:
-            self.scene = Scene.INFRA_ARRANGE_CONFIRM
-        elif self.find('arrange_order_options_scene') is not None:
-            self.scene = Scene.INFRA_ARRANGE_ORDER
-        elif self.find('loading') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading2') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading3') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('loading4') is not None:
-            self.scene = Scene.LOADING
-        elif self.find('index_nav', thres=250, scope=((0, 0), (100+self.w//4, self.h//10))) is not None:
-            self.scene = Scene.INDEX
-        elif self.is_black():
-            self.scene = Scene.LOADING
-        else:
-            self.scene = Scene.UNKNOWN
-            self.device.check_current_focus()
+                screens.append(rule)
+        return ordered + sorted(screens, key=key)
+
+    def classify_scene(self, rules: list[SceneRule]) -> Optional[SceneRule]:
+        """
+        match the features of the whole frame against all scene templates at once,
+        the rule is the candidate only if it is the one label the classifier is confident about;
+        only the dirty tiles are extracted here, and find() reuses them afterwards
+        """
+        if self.matcher is None:
+            return None
+        label = scene_classifier().classify(self.matcher.des, SCENE_CONFIDENCE)
+        logger.debug(f'scene classifier: {label}')
+        if label is None or SCENE_RULES[label] not in rules or SCENE_RULES[label].pinned:
+            return None
+        return SCENE_RULES[label]
+
+    def scene_detected(self) -> int:
+        # remember the transition, which decides the order of rules next time
+        if self.last_scene is not None:
+            self.transitions.setdefault(self.last_scene, Counter())[self.scene] += 1
+        self.last_scene = self.scene
+
         # save screencap to analyse
         if config.SCREENSHOT_PATH is not None:
             self.save_screencap(self.scene)
@@ -325,22 +236,96 @@ class Recognizer(object):
         :return ret: 若匹配成功，则返回元素在游戏界面中出现的位置，否则返回 None
         """
         logger.debug(f'find: {res}')
-        res = f'{__rootdir__}/resources/{res}.png'
+        key = (res, None if scope is None else tuple(map(tuple, scope)), thres, judge, score)
+        if not draw and self.matcher is not None and key in self.find_cache:
+            ret = self.find_cache[key][1]
+            logger.debug(f'find cached: {ret}')
+        else:
+            ret, used = None, scope
+            # search around where the template was found before,
+            # widen on a miss only if the template may be nearby or has left its prior before
+            prior = None
+            if scope is None and thres is None and not draw and self.matcher is not None:
+                prior = location_prior.priors.scope(res, self.w, self.h)
+            if prior is None:
+                ret, used = self.__find(res, draw, scope, thres, judge, score), scope
+            else:
+                ret, used = self.__find(res, draw, prior, thres, judge, score), prior
+                if ret is None:
+                    location_prior.priors.record_miss(res, self.w, self.h)
+                    candidates = self.matcher.candidates(template.get(res), prior)
+                    if location_prior.priors.inconclusive(res, self.w, self.h, candidates):
+                        ret, used = self.__find(res, draw, None, thres, judge, score), None
+                        location_prior.priors.record_fallback(res, self.w, self.h, ret is not None)
+            if ret is not None and scope is None and thres is None:
+                location_prior.priors.record(res, self.w, self.h, ret)
+            if not draw and self.matcher is not None:
+                self.find_cache[key] = (set(self.matcher.tiles_of(used)), ret)
+        if ret is not None:
+            ret = [list(x) for x in ret]
+        if strict and ret is None:
+            raise RecognizeError(f"Can't find '{res}'")
+        return ret
 
+    def __find(self, res: str, draw: bool, scope: tp.Scope, thres: int, judge: bool, score: float) -> tp.Scope:
+        res_img = template.get(res).thres(thres)
+        # the fast path gives neither a score nor the loose result of judge=False, so the matcher decides those
+        if not draw and judge and not score and res in template_roi:
+            decided, ret = self.match_roi(res_img, template_roi[res], scope, thres)
+            if decided:
+                return ret
         if thres is not None:
             # 对图像二值化处理
-            res_img = thres2(loadimg(res, True), thres)
-
             gray_img = cropimg(self.gray, scope)
             matcher = Matcher(thres2(gray_img, thres))
-            ret = matcher.match(res_img, draw=draw, judge=judge, prescore=score)
+            return matcher.match(res_img, draw=draw, judge=judge, prescore=score)
         else:
-            res_img = loadimg(res, True)
             matcher = self.matcher
-            ret = matcher.match(res_img, draw=draw, scope=scope, judge=judge, prescore=score)
-        if strict and ret is None:
-            raise RecognizeError(f"Can't find '{res}'")
-        return ret
+            return matcher.match(res_img, draw=draw, scope=scope, judge=judge, prescore=score)
+
+    def match_roi(self, res_img: template.Template, meta: dict, scope: tp.Scope = None,
+                  thres: int = None) -> tuple[bool, Optional[tp.Scope]]:
+        """
+        normalized template matching inside the expected position of fixed HUD elements
+
+        :return (decided, ret): whether the result is conclusive, and the location found,
+            relative to scope when thres is set, the same as the binarized matcher
+        """
+        # positions are defined in 1920x1080, only 16:9 screens share the layout
+        if self.w * 9 != self.h * 16:
+            return False, None
+        ratio = self.h / 1080
+        (x0, y0), (x1, y1) = [(int(x * ratio), int(y * ratio)) for x, y in meta['roi']]
+        if scope is not None:
+            x0, y0 = max(x0, int(scope[0][0])), max(y0, int(scope[0][1]))
+            x1, y1 = min(x1, int(scope[1][0])), min(y1, int(scope[1][1]))
+        query = res_img.img
+        if ratio != 1:
+            query = cv2.resize(query, None, fx=ratio, fy=ratio)
+        h, w = query.shape
+        if x1 - x0 < w or y1 - y0 < h:
+            return False, None
+        roi = self.gray[y0:y1, x0:x1]
+        if thres is not None:
+            # res_img is binarized already
+            roi = thres2(roi, thres)
+        if meta.get('mode', 'ccoeff') == 'sqdiff':
+            result = 1 - cv2.matchTemplate(roi, query, cv2.TM_SQDIFF_NORMED)
+        else:
+            result = cv2.matchTemplate(roi, query, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        logger.debug(f'match_roi: {res_img.name}, {max_val}')
+        if not np.isfinite(max_val):
+            return False, None
+        if max_val >= meta.get('hit', 0.9):
+            x, y = x0 + max_loc[0], y0 + max_loc[1]
+            if thres is not None and scope is not None:
+                # the binarized matcher works on the crop of scope
+                x, y = x - int(scope[0][0]), y - int(scope[0][1])
+            return True, [[x, y], [x + w, y + h]]
+        if 'miss' in meta and max_val <= meta['miss']:
+            return True, None
+        return False, None
 
     def score(self, res: str, draw: bool = False, scope: tp.Scope = None, thres: int = None) -> Optional[List[float]]:
         """
@@ -354,16 +339,210 @@ class Recognizer(object):
         :return ret: 若匹配成功，则返回元素在游戏界面中出现的位置，否则返回 None
         """
         logger.debug(f'find: {res}')
-        res = f'{__rootdir__}/resources/{res}.png'
+        res_img = template.get(res).thres(thres)
 
         if thres is not None:
             # 对图像二值化处理
-            res_img = thres2(loadimg(res, True), thres)
             gray_img = cropimg(self.gray, scope)
             matcher = Matcher(thres2(gray_img, thres))
             score = matcher.score(res_img, draw=draw, only_score=True)
         else:
-            res_img = loadimg(res, True)
             matcher = self.matcher
             score = matcher.score(res_img, draw=draw, scope=scope, only_score=True)
         return score
+
+
+class SceneRule(object):
+    """ a step of scene detection """
+
+    def __init__(self, res: Optional[str], check: Callable[[Recognizer], Optional[int]],
+                 scenes: tuple[int], pinned: bool = False) -> None:
+        # the main resource of the rule, used by the scene classifier
+        self.res = res
+        self.check = check
+        # scenes which the rule may return
+        self.scenes = scenes
+        # pinned rules are never reordered, e.g. overlays and dialogs which show on other scenes,
+        # and rules which have to be checked before a similar screen after them
+        self.pinned = pinned
+
+
+def found(scene: int, res: str, pinned: bool = False, **kwargs) -> SceneRule:
+    """ the scene is detected once the resource is found """
+    return SceneRule(res, lambda r: scene if r.find(res, **kwargs) is not None else None, (scene,), pinned)
+
+
+def connecting(r: Recognizer) -> Optional[int]:
+    if r.find('connecting', scope=r.CONN_SCOPE, score=r.CONN_PRESCORE) is not None:
+        return Scene.CONNECTING
+
+
+def index(r: Recognizer) -> Optional[int]:
+    if r.find('index_nav', thres=250, scope=((0, 0), (100+r.w//4, r.h//10))) is not None:
+        return Scene.INDEX
+
+
+def double_confirm(r: Recognizer) -> Optional[int]:
+    if r.find('double_confirm') is not None:
+        if r.find('network_check') is not None:
+            return Scene.NETWORK_CHECK
+        return Scene.DOUBLE_CONFIRM
+
+
+def is_black(r: Recognizer) -> Optional[int]:
+    if r.is_black():
+        return Scene.LOADING
+
+
+def arrange_check_in(r: Recognizer) -> Optional[int]:
+    if r.find('arrange_check_in') or r.find('arrange_check_in_on') is not None:
+        return Scene.INFRA_DETAILS
+
+
+def login_logo(r: Recognizer) -> Optional[int]:
+    if r.find('login_logo') is not None and r.find('hypergryph') is not None:
+        if r.find('login_awake') is not None:
+            return Scene.LOGIN_QUICKLY
+        elif r.find('login_account') is not None:
+            return Scene.LOGIN_MAIN
+        elif r.find('login_iknow') is not None:
+            return Scene.LOGIN_ANNOUNCE
+        return Scene.LOGIN_MAIN_NOENTRY
+
+
+def cadpa(r: Recognizer) -> Optional[int]:
+    if r.find('12cadpa') is not None:
+        if r.find('cadpa_detail') is not None:
+            return Scene.LOGIN_CADPA_DETAIL
+        return Scene.LOGIN_START
+
+
+def announcement(r: Recognizer) -> Optional[int]:
+    if detector.announcement_close(r.img) is not None:
+        return Scene.ANNOUNCEMENT
+
+
+def confirm(r: Recognizer) -> Optional[int]:
+    if detector.confirm(r.img) is not None:
+        return Scene.CONFIRM
+
+
+CONNECTING = SceneRule('connecting', connecting, (Scene.CONNECTING,), pinned=True)
+INDEX = SceneRule('index_nav', index, (Scene.INDEX,))
+DOUBLE_CONFIRM = SceneRule('double_confirm', double_confirm, (Scene.NETWORK_CHECK, Scene.DOUBLE_CONFIRM), pinned=True)
+BLACK = SceneRule(None, is_black, (Scene.LOADING,), pinned=True)
+ARRANGE_CHECK_IN = SceneRule('arrange_check_in', arrange_check_in, (Scene.INFRA_DETAILS,), pinned=True)
+INFRA_MAIN = found(Scene.INFRA_MAIN, 'infra_overview')
+INFRA_TODOLIST = found(Scene.INFRA_TODOLIST, 'infra_todo')
+INFRA_CONFIDENTIAL = found(Scene.INFRA_CONFIDENTIAL, 'clue')
+INFRA_ARRANGE = found(Scene.INFRA_ARRANGE, 'infra_overview_in')
+INFRA_ARRANGE_CONFIRM = found(Scene.INFRA_ARRANGE_CONFIRM, 'arrange_confirm')
+INFRA_ARRANGE_ORDER = found(Scene.INFRA_ARRANGE_ORDER, 'arrange_order_options_scene')
+LOADING = [found(Scene.LOADING, x, pinned=True) for x in ['loading', 'loading2', 'loading3', 'loading4']]
+
+# the order matters, e.g. login_bilibili_entry would be recognized as announcement,
+# so overlays, dialogs and rules shadowing later ones are pinned, e.g. arrange_check_in before
+# infra_overview_in, agent_unlock before shop_credit_2 and login_logo before login_iknow
+SCENE_RULES = [
+    CONNECTING,
+    INDEX,
+    found(Scene.NAVIGATION_BAR, 'nav_index', pinned=True),
+    found(Scene.LOGIN_NEW, 'login_new', pinned=True, score=0.8),
+    found(Scene.LOGIN_BILIBILI, 'login_bilibili_entry', pinned=True, score=0.8),
+    found(Scene.LOGIN_BILIBILI_PRIVACY, 'login_bilibili_privacy_accept', pinned=True, score=0.8),
+    found(Scene.CLOSE_MINE, 'close_mine', pinned=True),
+    found(Scene.CHECK_IN, 'check_in', pinned=True),
+    found(Scene.MATERIEL, 'materiel_ico', pinned=True),
+    found(Scene.MAIL, 'read_mail'),
+    *LOADING,
+    BLACK,
+    found(Scene.OPERATOR_BEFORE, 'ope_plan'),
+    found(Scene.OPERATOR_SELECT, 'ope_select_start'),
+    found(Scene.OPERATOR_ONGOING, 'ope_agency_going'),
+    found(Scene.OPERATOR_ELIMINATE_FINISH, 'ope_elimi_finished'),
+    found(Scene.OPERATOR_FINISH, 'ope_finish'),
+    found(Scene.OPERATOR_RECOVER_POTION, 'ope_recover_potion_on', pinned=True),
+    found(Scene.OPERATOR_RECOVER_ORIGINITE, 'ope_recover_originite_on', pinned=True),
+    DOUBLE_CONFIRM,
+    found(Scene.OPERATOR_DROP, 'ope_firstdrop', pinned=True),
+    found(Scene.OPERATOR_ELIMINATE, 'ope_eliminate'),
+    found(Scene.OPERATOR_ELIMINATE_AGENCY, 'ope_elimi_agency_panel'),
+    found(Scene.OPERATOR_GIVEUP, 'ope_giveup'),
+    found(Scene.OPERATOR_FAILED, 'ope_failed'),
+    found(Scene.FRIEND_LIST_ON, 'friend_list_on', pinned=True),
+    found(Scene.FRIEND_VISITING, 'credit_visiting'),
+    found(Scene.RIIC_REPORT, 'riic_report_title'),
+    found(Scene.CTRLCENTER_ASSISTANT, 'control_central_assistants'),
+    INFRA_MAIN,
+    INFRA_TODOLIST,
+    INFRA_CONFIDENTIAL,
+    ARRANGE_CHECK_IN,
+    INFRA_ARRANGE,
+    INFRA_ARRANGE_CONFIRM,
+    found(Scene.FRIEND_LIST_OFF, 'friend_list'),
+    found(Scene.MISSION_TRAINEE, 'mission_trainee_on'),
+    found(Scene.MISSION_DAILY, 'mission_daily_on'),
+    found(Scene.MISSION_WEEKLY, 'mission_weekly_on'),
+    found(Scene.TERMINAL_MAIN, 'terminal_pre'),
+    found(Scene.RECRUIT_MAIN, 'open_recruitment'),
+    found(Scene.RECRUIT_TAGS, 'recruiting_instructions'),
+    found(Scene.RECRUIT_AGENT, 'agent_token'),
+    found(Scene.RECRUIT_AGENT, 'agent_token_1080_1440'),
+    found(Scene.RECRUIT_AGENT, 'agent_token_900_1440'),
+    found(Scene.SHOP_CREDIT, 'agent_unlock', pinned=True),
+    found(Scene.SHOP_OTHERS, 'shop_credit_2'),
+    found(Scene.SHOP_CREDIT_CONFIRM, 'shop_cart'),
+    found(Scene.SHOP_ASSIST, 'shop_assist'),
+    SceneRule('login_logo', login_logo, (Scene.LOGIN_QUICKLY, Scene.LOGIN_MAIN,
+                                         Scene.LOGIN_ANNOUNCE, Scene.LOGIN_MAIN_NOENTRY), pinned=True),
+    found(Scene.LOGIN_REGISTER, 'register'),
+    found(Scene.LOGIN_LOADING, 'login_loading'),
+    found(Scene.LOGIN_ANNOUNCE, 'login_iknow'),
+    SceneRule('12cadpa', cadpa, (Scene.LOGIN_CADPA_DETAIL, Scene.LOGIN_START)),
+    SceneRule(None, announcement, (Scene.ANNOUNCEMENT,), pinned=True),
+    found(Scene.SKIP, 'skip', pinned=True),
+    found(Scene.UPGRADE, 'upgrade', pinned=True),
+    SceneRule(None, confirm, (Scene.CONFIRM,), pinned=True),
+    found(Scene.LOGIN_INPUT, 'login_verify'),
+    found(Scene.LOGIN_CAPTCHA, 'login_captcha'),
+    found(Scene.LOGIN_LOADING, 'login_connecting'),
+    found(Scene.TERMINAL_MAIN_THEME, 'main_theme'),
+    found(Scene.TERMINAL_EPISODE, 'episode'),
+    found(Scene.TERMINAL_BIOGRAPHY, 'biography'),
+    found(Scene.TERMINAL_COLLECTION, 'collection'),
+    found(Scene.LOADING, 'loading6', pinned=True),
+    found(Scene.LOADING, 'loading7', pinned=True),
+    INFRA_ARRANGE_ORDER,
+]
+
+INFRA_SCENE_RULES = [
+    CONNECTING,
+    DOUBLE_CONFIRM,
+    INFRA_MAIN,
+    INFRA_TODOLIST,
+    INFRA_CONFIDENTIAL,
+    ARRANGE_CHECK_IN,
+    INFRA_ARRANGE,
+    INFRA_ARRANGE_CONFIRM,
+    INFRA_ARRANGE_ORDER,
+    *LOADING,
+    INDEX,
+    BLACK,
+]
+
+# templates marking a scene or at a fixed place show only once, so they can be searched around their priors
+location_prior.priors.register_unique(*template_roi, *{rule.res for rule in SCENE_RULES if rule.res is not None})
+
+# the scene classifier only takes the result when a single label is confident enough
+SCENE_CONFIDENCE = 0.3
+__scene_classifier = None
+
+
+def scene_classifier() -> SceneClassifier:
+    """ build the scene classifier on first use, labels are indices of SCENE_RULES """
+    global __scene_classifier
+    if __scene_classifier is None:
+        labels = [i for i, rule in enumerate(SCENE_RULES) if rule.res is not None]
+        templates = [template.get(SCENE_RULES[i].res) for i in labels]
+        __scene_classifier = SceneClassifier(labels, templates)
+    return __scene_classifier
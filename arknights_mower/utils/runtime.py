@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from . import config
+from .log import logger
+
+# log the timings of a model every this many runs
+RUNTIME_LOG_EVERY = 100
+
+GRAPH_OPTIMIZATION = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+
+class Timing(object):
+    """ inference timings of a model """
+
+    def __init__(self) -> None:
+        self.load = 0.0
+        self.runs = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.runs += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def __str__(self) -> str:
+        mean = self.total / self.runs * 1000 if self.runs else 0
+        return f'加载 {self.load * 1000:.0f}ms, 推理 {self.runs} 次, 平均 {mean:.1f}ms, 最长 {self.max * 1000:.1f}ms'
+
+
+class Model(object):
+    """ a model registered in the runtime, loaded on first use """
+
+    def __init__(self, runtime: ModelRuntime, name: str) -> None:
+        self.runtime = runtime
+        self.name = name
+
+    @property
+    def instance(self) -> Any:
+        return self.runtime.get(self.name)
+
+    def run(self, output_names: list[str], feed: dict[str, Any]) -> list:
+        """ run an ONNX session """
+        return self.runtime.run(self.name, output_names, feed)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        """ call a model object such as RapidOCR """
+        instance = self.instance
+        with self.runtime.timed(self.name):
+            return instance(*args, **kwargs)
+
+
+class ModelRuntime(object):
+    """ all OCR models of the process: tuned session options, lazy loading, background warm-up and timings """
+
+    def __init__(self) -> None:
+        self.loaders: dict[str, Callable[[], Any]] = {}
+        self.warmups: dict[str, Optional[Callable[[Any], None]]] = {}
+        self.instances: dict[str, Any] = {}
+        self.locks: dict[str, threading.Lock] = {}
+        self.timings: dict[str, Timing] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def session_options() -> Any:
+        """ session options from config, shared by every ONNX session """
+        import onnxruntime as rt
+
+        options = rt.SessionOptions()
+        options.log_severity_level = 3
+        if config.OCR_INTRA_OP_THREADS > 0:
+            options.intra_op_num_threads = config.OCR_INTRA_OP_THREADS
+        if config.OCR_INTER_OP_THREADS > 0:
+            options.inter_op_num_threads = config.OCR_INTER_OP_THREADS
+        level = GRAPH_OPTIMIZATION.get(config.OCR_GRAPH_OPTIMIZATION, GRAPH_OPTIMIZATION['all'])
+        options.graph_optimization_level = getattr(rt.GraphOptimizationLevel, level)
+        return options
+
+    @staticmethod
+    def rapidocr_options() -> dict[str, int]:
+        """ the same thread settings, as arguments of RapidOCR """
+        options = {}
+        if config.OCR_INTRA_OP_THREADS > 0:
+            options['intra_op_num_threads'] = config.OCR_INTRA_OP_THREADS
+        if config.OCR_INTER_OP_THREADS > 0:
+            options['inter_op_num_threads'] = config.OCR_INTER_OP_THREADS
+        return options
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Callable[[Any], None] = None) -> Model:
+        """
+        register a model, it is loaded by the first get() or by warm-up
+
+        :param loader: returns the model object
+        :param warmup: runs the loaded model once on a dummy input
+        """
+        with self.lock:
+            if name not in self.loaders:
+                self.loaders[name] = loader
+                self.warmups[name] = warmup
+                self.locks[name] = threading.Lock()
+                self.timings[name] = Timing()
+        return Model(self, name)
+
+    def register_onnx(self, name: str, path: str, warmup: Callable[[Any], None] = None) -> Model:
+        """ register an ONNX model file, loaded as an InferenceSession with the shared options """
+        def loader() -> Any:
+            import onnxruntime as rt
+
+            return rt.InferenceSession(path, self.session_options(), providers=['CPUExecutionProvider'])
+
+        return self.register(name, loader, warmup)
+
+    def get(self, name: str) -> Any:
+        """ the loaded model, loaded at most once even if several threads ask for it together """
+        if name in self.instances:
+            return self.instances[name]
+        with self.locks[name]:
+            if name not in self.instances:
+                start = time.perf_counter()
+                self.instances[name] = self.loaders[name]()
+                self.timings[name].load = time.perf_counter() - start
+                logger.debug(f'模型 {name} 加载用时 {self.timings[name].load:.2f}s')
+        return self.instances[name]
+
+    def loaded(self, name: str) -> bool:
+        return name in self.instances
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.timings[name]
+            timing.add(time.perf_counter() - start)
+            if timing.runs % RUNTIME_LOG_EVERY == 0:
+                logger.debug(f'模型 {name}: {timing}')
+
+    def run(self, name: str, output_names: list[str], feed: dict[str, Any]) -> list:
+        """ run a registered ONNX session and record its time """
+        session = self.get(name)
+        with self.timed(name):
+            return session.run(output_names, feed)
+
+    def warmup(self, background: bool = True) -> Optional[threading.Thread]:
+        """ load every registered model and run it once, in background so that it overlaps device connection """
+        if not config.OCR_WARMUP:
+            return None
+        if not background:
+            self.__warmup()
+            return None
+        thread = threading.Thread(target=self.__warmup, name='ocr-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def __warmup(self) -> None:
+        with self.lock:
+            names = list(self.loaders)
+        for name in names:
+            try:
+                instance = self.get(name)
+                if self.warmups[name] is not None:
+                    self.warmups[name](instance)
+            except Exception:
+                # the model is unusable, the same error shows up again on its first use
+                logger.debug(f'模型 {name} 预热失败')
+                logger.debug(traceback.format_exc())
+
+    def summary(self) -> str:
+        return '\n'.join(f'{name}: {timing}' for name, timing in self.timings.items())
+
+
+runtime = ModelRuntime()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .log import logger
+from .matcher import FLANN_INDEX_KDTREE, GOOD_DISTANCE_LIMIT
+from .template import Template
+
+
+class SceneClassifier(object):
+    """ classify the screen against all scene templates with a single FLANN query """
+
+    def __init__(self, labels: list[int], templates: list[Template]) -> None:
+        des, owner = [], []
+        for label, tpl in zip(labels, templates):
+            if tpl.des is None:
+                continue
+            des.append(tpl.des)
+            owner.append(np.full(len(tpl.des), label, dtype=np.int32))
+        self.des = np.concatenate(des).astype(np.float32)
+        # which label every descriptor belongs to
+        self.owner = np.concatenate(owner)
+        # how many descriptors each label owns
+        self.size = np.bincount(self.owner)
+        self.index = cv2.flann_Index(self.des, dict(algorithm=FLANN_INDEX_KDTREE, trees=4))
+        logger.debug(f'SceneClassifier init: {len(templates)} templates, {len(self.des)} descriptors')
+
+    def rank(self, des: Optional[np.ndarray]) -> list[tuple[int, float]]:
+        """
+        rank labels by the rate of their descriptors matched by the screen
+
+        :param des: descriptors of the screen
+        :return: [(label, confidence), ...], confidence in descending order
+        """
+        if des is None or len(des) < 2:
+            return []
+        idx, dist = self.index.knnSearch(des.astype(np.float32), 2, params=dict(checks=32))
+        # Lowe's ratio test, with squared L2 distances
+        good = dist[:, 0] < GOOD_DISTANCE_LIMIT ** 2 * dist[:, 1]
+        hit = np.unique(idx[good, 0])
+        votes = np.bincount(self.owner[hit], minlength=len(self.size))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            confidence = np.where(self.size > 0, votes / self.size, 0)
+        order = np.argsort(-confidence)
+        return [(int(x), float(confidence[x])) for x in order if confidence[x] > 0]
+
+    def classify(self, des: Optional[np.ndarray], confidence: float) -> Optional[int]:
+        """ the only label reaching the confidence, None if no label or several labels reach it """
+        passed = [label for label, x in self.rank(des) if x >= confidence]
+        if len(passed) != 1:
+            return None
+        return passed[0]
@@ -355,7 +355,9 @@ def agent(img, draw=False):
             x0 += 1
 
         # ocr 初步识别干员名称
-        ocr = ocrhandle.predict(img[ :, x0:right ])
+        # 裁剪的宽度随 x0 变化，行的位置按整个屏幕的尺寸记录
+        ocr = ocrhandle.predict_layout(img[ :, x0:right ], 'agent', lambda x: x in agent_list, vocabulary='agent',
+                                       size=(width, height))
 
         # 收集成功识别出来的干员名称识别结果，提取 y 范围，并将重叠的范围进行合并
         segs = [ (min(x[ 2 ][ 0 ][ 1 ], x[ 2 ][ 1 ][ 1 ]), max(x[ 2 ][ 2 ][ 1 ], x[ 2 ][ 3 ][ 1 ]))
@@ -1,8 +1,15 @@
 import subprocess
 from enum import Enum
+from arknights_mower.utils import config
+from arknights_mower.utils.device.adb_client.recovery import Recovery
 from arknights_mower.utils.log import logger
 import time
 
+# 模拟器启动最多等待的秒数
+SIMULATOR_BOOT_TIMEOUT = 25
+# 开始探测前至少等待的秒数，避免探测到尚未退出的旧实例
+SIMULATOR_MIN_WAIT = 5
+
 
 class Simulator_Type(Enum):
     Nox = "夜神"
@@ -43,12 +50,22 @@ def restart_simulator(data, stop=True, start=True):
             cmd = "waydroid show-full-ui"
         if start:
             exec_cmd(cmd, data["simulator_folder"])
-            logger.info(f"开始启动{simulator_type}模拟器，等待25秒钟")
-            time.sleep(25)
+            logger.info(f"开始启动{simulator_type}模拟器，等待启动完成")
+            wait_simulator_ready()
     else:
         logger.warning(f"尚未支持{simulator_type}重启/自动启动")
 
 
+def wait_simulator_ready(timeout=SIMULATOR_BOOT_TIMEOUT):
+    """ 探测 ADB 直到模拟器启动完成，最多等待 timeout 秒 """
+    device_id = config.ADB_DEVICE[0] if len(config.ADB_DEVICE) and config.ADB_DEVICE[0] != '' else None
+    connect = [target for target in config.ADB_CONNECT if target != '']
+    start = time.monotonic()
+    time.sleep(SIMULATOR_MIN_WAIT)
+    if Recovery(device_id, connect).wait(timeout - SIMULATOR_MIN_WAIT):
+        logger.info(f"模拟器启动完成，用时{time.monotonic() - start:.1f}秒")
+
+
 def exec_cmd(cmd, folder_path):
     try:
         process = subprocess.Popen(
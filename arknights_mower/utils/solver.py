@@ -8,6 +8,9 @@ import time
 import traceback
 import requests
 
+import cv2
+import numpy as np
+
 from bs4 import BeautifulSoup
 from abc import abstractmethod
 
@@ -18,14 +21,63 @@ from .log import logger
 from .recognize import RecognizeError, Recognizer, Scene
 
 
+# adaptive waiting after input, see BaseSolver.wait_stable
+STABLE_SCALE = 8  # frames are compared after shrinking by this factor
+STABLE_PIXEL_DIFF = 24  # pixels differ more than it are changed
+STABLE_CHANGE_RATE = 0.002  # the screen is changed if the rate of changed pixels exceeds it
+STABLE_POLL_INTERVAL = 0.1
+STABLE_POLLS = 3  # the screen is settled after this many unchanged polls in a row
+STABLE_SETTLE_TIME = 0.3  # and no change for this long, animations may pause between two polls
+STABLE_LOG_EVERY = 50
+
+# milliseconds between taps of BaseSolver.tap_batch, minitouch used to pause this long after each tap
+TAP_BATCH_DELAY = 50
+
+
 class StrategyError(Exception):
     """ Strategy Error """
     pass
 
 
+class WaitStats(object):
+    """ how much time adaptive waiting saves compared with fixed intervals """
+
+    def __init__(self) -> None:
+        self.waits = 0
+        self.settled = 0
+        self.saved = 0.0
+
+    def add(self, interval: float, elapsed: float, settled: bool) -> None:
+        self.waits += 1
+        if settled:
+            self.settled += 1
+            self.saved += max(interval - elapsed, 0)
+        if self.waits % STABLE_LOG_EVERY == 0:
+            logger.info(f'自适应等待: {self.waits} 次, 提前结束 {self.settled} 次, 共节省 {self.saved:.1f}s')
+
+
+wait_stats = WaitStats()
+
+
+def shrink(gray: tp.GrayImage) -> tp.GrayImage:
+    """ downscaled frame for cheap comparison """
+    h, w = gray.shape
+    return cv2.resize(gray, (w // STABLE_SCALE, h // STABLE_SCALE), interpolation=cv2.INTER_AREA)
+
+
+def change_rate(img1: tp.GrayImage, img2: tp.GrayImage) -> float:
+    """ rate of changed pixels between two shrunk frames """
+    if img1.shape != img2.shape:
+        return 1.0
+    return np.count_nonzero(cv2.absdiff(img1, img2) > STABLE_PIXEL_DIFF) / img1.size
+
+
 class BaseSolver:
     """ Base class, provide basic operation """
 
+    # scenes which the solver mostly works on, checked first by scene detection
+    expected_scenes: list[int] = None
+
     def __init__(self, device: Device = None, recog: Recognizer = None) -> None:
         # self.device = device if device is not None else (recog.device if recog is not None else Device())
         if device is None and recog is not None:
@@ -90,6 +142,40 @@ class BaseSolver:
         time.sleep(interval)
         self.recog.update(rebuild=rebuild)
 
+    def wait_stable(self, interval: float = 1, rebuild: bool = True) -> None:
+        """ after input, wait until the screen has changed and then settled, for interval at most """
+        if not config.ADAPTIVE_WAIT or interval <= 0:
+            return self.sleep(interval, rebuild)
+        start = time.monotonic()
+        deadline = start + interval
+        # the frame before input
+        baseline = prev = shrink(self.recog.gray)
+        changed = False
+        # unchanged polls in a row, and when the last change was seen
+        stable, last_change = 0, start
+        while time.monotonic() < deadline:
+            poll = time.monotonic()
+            self.recog.capture()
+            current = shrink(self.recog.gray)
+            if not changed:
+                changed = change_rate(current, baseline) > STABLE_CHANGE_RATE
+                last_change = poll
+            elif change_rate(current, prev) > STABLE_CHANGE_RATE:
+                stable, last_change = 0, poll
+            else:
+                stable += 1
+                if stable >= STABLE_POLLS and poll - last_change >= STABLE_SETTLE_TIME:
+                    elapsed = time.monotonic() - start
+                    logger.debug(f'screen settled in {elapsed:.2f}s, interval {interval}s')
+                    wait_stats.add(interval, elapsed, True)
+                    self.recog.rebuild(rebuild)
+                    return
+            prev = current
+            time.sleep(max(0, min(STABLE_POLL_INTERVAL - (time.monotonic() - poll), deadline - time.monotonic())))
+        # the screen does not settle in time, take the frame at the deadline as before
+        wait_stats.add(interval, interval, False)
+        self.recog.update(rebuild=rebuild)
+
     def input(self, referent: str, input_area: tp.Scope, text: str = None) -> None:
         """ input text """
         logger.debug(f'input: {referent} {input_area}')
@@ -110,7 +196,14 @@ class BaseSolver:
         pos = self.get_pos(poly, x_rate, y_rate)
         self.device.tap(pos)
         if interval > 0:
-            self.sleep(interval, rebuild)
+            self.wait_stable(interval, rebuild)
+
+    def tap_batch(self, polys: list[tp.Location], x_rate: float = 0.5, y_rate: float = 0.5,
+                  delay: int = TAP_BATCH_DELAY, interval: float = 1, rebuild: bool = True) -> None:
+        """ tap several places in one device interaction, delay is between taps in milliseconds """
+        self.device.tap_batch([self.get_pos(poly, x_rate, y_rate) for poly in polys], delay)
+        if len(polys) and interval > 0:
+            self.wait_stable(interval, rebuild)
 
     def tap_element(self, element_name: str, x_rate: float = 0.5, y_rate: float = 0.5, interval: float = 1,
                     rebuild: bool = True,
@@ -142,7 +235,7 @@ class BaseSolver:
         end = (start[0] + movement[0], start[1] + movement[1])
         self.device.swipe(start, end, duration=duration)
         if interval > 0:
-            self.sleep(interval, rebuild)
+            self.wait_stable(interval, rebuild)
 
     def swipe_only(self, start: tp.Coordinate, movement: tp.Coordinate, duration: int = 100,
                    interval: float = 1) -> None:
@@ -183,20 +276,20 @@ class BaseSolver:
             points.append((start[0] + movement[0], start[1]))
         self.device.swipe_ext(points, durations=[200, dis * duration // 100, 200])
         if interval > 0:
-            self.sleep(interval, rebuild)
+            self.wait_stable(interval, rebuild)
 
     def back(self, interval: float = 1, rebuild: bool = True) -> None:
         """ send back keyevent """
         self.device.send_keyevent(KeyCode.KEYCODE_BACK)
-        self.sleep(interval, rebuild)
+        self.wait_stable(interval, rebuild)
 
     def scene(self) -> int:
         """ get the current scene in the game """
-        return self.recog.get_scene()
+        return self.recog.get_scene(self.expected_scenes)
 
     def get_infra_scene(self) -> int:
         """ get the current scene in the infra """
-        return self.recog.get_infra_scene()
+        return self.recog.get_infra_scene(self.expected_scenes)
 
     def is_login(self):
         """ check if you are logged in """
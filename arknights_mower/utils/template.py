@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .. import __rootdir__
+from . import typealias as tp
+from .image import thres2
+from .log import logger
+from .matcher import SIFT
+from .path import get_path
+
+# bump it when the layout of the cache file changes
+CACHE_VERSION = 1
+CACHE_FILE = '@app/tmp/template.cache'
+
+
+def kp2array(kp: tuple[cv2.KeyPoint]) -> np.ndarray:
+    """ cv2.KeyPoint -> picklable array """
+    return np.array([(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id) for k in kp],
+                    dtype=np.float64).reshape(-1, 7)
+
+
+def array2kp(data: np.ndarray) -> tuple[cv2.KeyPoint]:
+    """ picklable array -> cv2.KeyPoint """
+    return tuple(cv2.KeyPoint(x, y, size, angle, response, int(octave), int(class_id))
+                 for x, y, size, angle, response, octave, class_id in data)
+
+
+class Template(object):
+    """ resource template, with its features extracted only once """
+
+    def __init__(self, registry: TemplateRegistry, name: str, img: tp.GrayImage, key: str) -> None:
+        self.registry = registry
+        self.name = name
+        self.img = img
+        self.key = key
+        # keypoints as array, see kp2array()
+        self.points, self.des = registry.features(key, img)
+        self.pts = self.points[:, :2].astype(np.float32)
+        self._kp = None
+        self.variants = {}
+
+    @property
+    def kp(self) -> tuple[cv2.KeyPoint]:
+        """ keypoints as cv2.KeyPoint, only needed for drawing """
+        if self._kp is None:
+            self._kp = array2kp(self.points)
+        return self._kp
+
+    def thres(self, thresh: Optional[int]) -> Template:
+        """ binarized variant of the template """
+        if thresh is None:
+            return self
+        if thresh not in self.variants:
+            self.variants[thresh] = Template(
+                self.registry, self.name, thres2(self.img, thresh), f'{self.key}@{thresh}')
+        return self.variants[thresh]
+
+
+class TemplateRegistry(object):
+    """ load every resource template once, and keep its features on disk keyed by content hash """
+
+    def __init__(self, folder: Path = None, cache_file: str = CACHE_FILE) -> None:
+        self.folder = Path(folder) if folder is not None else __rootdir__ / 'resources'
+        self.cache_file = cache_file
+        self.templates: dict[str, Template] = {}
+        self.cache: Optional[dict] = None
+        self.dirty = False
+
+    def cache_path(self) -> Path:
+        return get_path(self.cache_file)
+
+    def load_cache(self) -> None:
+        """ load features computed by previous runs """
+        self.cache = {}
+        path = self.cache_path()
+        if not path.exists():
+            return
+        try:
+            with path.open('rb') as f:
+                data = pickle.load(f)
+            if data['version'] == CACHE_VERSION and data['opencv'] == cv2.__version__:
+                self.cache = data['features']
+                logger.debug(f'template cache loaded: {len(self.cache)} entries')
+            else:
+                logger.debug('template cache is outdated, discard it')
+        except Exception as e:
+            logger.warning(f'failed to load template cache: {e}')
+
+    def save(self) -> None:
+        """ write newly computed features back to disk """
+        if not self.dirty:
+            return
+        path = self.cache_path()
+        try:
+            path.parent.mkdir(exist_ok=True, parents=True)
+            with path.open('wb') as f:
+                pickle.dump({
+                    'version': CACHE_VERSION,
+                    'opencv': cv2.__version__,
+                    'features': self.cache,
+                }, f)
+            self.dirty = False
+            logger.debug(f'template cache saved: {len(self.cache)} entries')
+        except Exception as e:
+            logger.warning(f'failed to save template cache: {e}')
+
+    def features(self, key: str, img: tp.GrayImage) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """ get the SIFT features of image, from cache if possible """
+        if self.cache is None:
+            self.load_cache()
+        if key not in self.cache:
+            kp, des = SIFT.detectAndCompute(img, None)
+            # SIFT descriptors are saturated to [0, 255] integers, so uint8 is lossless
+            self.cache[key] = (kp2array(kp), None if des is None else des.astype(np.uint8))
+            self.dirty = True
+        points, des = self.cache[key]
+        return points, None if des is None else des.astype(np.float32)
+
+    def get(self, name: str) -> Template:
+        """ get template by resource name, e.g. 'nav_button' or 'agent_name/xxx' """
+        if name not in self.templates:
+            data = (self.folder / f'{name}.png').read_bytes()
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+            key = hashlib.sha1(data).hexdigest()
+            self.templates[name] = Template(self, name, img, key)
+        return self.templates[name]
+
+    def preload(self) -> None:
+        """ load all templates in resource folder """
+        for path in sorted(self.folder.glob('*.png')):
+            self.get(path.stem)
+        self.save()
+
+
+registry = TemplateRegistry()
+atexit.register(registry.save)
+
+
+def get(name: str) -> Template:
+    return registry.get(name)
@@ -15,7 +15,7 @@ setuptools.setup(
     url='https://github.com/Konano/arknights-mower',
     packages=setuptools.find_packages(),
     install_requires=[
-        'colorlog', 'opencv_python', 'matplotlib', 'numpy', 'scikit_image==0.18.3', 'scikit_learn>=1',
+        'colorlog', 'opencv_python', 'matplotlib', 'numpy', 'scikit_learn>=1',
         'onnxruntime', 'pyclipper', 'shapely', 'tornado', 'requests', 'ruamel.yaml', 'schedule'
     ],
     include_package_data=True,
@@ -0,0 +1,154 @@
+"""
+性能测试脚本，在项目根目录下运行
+
+    python -m tools.benchmark find <截图文件夹> [-r 资源名 ...]
+    python -m tools.benchmark capture [-s 设备] [-c 连接地址] [-n 次数]
+    python -m tools.benchmark adb [-s 设备] [-c 连接地址] [-n 次数] [--cmd 命令]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from arknights_mower.utils import template
+from arknights_mower.utils.device.adb_client import ADBClient
+from arknights_mower.utils.device.adb_client.session import Session
+from arknights_mower.utils.image import bytes2img, raw2img
+from arknights_mower.utils.log import logger
+from arknights_mower.utils.matcher import Matcher, profile
+
+
+def load_screenshots(folder: str) -> list[np.ndarray]:
+    """ load all screenshots in folder as gray images """
+    images = []
+    for path in sorted(Path(folder).iterdir()):
+        if path.suffix.lower() not in ('.png', '.jpg', '.jpeg', '.webp'):
+            continue
+        img = cv2.imdecode(np.frombuffer(path.read_bytes(), np.uint8), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            images.append(img)
+    return images
+
+
+def report(name: str, samples: list[float]) -> None:
+    samples = np.array(samples) * 1000
+    print(f'{name:<28} n={len(samples):<6} mean={samples.mean():8.2f}ms '
+          f'p50={np.percentile(samples, 50):8.2f}ms p95={np.percentile(samples, 95):8.2f}ms')
+
+
+def bench_find(args) -> None:
+    """ per-find latency, rebuilding the FLANN index for every query vs sharing it within the frame """
+    images = load_screenshots(args.folder)
+    if not len(images):
+        print(f'no screenshot found in {args.folder}')
+        return
+    template.registry.preload()
+    if args.res:
+        templates = [template.get(res) for res in args.res]
+    else:
+        templates = list(template.registry.templates.values())
+
+    samples = {'rebuild': [], 'shared': []}
+    profile.reset()
+    for img in images:
+        matcher = Matcher(img)
+        # extract features beforehand, only the matching is measured
+        matcher.features()
+        for mode in ('rebuild', 'shared'):
+            matcher.indexes = {}
+            for tpl in templates:
+                if mode == 'rebuild':
+                    matcher.indexes = {}
+                start = time.perf_counter()
+                matcher.match(tpl)
+                samples[mode].append(time.perf_counter() - start)
+    print(f'{len(images)} screenshots, {len(templates)} templates')
+    for mode, data in samples.items():
+        report(f'find ({mode})', data)
+    print(f'stages: {profile.summary()}')
+
+
+def bench_capture(args) -> None:
+    """ latency of screencap -p (PNG) vs raw screencap, from the command to the gray image """
+    client = ADBClient(args.serial, args.connect)
+    samples = {'png': [], 'raw': []}
+    size = {}
+    for _ in range(args.count):
+        start = time.perf_counter()
+        data = client.run('screencap -p 2>/dev/null')
+        img = bytes2img(data)
+        cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        samples['png'].append(time.perf_counter() - start)
+        size['png'] = len(data)
+
+        start = time.perf_counter()
+        data = client.screencap_raw()
+        img = cv2.cvtColor(raw2img(data), cv2.COLOR_RGBA2RGB)
+        cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        samples['raw'].append(time.perf_counter() - start)
+        size['raw'] = len(data)
+    print(f'device {client.device_id}, {img.shape[1]}x{img.shape[0]}')
+    for mode, data in samples.items():
+        report(f'capture ({mode}, {size[mode] // 1024}KB)', data)
+
+
+def bench_adb(args) -> None:
+    """ round-trip time of small commands: a new connection each time, pooled sessions and the persistent shell """
+    client = ADBClient(args.serial, args.connect)
+    samples = {'connect each time': [], 'session pool': [], 'shell channel': [], 'shell batch (per cmd)': []}
+    for _ in range(args.count):
+        start = time.perf_counter()
+        # what every command cost before: a health check, then a new transport
+        Session().run('host:version')
+        Session().device(client.device_id).exec(args.cmd)
+        samples['connect each time'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.run(args.cmd)
+        samples['session pool'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.shell(args.cmd)
+        samples['shell channel'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        client.shell_batch([args.cmd] * 10)
+        samples['shell batch (per cmd)'].append((time.perf_counter() - start) / 10)
+    print(f'device {client.device_id}, command: {args.cmd}')
+    for mode, data in samples.items():
+        report(mode, data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='arknights-mower benchmark')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    find = subparsers.add_parser('find', help='latency of Recognizer.find on recorded screenshots')
+    find.add_argument('folder', help='folder of screenshots')
+    find.add_argument('-r', '--res', nargs='*', help='resources to match, all by default')
+    find.set_defaults(func=bench_find)
+
+    capture = subparsers.add_parser('capture', help='latency of screencap in png and raw mode')
+    capture.add_argument('-s', '--serial', help='device id in `adb devices`')
+    capture.add_argument('-c', '--connect', help='address to connect, e.g. 127.0.0.1:5555')
+    capture.add_argument('-n', '--count', type=int, default=20, help='number of captures in each mode')
+    capture.set_defaults(func=bench_capture)
+
+    adb = subparsers.add_parser('adb', help='round-trip time of adb commands')
+    adb.add_argument('-s', '--serial', help='device id in `adb devices`')
+    adb.add_argument('-c', '--connect', help='address to connect, e.g. 127.0.0.1:5555')
+    adb.add_argument('-n', '--count', type=int, default=50, help='number of rounds')
+    adb.add_argument('--cmd', default='echo ok', help='command to run')
+    adb.set_defaults(func=bench_adb)
+
+    args = parser.parse_args()
+    logger.setLevel('INFO')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()